@@ -0,0 +1,22 @@
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from tmux_fzf_links.colors import colors
+from tmux_fzf_links.configs import configs
+from tmux_fzf_links.fs_metadata import fs_metadata
+
+
+@pytest.fixture
+def in_tmp_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Path]:
+    """Run the test from `tmp_path` as a new run, with the caches under it."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setattr(configs, "max_path_length", 255)
+    colors.enable_colors(False)
+    # Relative paths are cached for one directory, as in a run
+    fs_metadata.clear()
+    yield tmp_path
+    colors.enable_colors(False)
+    fs_metadata.clear()
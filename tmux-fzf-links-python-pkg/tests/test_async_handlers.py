@@ -0,0 +1,109 @@
+import asyncio
+import re
+
+import pytest
+
+from tmux_fzf_links.async_handlers import resolve, run_concurrently
+from tmux_fzf_links.configs import configs
+from tmux_fzf_links.matching import collect_items
+from tmux_fzf_links.memo import HandlerMemo
+from tmux_fzf_links.opener import OpenerType, PostHandledMatch, PreHandledMatch, SchemeEntry
+
+# A stand-in for a local service that knows which ticket ids exist
+KNOWN_TICKETS = {"T-1", "T-3"}
+
+
+async def ticket_exists(ticket: str) -> bool:
+    await asyncio.sleep(0.01)
+    return ticket in KNOWN_TICKETS
+
+
+async def ticket_pre_handler(match: re.Match[str]) -> PreHandledMatch | None:
+    if await ticket_exists(match.group(0)):
+        return {"display_text": match.group(0), "tag": "ticket"}
+    return None
+
+
+async def ticket_post_handler(match: re.Match[str]) -> PostHandledMatch:
+    await asyncio.sleep(0)
+    return {"url": f"https://tickets.example.com/{match.group(0)}"}
+
+
+ticket_scheme: SchemeEntry = {
+    "tags": ("ticket",),
+    "opener": OpenerType.BROWSER,
+    "pre_handler": ticket_pre_handler,
+    "post_handler": ticket_post_handler,
+    "regex": [re.compile(r"T-\d+")],
+}
+
+
+def collect(schemes: list[SchemeEntry], text: str, memo: HandlerMemo | None = None) -> list[str]:
+    return [item[1] for item in collect_items(schemes, text, text, lambda i: i, memo)]
+
+
+def test_coroutine_pre_handler_filters_matches() -> None:
+    assert collect([ticket_scheme], "T-1 T-2 T-3 T-4") == ["T-1", "T-3"]
+
+
+def test_coroutine_post_handler_is_awaited() -> None:
+    match = re.search(r"T-\d+", "T-3")
+    assert match is not None
+    assert HandlerMemo().post_handle(ticket_scheme, match) == {
+        "url": "https://tickets.example.com/T-3"
+    }
+
+
+def test_pure_coroutine_scheme_awaits_each_text_once() -> None:
+    calls: list[str] = []
+
+    async def pre_handler(match: re.Match[str]) -> PreHandledMatch | None:
+        calls.append(match.group(0))
+        return {"display_text": match.group(0), "tag": "ticket"}
+
+    scheme: SchemeEntry = {**ticket_scheme, "pre_handler": pre_handler, "pure": True}
+    assert collect([scheme], "T-1 T-1 T-2 T-1") == ["T-2", "T-1"]
+    assert calls == ["T-2", "T-1"]
+
+
+def test_handlers_run_concurrently_within_the_limit(monkeypatch: pytest.MonkeyPatch) -> None:
+    running = 0
+    peak = 0
+
+    async def pre_handler(match: re.Match[str]) -> PreHandledMatch | None:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return {"display_text": match.group(0), "tag": "ticket"}
+
+    monkeypatch.setattr(configs, "handler_concurrency", 3)
+    scheme: SchemeEntry = {**ticket_scheme, "pre_handler": pre_handler}
+    text = " ".join(f"T-{i}" for i in range(10))
+    assert len(collect([scheme], text)) == 10
+    assert peak == 3
+
+
+def test_run_concurrently_keeps_match_order() -> None:
+    async def slow_first(match: re.Match[str]) -> str:
+        await asyncio.sleep(0.02 if match.group(0) == "a" else 0)
+        return match.group(0)
+
+    matches = list(re.finditer(r"[a-z]", "abc"))
+    assert run_concurrently(slow_first, matches, 8) == (["a", "b", "c"], 0)
+
+
+def test_run_concurrently_cancels_calls_past_the_timeout() -> None:
+    async def hang_on_b(match: re.Match[str]) -> str:
+        if match.group(0) == "b":
+            await asyncio.sleep(10)
+        return match.group(0)
+
+    matches = list(re.finditer(r"[a-z]", "abc"))
+    assert run_concurrently(hang_on_b, matches, 8, timeout=0.05) == (["a", None, "c"], 1)
+
+
+def test_resolve_passes_plain_values_through() -> None:
+    assert resolve({"url": "x"}) == {"url": "x"}
+    assert resolve(None) is None
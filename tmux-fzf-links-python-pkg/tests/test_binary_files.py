@@ -0,0 +1,94 @@
+import os
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from tmux_fzf_links.binary_files import binary_files, by_extension
+from tmux_fzf_links.configs import configs
+from tmux_fzf_links.default_schemes import file_finditer, file_pre_handler
+from tmux_fzf_links.fs_metadata import fs_metadata
+
+
+@pytest.fixture
+def in_tmp_dir(in_tmp_dir: Path) -> Iterator[Path]:
+    binary_files.clear()
+    yield in_tmp_dir
+    binary_files.clear()
+
+
+def write(path: Path, content: bytes) -> Path:
+    path.write_bytes(content)
+    # Older than a clock tick, so that the verdict is recorded
+    past = time.time() - 60
+    os.utime(path, (past, past))
+    return path
+
+
+@pytest.mark.parametrize(
+    ("name", "binary"),
+    [
+        ("main.py", False),
+        ("App.TSX", False),
+        ("logo.PNG", True),
+        ("lib.so", True),
+        ("Makefile", None),
+        (".bashrc", None),
+        ("data.unknown", None),
+    ],
+)
+def test_by_extension(name: str, binary: bool | None) -> None:
+    assert by_extension(name) == binary
+
+
+def test_extension_table_needs_no_lookup(in_tmp_dir: Path) -> None:
+    assert binary_files.is_binary(in_tmp_dir / "missing.png")
+    assert not binary_files.is_binary(in_tmp_dir / "missing.py")
+    assert fs_metadata.syscalls == 0
+
+
+def test_unknown_extensions_are_sniffed_once(in_tmp_dir: Path) -> None:
+    blob = write(in_tmp_dir / "blob", b"\x7fELF\0\0")
+    script = write(in_tmp_dir / "script", b"#!/bin/sh\n")
+    assert binary_files.is_binary(blob)
+    assert not binary_files.is_binary(script)
+    binary_files.save()
+
+    # A later run trusts the verdicts while the files are unchanged
+    fs_metadata.clear()
+    binary_files.clear()
+    blob.write_bytes(b"text!!")
+    script.write_bytes(b"\0" * 10)
+    past = time.time() - 60
+    os.utime(blob, (past, past))
+    assert not binary_files.is_binary(blob)
+    assert binary_files.is_binary(script)
+
+
+def test_recent_files_are_not_recorded(in_tmp_dir: Path) -> None:
+    blob = in_tmp_dir / "blob"
+    blob.write_bytes(b"\0")
+    assert binary_files.is_binary(blob)
+    binary_files.save()
+    cache = in_tmp_dir / "cache" / "tmux-fzf-links" / "binary"
+    assert not (cache / "verdicts.json").exists()
+
+
+@pytest.mark.parametrize(
+    ("mode", "result"),
+    [
+        ("show", {"display_text": "blob", "tag": "file"}),
+        ("tag", {"display_text": "blob", "tag": "binary"}),
+        ("hide", None),
+    ],
+)
+def test_file_pre_handler_tags_or_hides_binaries(
+    in_tmp_dir: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    mode: str,
+    result: dict[str, str] | None,
+) -> None:
+    monkeypatch.setattr(configs, "binary_files", mode)
+    write(in_tmp_dir / "blob", b"\0\1\2")
+    assert file_pre_handler(next(iter(file_finditer("blob")))) == result
@@ -0,0 +1,27 @@
+import logging
+
+import pytest
+
+from tmux_fzf_links.configs import configs
+
+
+@pytest.mark.parametrize(
+    ("value", "minimum", "parsed"),
+    [
+        ("", 1, 7),
+        ("3", 1, 3),
+        ("0", 1, 7),
+        ("-2", 1, 7),
+        ("x", 1, 7),
+        ("0", 0, 0),
+        ("-1", 0, 7),
+    ],
+)
+def test_int_options_have_a_minimum(value: str, minimum: int, parsed: int) -> None:
+    assert configs.parse_int_option(value, "@option", 7, minimum=minimum) == parsed
+
+
+def test_invalid_int_option_is_reported(caplog: pytest.LogCaptureFixture) -> None:
+    with caplog.at_level(logging.WARNING):
+        assert configs.parse_int_option("0", "@option", 7) == 7
+    assert "'@option' must be an integer of at least 1" in caplog.text
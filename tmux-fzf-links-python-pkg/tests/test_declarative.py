@@ -0,0 +1,167 @@
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from tmux_fzf_links.declarative import compile_scheme, load_declarative_schemes
+from tmux_fzf_links.opener import OpenerType
+from tmux_fzf_links.loading import load_user_schemes
+
+EXAMPLE = Path(__file__).parents[2] / "user_schemes" / "user_schemes.toml"
+
+
+@pytest.fixture(autouse=True)
+def tmp_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+
+def first_match(scheme, text: str) -> re.Match[str]:
+    match = scheme["regex"][0].search(text)
+    assert match is not None
+    return match
+
+
+def test_example_matches_python_ip_scheme() -> None:
+    user_schemes, rm_default_schemes = load_declarative_schemes(str(EXAMPLE))
+    assert rm_default_schemes == []
+    (scheme,) = user_schemes
+    assert scheme["tags"] == ("IPv4",)
+    assert scheme["opener"] == OpenerType.CUSTOM_OPEN
+    match = first_match(scheme, "host 10.0.0.1:22 up")
+    assert scheme["pre_handler"] is not None
+    assert scheme["post_handler"] is not None
+    assert scheme["pre_handler"](match) == {"display_text": "10.0.0.1:22", "tag": "IPv4"}
+    assert scheme["post_handler"](match) == {
+        "cmd": "tmux",
+        "args": [
+            "set-buffer",
+            "-w",
+            "10.0.0.1:22",
+            ";",
+            "display-message",
+            "IPv4 address '10.0.0.1:22' copied to tmux buffer",
+        ],
+    }
+
+
+def test_url_and_file_actions() -> None:
+    ticket = compile_scheme(
+        {"tags": "ticket", "regex": r"T-(\d+)", "url": "https://t.example/{1}"}
+    )
+    assert ticket["opener"] == OpenerType.BROWSER
+    assert ticket["post_handler"] is not None
+    assert ticket["post_handler"](first_match(ticket, "see T-42")) == {
+        "url": "https://t.example/42"
+    }
+
+    log = compile_scheme(
+        {
+            "tags": ["log"],
+            "regex": r"(?P<path>\S+\.log) line (?P<line>\d+)",
+            "file": "{path}",
+            "line": "{line}",
+        }
+    )
+    assert log["opener"] == OpenerType.EDITOR
+    assert log["post_handler"] is not None
+    assert log["post_handler"](first_match(log, "x.log line 7")) == {
+        "file": "x.log",
+        "line": "7",
+    }
+
+
+@pytest.mark.parametrize(
+    "entry, error",
+    [
+        ({"tags": "a", "regex": "x"}, "exactly one of"),
+        ({"tags": "a", "regex": "x", "url": "u", "cmd": ["c"]}, "exactly one of"),
+        ({"tags": "a", "url": "u"}, "missing key 'regex'"),
+        ({"tags": "a", "regex": "x", "url": "u", "colour": 1}, "unknown keys"),
+        ({"tags": "a", "regex": "x", "url": "u", "color": "red"}, "'color'"),
+        ({"tags": "a", "regex": "(?P<ip>x)", "url": "{ipp}"}, r"'\{ipp\}'"),
+        ({"tags": "a", "regex": "(x)", "cmd": ["c", "{2}"]}, r"'\{2\}'"),
+        ({"tags": "a", "regex": "x", "display": "{}{}", "url": "u"}, r"'\{1\}'"),
+        ({"tags": "a", "regex": "x", "file": "f", "line": "{n}"}, r"'\{n\}'"),
+        ({"tags": "a", "regex": ["(?P<n>x)", "y"], "url": "{n}"}, r"'\{n\}'"),
+        ({"tags": "a", "regex": "x", "url": "{0"}, "is invalid"),
+    ],
+)
+def test_invalid_entries_are_rejected(entry: dict[str, object], error: str) -> None:
+    with pytest.raises(ValueError, match=error):
+        _ = compile_scheme(entry)
+
+
+def test_literal_braces_are_escaped() -> None:
+    scheme = compile_scheme(
+        {"tags": "a", "regex": r"(?P<n>\d+)", "url": "https://x/?q={{{n}}}"}
+    )
+    match = first_match(scheme, "7")
+    assert scheme["post_handler"] is not None
+    assert scheme["post_handler"](match) == {"url": "https://x/?q={7}"}
+
+
+def test_unknown_field_reports_the_file_and_scheme(tmp_path: Path) -> None:
+    path = tmp_path / "schemes.json"
+    entries = [
+        {"tags": ["a"], "regex": "(?P<ip>x)", "url": "{ip}"},
+        {"tags": ["b"], "regex": "(?P<ip>x)", "url": "{ipp}"},
+    ]
+    path.write_text(json.dumps({"schemes": entries}))
+    with pytest.raises(ImportError) as error:
+        _ = load_declarative_schemes(str(path))
+    message = str(error.value)
+    assert str(path) in message
+    assert "scheme #2 (tags ['b'])" in message
+    assert "'{ipp}'" in message
+
+
+def test_json_file_goes_through_load_user_schemes(tmp_path: Path) -> None:
+    path = tmp_path / "schemes.json"
+    path.write_text(
+        json.dumps(
+            {
+                "schemes": [{"tags": ["ticket"], "regex": "T-\\d+", "url": "{0}"}],
+                "rm_default_schemes": ["file"],
+            }
+        )
+    )
+    user_schemes, rm_default_schemes = load_user_schemes(str(path))
+    assert [s["tags"] for s in user_schemes] == [("ticket",)]
+    assert rm_default_schemes == ["file"]
+
+
+def test_bad_regex_reports_the_scheme(tmp_path: Path) -> None:
+    path = tmp_path / "schemes.json"
+    path.write_text(json.dumps({"schemes": [{"tags": ["a"], "regex": "(", "url": "u"}]}))
+    with pytest.raises(ImportError, match="scheme #1"):
+        _ = load_declarative_schemes(str(path))
+
+
+@pytest.mark.skipif(sys.version_info < (3, 11), reason="tomllib is needed")
+def test_toml_file_is_parsed_once(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = tmp_path / "schemes.toml"
+    path.write_text('[[schemes]]\ntags = ["a"]\nregex = "A-\\\\d+"\nurl = "{0}"\n')
+    # Older than a clock tick, so that the parsed file is kept
+    past = time.time() - 60
+    os.utime(path, (past, past))
+    first, _ = load_declarative_schemes(str(path))
+
+    # Loaded from the cache, without importing tomllib
+    monkeypatch.setitem(sys.modules, "tomllib", None)
+    second, _ = load_declarative_schemes(str(path))
+    assert [s["tags"] for s in second] == [s["tags"] for s in first] == [("a",)]
+    assert first_match(second[0], "see A-12")[0] == "A-12"
+
+    # A changed file is parsed again
+    monkeypatch.undo()
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    path.write_text('[[schemes]]\ntags = ["b"]\nregex = "B-\\\\d+"\nurl = "{0}"\n')
+    os.utime(path, (past + 1, past + 1))
+    third, _ = load_declarative_schemes(str(path))
+    assert [s["tags"] for s in third] == [("b",)]
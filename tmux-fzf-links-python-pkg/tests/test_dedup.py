@@ -64,3 +64,11 @@ def test_drops_plain_match_when_multiple_hyperlinks_share_target() -> None:
 def test_no_hyperlinks_leaves_items_untouched() -> None:
     items = [plain_item("foo"), plain_item("bar")]
     assert drop_hyperlinked_duplicates(items) == items
+
+
+def test_drops_plain_url_differing_from_hyperlink_by_a_trailing_slash() -> None:
+    items = [
+        osc8_item("https://example.com/guide/", "docs"),
+        plain_item("https://example.com/guide"),
+    ]
+    assert len(drop_hyperlinked_duplicates(items)) == 1
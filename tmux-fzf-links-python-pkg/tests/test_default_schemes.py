@@ -1,6 +1,31 @@
+from pathlib import Path
+
 import pytest
 
-from tmux_fzf_links.default_schemes import trim_url, url_scheme
+from tmux_fzf_links.configs import configs
+from tmux_fzf_links.default_schemes import (
+    code_error_pre_handler,
+    code_error_pre_handler_batch,
+    code_error_scheme,
+    default_schemes,
+    diagnostic_post_handler,
+    diagnostic_pre_handler,
+    diagnostic_pre_handler_batch,
+    diagnostic_scheme,
+    file_finditer,
+    file_pre_handler,
+    file_pre_handler_batch,
+    file_scheme,
+    git_scheme,
+    osc8_file_post_handler,
+    osc8_scheme,
+    trim_url,
+    url_scheme,
+)
+from tmux_fzf_links.fs_metadata import fs_metadata
+from tmux_fzf_links.hyperlinks import file_hyperlink_regex, offset_translator, strip_escapes
+from tmux_fzf_links.matching import collect_items
+from tmux_fzf_links.schemes import canonical_path
 
 
 @pytest.mark.parametrize(
@@ -42,3 +67,176 @@ def test_url_scheme_match_is_trimmed(text: str, wanted: str) -> None:
     match = url_scheme["regex"][0].search(text)
     assert match is not None
     assert trim_url(match.group(0)) == wanted
+
+
+def test_file_batch_agrees_with_per_match_pre_handler(in_tmp_dir: Path) -> None:
+    (in_tmp_dir / "a.py").write_text("")
+    (in_tmp_dir / "pkg").mkdir()
+    matches = list(file_finditer("a.py:3 a.py:4 pkg missing.txt ..\n"))
+    assert file_pre_handler_batch(matches) == [file_pre_handler(m) for m in matches]
+    accepted = {
+        m.group(0): r["tag"]
+        for m, r in zip(matches, file_pre_handler_batch(matches))
+        if r is not None
+    }
+    assert accepted == {"a.py:3": "file", "a.py:4": "file", "pkg": "dir"}
+
+
+def test_code_error_batch_agrees_with_per_match_pre_handler(in_tmp_dir: Path) -> None:
+    (in_tmp_dir / "mod.py").write_text("")
+    text = 'File "mod.py", line 3\nFile "mod.py", line 9\nFile "gone.py", line 1'
+    matches = list(code_error_scheme["regex"][0].finditer(text))
+    results = code_error_pre_handler_batch(matches)
+    assert results == [code_error_pre_handler(m) for m in matches]
+    assert [r and r["tag"] for r in results] == ["Python", "Python", None]
+
+
+def diagnostics(text: str) -> list[tuple[str, str, str | None]]:
+    return [
+        (m.group("file"), m.group("line"), m.group("col"))
+        for regex in diagnostic_scheme["regex"]
+        for m in regex.finditer(text)
+    ]
+
+
+@pytest.mark.parametrize(
+    ("text", "found"),
+    [
+        ("src/a.c:12:5: warning: unused", [("src/a.c", "12", "5")]),
+        ("  --> src/main.rs:3:5", [("src/main.rs", "3", "5")]),
+        ("./main.go:3:5: undefined: x", [("./main.go", "3", "5")]),
+        ("pkg/mod.py:12: error: bad type", [("pkg/mod.py", "12", None)]),
+        ("src/a.ts(12,5): error TS2322", [("src/a.ts", "12", "5")]),
+        ("started at 12:30:00", []),
+    ],
+)
+def test_diagnostic_formats(text: str, found: list[tuple[str, str, str | None]]) -> None:
+    assert diagnostics(text) == found
+
+
+def test_diagnostic_batch_agrees_with_per_match_pre_handler(in_tmp_dir: Path) -> None:
+    (in_tmp_dir / "a.c").write_text("")
+    (in_tmp_dir / "pkg").mkdir()
+    text = "a.c:3:1: warning\na.c:9: note\npkg/gone.c:1:1: error\n"
+    matches = list(diagnostic_scheme["regex"][0].finditer(text))
+    results = diagnostic_pre_handler_batch(matches)
+    assert results == [diagnostic_pre_handler(m) for m in matches]
+    assert [r and r["tag"] for r in results] == ["diagnostic", "diagnostic", None]
+
+
+def test_diagnostics_resolve_each_path_once(in_tmp_dir: Path) -> None:
+    (in_tmp_dir / "src").mkdir()
+    for i in range(50):
+        (in_tmp_dir / "src" / f"m{i}.c").write_text("")
+    text = "".join(
+        f"src/m{i % 50}.c:{i}:{i % 7 + 1}: warning: unused variable\n"
+        for i in range(5000)
+    )
+    items = collect_items(default_schemes, text, text, lambda i: i)
+    assert len(items) == 5000
+    assert {item[0]["tag"] for item in items} == {"diagnostic"}
+    assert fs_metadata.syscalls < 200
+
+
+def test_diagnostic_post_handler_passes_line_and_col(in_tmp_dir: Path) -> None:
+    (in_tmp_dir / "a.c").write_text("")
+    [with_col, without_col] = [
+        next(diagnostic_scheme["regex"][0].finditer(text))
+        for text in ("a.c:3:7: error", "a.c:4: error")
+    ]
+    path = str(in_tmp_dir / "a.c")
+    assert diagnostic_post_handler(with_col) == {"file": path, "line": "3", "col": "7"}
+    assert diagnostic_post_handler(without_col) == {"file": path, "line": "4", "col": "1"}
+
+
+def test_canonical_path_is_lexical(in_tmp_dir: Path) -> None:
+    here = str(in_tmp_dir)
+    assert canonical_path("./src/a.py") == f"{here}/src/a.py"
+    assert canonical_path("src//./a.py") == f"{here}/src/a.py"
+    assert canonical_path(f"{here}/src/a.py") == f"{here}/src/a.py"
+    # `..` may follow a symlink, so it is not collapsed
+    assert canonical_path("src/../a.py") == f"{here}/src/../a.py"
+    # The current directory is looked up once per run
+    assert fs_metadata.syscalls == 1
+
+
+def test_equivalent_paths_are_listed_once(in_tmp_dir: Path) -> None:
+    (in_tmp_dir / "src").mkdir()
+    (in_tmp_dir / "src" / "a.py").write_text("")
+    text = f"./src/a.py\nsrc/a.py\n{in_tmp_dir}/src/a.py\nsrc/a.py:3\n"
+    items = collect_items([file_scheme, url_scheme], text, text, lambda i: i)
+    # Listed at the most recent occurrence, and a line number is a distinct target
+    assert [item[1] for item in items] == [f"{in_tmp_dir}/src/a.py", "src/a.py:3"]
+
+
+def test_equivalent_urls_are_listed_once(in_tmp_dir: Path) -> None:
+    text = "https://x.dev/docs/ https://X.dev:443/docs https://x.dev/docs?q=1"
+    items = collect_items([url_scheme], text, text, lambda i: i)
+    assert [item[1] for item in items] == [
+        "https://X.dev:443/docs",
+        "https://x.dev/docs?q=1",
+    ]
+
+
+def test_original_schemes_keep_their_precedence() -> None:
+    original = [osc8_scheme, url_scheme, file_scheme, git_scheme, code_error_scheme]
+    indexes = [default_schemes.index(scheme) for scheme in original]
+    assert indexes == sorted(indexes)
+    # The diagnostic scheme claims its locations before the file scheme
+    assert default_schemes.index(diagnostic_scheme) < indexes[2]
+
+
+def test_file_scheme_does_not_hide_later_schemes(in_tmp_dir: Path) -> None:
+    (in_tmp_dir / "x.py").write_text("")
+    text = '  File "x.py", line 12, in f\ngit@github.com:a/b.git\n'
+    items = collect_items(default_schemes, text, text, lambda i: i)
+    assert [item[0]["tag"] for item in items] == ["file", "git", "Python"]
+
+
+def file_link(uri: str, text: str) -> str:
+    return f"\x1b]8;;{uri}\x1b\\{text}\x1b]8;;\x1b\\"
+
+
+def test_file_hyperlinks_are_not_looked_up(in_tmp_dir: Path) -> None:
+    escaped = "".join(
+        file_link(f"file://localhost{in_tmp_dir}/f{i}.py", f"f{i}.py") + "  "
+        for i in range(100)
+    ) + "\n" + file_link("file://elsewhere.example/a.py", "a.py") + "\n"
+    plain = strip_escapes(escaped)
+    items = collect_items(default_schemes, plain, escaped, offset_translator(escaped))
+    tags = [item[0]["tag"] for item in items]
+    # The remote file is left to the OSC 8 scheme
+    assert tags == ["file-link"] * 100 + ["link"]
+    # Only the current directory, looked up once for the keys of the hits
+    assert fs_metadata.syscalls == 1
+
+
+def test_file_hyperlinks_hide_plain_mentions(in_tmp_dir: Path) -> None:
+    (in_tmp_dir / "a.py").write_text("")
+    escaped = (
+        file_link(f"file://{in_tmp_dir}/a.py#L7", "a.py:7")
+        + "\nerror in a.py:7 and ./a.py\n"
+    )
+    plain = strip_escapes(escaped)
+    items = collect_items(default_schemes, plain, escaped, offset_translator(escaped))
+    # The mention with the same line is the hyperlink's, and is not stat-ed
+    assert [(item[0]["tag"], item[1]) for item in items] == [
+        ("file-link", file_link(f"file://{in_tmp_dir}/a.py#L7", "a.py:7")),
+        ("file", "./a.py"),
+    ]
+
+
+def test_file_hyperlink_opens_editor_at_fragment_line(
+    in_tmp_dir: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    (in_tmp_dir / "a b.py").write_text("")
+    monkeypatch.setattr(configs, "editor_open_cmd", "vim +%line '%file'")
+    match = file_hyperlink_regex().search(
+        file_link(f"file://{in_tmp_dir}/a%20b.py#12", "a b.py")
+    )
+    assert match is not None
+    assert osc8_file_post_handler(match) == {
+        "cmd": "vim",
+        "args": ["+12", f"{in_tmp_dir}/a b.py"],
+        "file": f"{in_tmp_dir}/a b.py",
+    }
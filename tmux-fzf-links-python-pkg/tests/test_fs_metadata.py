@@ -0,0 +1,176 @@
+import os
+import re
+from pathlib import Path
+
+import pytest
+
+from tmux_fzf_links.colors import colors
+from tmux_fzf_links.configs import configs
+from tmux_fzf_links.default_schemes import (
+    file_finditer,
+    file_post_handler,
+    file_pre_handler,
+)
+from tmux_fzf_links import fs_metadata as fs_metadata_module
+from tmux_fzf_links.fs_metadata import fs_metadata
+from tmux_fzf_links.ls_colors import LsColors
+
+
+@pytest.fixture
+def in_tmp_dir(in_tmp_dir: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setattr(configs, "editor_open_cmd", "vim +%line %file")
+    monkeypatch.setattr(colors, "_ls_colors_pending", None)
+    monkeypatch.setattr(
+        colors, "_ls_colors", LsColors.parse("di=34:ln=36:ex=32:*.py=33")
+    )
+    return in_tmp_dir
+
+
+def first_match(text: str) -> re.Match[str]:
+    return next(iter(file_finditer(text)))
+
+
+def test_info_of_files_links_and_missing_paths(in_tmp_dir: Path) -> None:
+    (in_tmp_dir / "run.sh").write_text("")
+    os.chmod(in_tmp_dir / "run.sh", 0o755)
+    (in_tmp_dir / "pkg").mkdir()
+    (in_tmp_dir / "to_pkg").symlink_to("pkg")
+    (in_tmp_dir / "dangling").symlink_to("gone")
+
+    script = fs_metadata.info("run.sh")
+    assert script is not None and script.is_file and script.is_executable
+    link = fs_metadata.info("to_pkg")
+    assert link is not None and link.is_symlink and link.is_dir
+    dangling = fs_metadata.info("dangling")
+    assert dangling is not None and dangling.is_symlink and not dangling.exists
+    assert fs_metadata.info("missing/a.py") is None
+    assert fs_metadata.info("x" * 5000) is None
+    # One lstat per path, plus one stat per symlink. The directory is listed
+    # at its second lookup, and the long name is ruled out by the listing.
+    assert fs_metadata.syscalls == 7
+
+
+def test_lookups_are_cached_for_the_run(in_tmp_dir: Path) -> None:
+    (in_tmp_dir / "a.py").write_text("")
+    assert fs_metadata.info("a.py") is not None
+    calls = fs_metadata.syscalls
+    (in_tmp_dir / "a.py").unlink()
+    assert fs_metadata.info("a.py") is not None
+    assert fs_metadata.syscalls == calls
+    fs_metadata.clear()
+    assert fs_metadata.info("a.py") is None
+
+
+def test_handlers_and_coloring_share_the_lookups(in_tmp_dir: Path) -> None:
+    colors.enable_colors(True)
+    (in_tmp_dir / "a.py").write_text("")
+    match = first_match("a.py:3")
+
+    pre_handled = file_pre_handler(match)
+    assert pre_handled == {"display_text": "\033[33ma.py\033[0m", "tag": "file"}
+    # One lstat of the candidate, and the current directory to resolve it.
+    # The resolved path, its type and its color come for free.
+    assert fs_metadata.syscalls == 2
+
+    post_handled = file_post_handler(match)
+    assert post_handled is not None and "args" in post_handled
+    assert post_handled["args"] == ["+3", str(in_tmp_dir.resolve() / "a.py")]
+    assert fs_metadata.syscalls == 2
+
+
+def test_symlinked_directory_is_colored_as_directory(in_tmp_dir: Path) -> None:
+    colors.enable_colors(True)
+    (in_tmp_dir / "pkg").mkdir()
+    (in_tmp_dir / "to_pkg").symlink_to("pkg")
+    pre_handled = file_pre_handler(first_match("to_pkg"))
+    assert pre_handled == {"display_text": "\033[34mto_pkg\033[0m", "tag": "dir"}
+    # lstat and stat of the link, the current directory, then readlink and
+    # lstat of the target
+    assert fs_metadata.syscalls == 5
+
+
+def test_words_missing_from_the_listing_are_not_looked_up(in_tmp_dir: Path) -> None:
+    (in_tmp_dir / "a.py").write_text("")
+    words = ["the", "error", "done", "failed", "a.py", "A.PY"]
+    found = [word for word in words if fs_metadata.info(word) is not None]
+    assert found == ["a.py"]
+    # `the` is looked up before the directory is listed. Then only the names
+    # in the listing, which ignores the case, are looked up.
+    assert fs_metadata.syscalls == 4
+
+
+def test_entries_of_a_missing_directory_are_not_looked_up(in_tmp_dir: Path) -> None:
+    for name in ("a", "b", "c", "d"):
+        assert fs_metadata.info(f"nodir/{name}") is None
+    assert fs_metadata.syscalls == 2
+
+
+def test_non_ascii_names_are_left_to_lstat(in_tmp_dir: Path) -> None:
+    (in_tmp_dir / "caf\u00e9").write_text("")
+    assert fs_metadata.info("a") is None
+    assert fs_metadata.info("b") is None
+    calls = fs_metadata.syscalls
+    # The filesystem may store another normalization of the name
+    assert fs_metadata.info("cafe\u0301") is None
+    assert fs_metadata.syscalls == calls + 1
+
+
+def test_large_directories_are_not_indexed(
+    in_tmp_dir: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(fs_metadata_module, "MAX_INDEXED_ENTRIES", 2)
+    for name in ("a", "b", "c"):
+        (in_tmp_dir / name).write_text("")
+    words = ["x", "y", "z", "a"]
+    assert [fs_metadata.info(word) is not None for word in words] == [
+        False,
+        False,
+        False,
+        True,
+    ]
+    # One aborted listing, then one lstat per word
+    assert fs_metadata.syscalls == 5
+
+
+def test_resolve_agrees_with_pathlib(in_tmp_dir: Path) -> None:
+    (in_tmp_dir / "repo" / "src" / "pkg").mkdir(parents=True)
+    (in_tmp_dir / "repo" / "src" / "pkg" / "a.py").write_text("")
+    (in_tmp_dir / "link_abs").symlink_to(in_tmp_dir / "repo" / "src")
+    (in_tmp_dir / "repo" / "up").symlink_to("src/pkg/..")
+    (in_tmp_dir / "repo" / "src" / "pkg" / "back").symlink_to("../../../link_abs")
+    (in_tmp_dir / "chain").symlink_to("link_abs/pkg/back")
+    (in_tmp_dir / "loop_a").symlink_to("loop_b")
+    (in_tmp_dir / "loop_b").symlink_to("loop_a")
+    paths = [
+        "repo/src/pkg/a.py",
+        "link_abs/pkg/a.py",
+        "link_abs/../repo/src",
+        "repo/up/pkg/a.py",
+        "chain/pkg/a.py",
+        "repo/src/missing/x/../y",
+        "missing/../link_abs/pkg",
+        "./repo//src/./pkg/",
+        str(in_tmp_dir / "chain" / "pkg"),
+        "..",
+        "/",
+    ]
+    for path in paths:
+        assert fs_metadata.resolve(path) == Path(path).resolve(), path
+    # Loops are left to pathlib, which reports them
+    with pytest.raises((RuntimeError, OSError)):
+        fs_metadata.resolve("loop_a/x")
+
+
+def test_resolve_shares_the_lookups_of_common_directories(in_tmp_dir: Path) -> None:
+    deep = in_tmp_dir.joinpath(*"abcdefgh")
+    deep.mkdir(parents=True)
+    names = [f"f{i}.py" for i in range(20)]
+    for name in names:
+        (deep / name).write_text("")
+    fs_metadata.resolve(f"a/b/c/d/e/f/g/h/{names[0]}")
+    calls = fs_metadata.syscalls
+    for name in names[1:]:
+        assert fs_metadata.resolve(f"a/b/c/d/e/f/g/h/{name}") == deep / name
+    # The directories are resolved once. Each further file costs one lookup
+    # until its directory is listed, and then one lstat.
+    assert fs_metadata.syscalls - calls == len(names)
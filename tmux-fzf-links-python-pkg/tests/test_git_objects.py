@@ -0,0 +1,146 @@
+import os
+import subprocess
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from tmux_fzf_links.configs import configs
+from tmux_fzf_links.default_schemes import (
+    commit_post_handler,
+    commit_scheme,
+    default_schemes,
+)
+from tmux_fzf_links.git_objects import forge_commit_url, git_objects
+from tmux_fzf_links.hyperlinks import url_kind
+from tmux_fzf_links.matching import collect_items
+from tmux_fzf_links.opener import PostHandledMatch
+
+
+# Fixed dates, so that the commits, and hence their hashes, are the same on
+# every run
+_DATES = {
+    "GIT_AUTHOR_DATE": "2024-01-01T00:00:00+0000",
+    "GIT_COMMITTER_DATE": "2024-01-01T00:00:00+0000",
+}
+
+
+def git(root: Path, *args: str) -> str:
+    return subprocess.run(
+        ["git", "-C", str(root), "-c", "user.name=a", "-c", "user.email=a@b", *args],
+        check=True,
+        capture_output=True,
+        text=True,
+        env={**os.environ, **_DATES},
+    ).stdout.strip()
+
+
+def abbrev(sha: str, length: int) -> str:
+    """The shortest prefix of `sha` of at least `length` characters with a
+    letter, as a hash made only of digits is not a candidate."""
+    while sha[:length].isdigit():
+        length += 1
+    return sha[:length]
+
+
+@pytest.fixture
+def repo(in_tmp_dir: Path) -> Iterator[list[str]]:
+    git(in_tmp_dir, "init", "-q")
+    for message in ("first", "second"):
+        git(in_tmp_dir, "commit", "-q", "--allow-empty", "-m", message)
+    git_objects.clear()
+    yield git(in_tmp_dir, "log", "--format=%H").split()
+    git_objects.clear()
+
+
+def shown(post_handled: PostHandledMatch) -> list[str]:
+    # The command run in the new window
+    assert post_handled is not None and "args" in post_handled
+    return post_handled["args"][-3:]
+
+
+def test_commits_are_validated_by_one_process(repo: list[str]) -> None:
+    second, first = repo
+    noise = " ".join(f"{i:07x}f" for i in range(2000))
+    short, long = abbrev(second, 7), abbrev(first, 10)
+    text = f"{short} second\n{long} first\nbuild {noise} deadbeef\n"
+    items = collect_items(default_schemes, text, text, lambda i: i)
+    assert [(item[0]["tag"], item[1]) for item in items] == [
+        ("sha", short),
+        ("sha", long),
+    ]
+    # The batches of 64, 128, ... candidates share the process of the run
+    assert git_objects.processes == 1
+    assert git_objects.commit(second[:12]) == second
+    assert git_objects.processes == 1
+
+
+@pytest.mark.usefixtures("in_tmp_dir")
+def test_outside_a_repository_no_commit_is_found() -> None:
+    git_objects.clear()
+    assert git_objects.commits(["abcdef0", "abcdef1"]) == dict.fromkeys(
+        ["abcdef0", "abcdef1"]
+    )
+    # The failed process is not started again
+    assert git_objects.commit("abcdef2") is None
+    assert git_objects.processes == 1
+    git_objects.clear()
+
+
+def test_only_hex_tokens_with_a_letter_are_candidates() -> None:
+    text = "1234567 abcdef0 src/abcdef01 x-abcdef01 abcdef0123g"
+    found = [m.group(0) for m in commit_scheme["regex"][0].finditer(text)]
+    assert found == ["abcdef0"]
+
+
+@pytest.mark.parametrize(
+    ("text", "found"),
+    [
+        ("abc1234..def5678", ["abc1234", "def5678"]),
+        ("git diff abc1234...def5678", ["abc1234", "def5678"]),
+        ("fixed in abc1234.", ["abc1234"]),
+        ("abc1234.def5678 x.abc1234 abc1234.py", []),
+    ],
+)
+def test_commit_ranges_split_into_hashes(text: str, found: list[str]) -> None:
+    regex = commit_scheme["regex"][0]
+    assert [m.group(0) for m in regex.finditer(text)] == found
+
+
+@pytest.mark.parametrize(
+    ("remote", "url"),
+    [
+        ("git@github.com:o/r.git", "https://github.com/o/r/commit/c0ffee1"),
+        ("https://github.com/o/r", "https://github.com/o/r/commit/c0ffee1"),
+        ("ssh://git@gitlab.com:22/g/p.git", "https://gitlab.com/g/p/-/commit/c0ffee1"),
+        ("/srv/git/r.git", None),
+        ("../r", None),
+    ],
+)
+def test_forge_commit_url(remote: str, url: str | None) -> None:
+    assert forge_commit_url(remote, "c0ffee1") == url
+    if url is not None:
+        assert url_kind(url) == "commit"
+
+
+def test_post_handler_opens_forge_or_git_show(
+    repo: list[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    second, _ = repo
+    match = commit_scheme["regex"][0].search(abbrev(second, 8))
+    assert match is not None
+    monkeypatch.setattr(configs, "browser_open_cmd", "firefox '%url'")
+    monkeypatch.setattr(configs, "commit_open", "browser")
+
+    # Without a remote, the commit is shown in a new window
+    assert shown(commit_post_handler(match)) == ["git", "show", second]
+
+    git(Path.cwd(), "remote", "add", "origin", "git@github.com:o/r.git")
+    git_objects.clear()
+    assert commit_post_handler(match) == {
+        "cmd": "firefox",
+        "args": [f"https://github.com/o/r/commit/{second}"],
+    }
+
+    monkeypatch.setattr(configs, "commit_open", "show")
+    assert shown(commit_post_handler(match)) == ["git", "show", second]
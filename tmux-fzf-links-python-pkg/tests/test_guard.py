@@ -0,0 +1,92 @@
+import logging
+import re
+import time
+
+import pytest
+
+from tmux_fzf_links.configs import configs
+from tmux_fzf_links.guard import guarded_matches, line_spans
+from tmux_fzf_links.isolation import can_isolate
+from tmux_fzf_links.matching import collect_newest, scheme_matches
+from tmux_fzf_links.opener import OpenerType, SchemeEntry
+
+# Catastrophic backtracking on a long run of "a" not followed by "!"
+EVIL = re.compile(r"(a+)+!")
+
+
+def scheme(*patterns: str | re.Pattern[str]) -> SchemeEntry:
+    return {
+        "tags": ("test",),
+        "opener": OpenerType.BROWSER,
+        "pre_handler": None,
+        "post_handler": None,
+        "regex": [re.compile(p) if isinstance(p, str) else p for p in patterns],
+    }
+
+
+def texts(matches: list[re.Match[str]]) -> list[str]:
+    return [m.group(0) for m in matches]
+
+
+def test_line_spans_caps_each_line() -> None:
+    assert line_spans("abc\n\nabcdef", 4) == [(0, 3), (4, 4), (5, 9)]
+    assert line_spans("ab\n", 4) == [(0, 2), (3, 3)]
+
+
+def test_guarded_matches_agree_with_unguarded_scan() -> None:
+    s = scheme(r"\bfoo\d\b", r"(?P<word>bar)(?=\s|$)")
+    source = "foo1 bar\nbaz foo2\n\nbar foo3 bar"
+    expected = [m for r in s["regex"] for m in r.finditer(source)]
+    found = guarded_matches(s, source, 4096, 1000)
+    assert [m.span() for m in found] == [m.span() for m in expected]
+    assert [m.groupdict() for m in found] == [m.groupdict() for m in expected]
+
+
+def test_guarded_matches_truncate_long_lines(caplog: pytest.LogCaptureFixture) -> None:
+    s = scheme(r"x+")
+    with caplog.at_level(logging.INFO):
+        found = guarded_matches(s, "xxxxxxxx\nxx", 3, 1000)
+    assert texts(found) == ["xxx", "xx"]
+    assert "line 1 truncated to 3 characters" in caplog.text
+
+
+def test_per_scheme_line_length_overrides_default() -> None:
+    s = scheme(r"x+")
+    s["max_line_length"] = 5
+    assert texts(guarded_matches(s, "xxxxxxxx", 3, 1000)) == ["xxxxx"]
+
+
+@pytest.mark.skipif(not can_isolate(), reason="requires fork")
+def test_pathological_line_is_skipped(caplog: pytest.LogCaptureFixture) -> None:
+    s = scheme(r"ok\d", EVIL)
+    source = "ok1\n" + "a" * 40 + "\nok2 a!"
+    start = time.monotonic()
+    with caplog.at_level(logging.WARNING):
+        found = guarded_matches(s, source, 4096, 100)
+    assert time.monotonic() - start < 5
+    assert texts(found) == ["ok1", "ok2", "a!"]
+    assert "scheme with tags ('test',): line 2 skipped" in caplog.text
+
+
+def test_scheme_matches_uses_guard_when_enabled(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(configs, "regex_guard", True)
+    monkeypatch.setattr(configs, "regex_max_line_length", 2)
+    assert texts(list(scheme_matches(scheme(r"\w+"), "abcd\nef"))) == ["ab", "ef"]
+
+
+def test_chunked_scan_logs_pane_line_numbers(
+    monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+) -> None:
+    monkeypatch.setattr(configs, "regex_guard", True)
+    monkeypatch.setattr(configs, "regex_max_line_length", 3)
+    s = scheme(r"x+")
+    s["pre_handler"] = lambda m: {"display_text": m.group(0), "tag": "test"}
+    # The long line is in the second chunk, the first one holding 64 lines
+    lines = ["x"] * 200
+    lines[9] = "xxxxxxxx"
+    text = "\n".join(lines)
+    with caplog.at_level(logging.INFO):
+        _ = collect_newest([s], text, text, 10**6)
+    assert "line 10 truncated to 3 characters" in caplog.text
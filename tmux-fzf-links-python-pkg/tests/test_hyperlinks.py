@@ -1,6 +1,8 @@
 import pytest
 
 from tmux_fzf_links.hyperlinks import (
+    canonical_url,
+    file_uri_target,
     hyperlink_regex,
     offset_translator,
     parse_links,
@@ -111,3 +113,36 @@ def test_offset_translator_maps_hyperlink_starts_to_on_screen_columns() -> None:
     assert match is not None
     # "#497" begins at column 4 on screen ("see ").
     assert translate(match.start()) == 4
+
+
+@pytest.mark.parametrize(
+    ("url", "canonical"),
+    [
+        ("https://x.org/a/", "https://x.org/a"),
+        ("HTTPS://X.Org:443/a", "https://x.org/a"),
+        ("http://x.org:80/", "http://x.org"),
+        ("http://x.org:8080/a", "http://x.org:8080/a"),
+        ("https://u@X.org/a/?q=1#F", "https://u@x.org/a?q=1#F"),
+        ("http://x.org:bad/a", "http://x.org:bad/a"),
+        ("http://[::1]:8080/x/", "http://[::1]:8080/x"),
+        ("HTTP://[FE80::1]:80/x", "http://[fe80::1]/x"),
+    ],
+)
+def test_canonical_url(url: str, canonical: str) -> None:
+    assert canonical_url(url) == canonical
+
+
+@pytest.mark.parametrize(
+    ("uri", "target"),
+    [
+        ("file:///home/u/a.py", ("/home/u/a.py", None)),
+        ("file://localhost/home/u/a%20b.py", ("/home/u/a b.py", None)),
+        ("FILE:///a.py#L12", ("/a.py", "12")),
+        ("file:///a.py#12:5", ("/a.py", "12")),
+        ("file:///a.py#section", ("/a.py", None)),
+        ("file://elsewhere.example/a.py", None),
+        ("file:a.py", None),
+    ],
+)
+def test_file_uri_target(uri: str, target: tuple[str, str | None] | None) -> None:
+    assert file_uri_target(uri) == target
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import re
+import time
+
+import pytest
+
+from tmux_fzf_links.configs import configs
+from tmux_fzf_links.isolation import (
+    Budget,
+    can_isolate,
+    clear_overrun_reports,
+    report_overrun,
+    run_in_worker,
+)
+from tmux_fzf_links import matching
+from tmux_fzf_links.matching import Deadline, collect_items, collect_newest
+from tmux_fzf_links.opener import OpenerType, PreHandledMatch, SchemeEntry
+
+needs_fork = pytest.mark.skipif(not can_isolate(), reason="requires fork")
+
+
+def slow_scheme(delay: float, slow_text: str | None = None) -> SchemeEntry:
+    def pre_handler(match: re.Match[str]) -> PreHandledMatch | None:
+        if slow_text is None or match.group(0) == slow_text:
+            time.sleep(delay)
+        return {"display_text": match.group(0), "tag": "slow"}
+
+    return {
+        "tags": ("slow",),
+        "opener": OpenerType.BROWSER,
+        "pre_handler": pre_handler,
+        "post_handler": None,
+        "regex": [re.compile(r"[a-z]+")],
+        "budgeted": True,
+    }
+
+
+def collect(schemes: list[SchemeEntry], text: str) -> list[str]:
+    return [item[1] for item in collect_items(schemes, text, text, lambda i: i)]
+
+
+@pytest.fixture(autouse=True)
+def _small_budget(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(configs, "handler_budget", 100)
+    clear_overrun_reports()
+
+
+def test_budget_skips_remaining_matches_and_reports_once(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    fast: SchemeEntry = {**slow_scheme(0), "tags": ("fast",)}
+    fast["pre_handler"] = lambda m: {"display_text": m.group(0), "tag": "fast"}
+    text = " ".join(f"w{chr(97 + i)}" for i in range(20))
+    with caplog.at_level(logging.WARNING):
+        found = collect([slow_scheme(0.03), fast], text)
+    # The slow scheme got a few matches in before its budget ran out. The
+    # skipped ones are then picked up by the next scheme.
+    assert 0 < len([f for f in found if f]) <= 20
+    overruns = [r for r in caplog.records if "exceeded its time budget" in r.message]
+    assert len(overruns) == 1
+    assert "('slow',)" in overruns[0].message
+
+
+def test_overrun_is_reported_once_per_run(caplog: pytest.LogCaptureFixture) -> None:
+    budget = Budget(0)
+    with caplog.at_level(logging.WARNING):
+        for _ in range(3):
+            report_overrun(slow_scheme(0), budget, 2)
+        clear_overrun_reports()
+        report_overrun(slow_scheme(0), budget, 2)
+    overruns = [r for r in caplog.records if "exceeded its time budget" in r.message]
+    assert len(overruns) == 2
+
+
+def test_schemes_not_budgeted_keep_every_match() -> None:
+    # E.g. the built-in schemes, on a slow mount
+    scheme: SchemeEntry = {**slow_scheme(0.03), "budgeted": False}
+    text = " ".join(f"w{chr(97 + i)}" for i in range(6))
+    assert len(collect([scheme], text)) == 6
+
+
+def test_isolation_failure_is_reported_once_per_run(
+    monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+) -> None:
+    monkeypatch.setattr(matching, "can_isolate", lambda: False)
+    scheme: SchemeEntry = {**slow_scheme(0), "isolated": True}
+    text = "\n".join(f"w{chr(97 + i % 26)}{i}" for i in range(500))
+    with caplog.at_level(logging.WARNING):
+        found = collect_newest([scheme], text, text, 10**6)
+    # The regex stops at the digits: one item per letter
+    assert len(found) == 26
+    warnings = [r for r in caplog.records if "cannot be isolated" in r.message]
+    assert len(warnings) == 1
+
+
+@needs_fork
+def test_isolated_handler_is_killed_at_the_deadline(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    scheme = slow_scheme(30, slow_text="hang")
+    scheme["isolated"] = True
+    start = time.monotonic()
+    with caplog.at_level(logging.WARNING):
+        found = collect([scheme], "one two hang three")
+    assert time.monotonic() - start < 5
+    assert found == ["one", "two"]
+    assert any("exceeded its time budget" in r.message for r in caplog.records)
+
+
+@pytest.mark.parametrize("isolated", [pytest.param(True, marks=needs_fork), False])
+def test_match_deadline_cuts_async_and_isolated_handlers_short(
+    isolated: bool, monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+) -> None:
+    monkeypatch.setattr(configs, "handler_budget", 10_000)
+
+    async def pre_handler(match: re.Match[str]) -> PreHandledMatch | None:
+        await asyncio.sleep(30 if match.group(0) == "hang" else 0)
+        return {"display_text": match.group(0), "tag": "slow"}
+
+    scheme = slow_scheme(0)
+    scheme["pre_handler"] = pre_handler
+    scheme["isolated"] = isolated
+    text = "one two hang three"
+    deadline = Deadline(100)
+    start = time.monotonic()
+    with caplog.at_level(logging.WARNING):
+        items = collect_items([scheme], text, text, lambda i: i, deadline=deadline)
+    assert time.monotonic() - start < 5
+    assert deadline.reached
+    assert "hang" not in [item[1] for item in items]
+    # The scheme did not run out of its own budget
+    assert not any("exceeded its time budget" in r.message for r in caplog.records)
+
+
+@needs_fork
+def test_isolated_handler_results_match_in_process_results() -> None:
+    scheme = slow_scheme(0)
+    isolated: SchemeEntry = {**scheme, "isolated": True}
+    text = "alpha beta gamma alpha"
+    assert collect([isolated], text) == collect([scheme], text)
+
+
+@needs_fork
+def test_worker_reraises_handler_errors() -> None:
+    def work():
+        yield 1
+        raise KeyError("boom")
+
+    with pytest.raises(RuntimeError, match="boom"):
+        run_in_worker(work, 2, Budget(1000))
@@ -0,0 +1,107 @@
+import logging
+import os
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+from tmux_fzf_links.loading import load_user_schemes
+
+SCHEMES = """
+import pathlib
+from tmux_fzf_links.export import OpenerType
+
+# Count the executions of this file
+counter = pathlib.Path(__file__).with_suffix(".count")
+counter.write_text(str(int(counter.read_text()) + 1 if counter.exists() else 1))
+
+user_schemes = [
+    {{
+        "tags": ("{tag}",),
+        "opener": OpenerType.BROWSER,
+        "pre_handler": None,
+        "post_handler": None,
+        "regex": [],
+    }}
+]
+rm_default_schemes = ["file"]
+"""
+
+
+@pytest.fixture
+def schemes_file(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    path = tmp_path / "schemes" / "user_schemes.py"
+    path.parent.mkdir()
+    path.write_text(SCHEMES.format(tag="first"))
+    return path
+
+
+def executions(path: Path) -> int:
+    return int(path.with_suffix(".count").read_text())
+
+
+def test_changes_are_loaded_on_the_next_call(schemes_file: Path) -> None:
+    user_schemes, rm_default_schemes = load_user_schemes(str(schemes_file))
+    assert [s["tags"] for s in user_schemes] == [("first",)]
+    assert rm_default_schemes == ["file"]
+
+    schemes_file.write_text(SCHEMES.format(tag="second"))
+    stat = schemes_file.stat()
+    os.utime(schemes_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    user_schemes, _ = load_user_schemes(str(schemes_file))
+    assert [s["tags"] for s in user_schemes] == [("second",)]
+    assert executions(schemes_file) == 2
+
+
+def test_load_time_is_logged(
+    schemes_file: Path, caplog: pytest.LogCaptureFixture
+) -> None:
+    with caplog.at_level(logging.DEBUG):
+        _ = load_user_schemes(str(schemes_file))
+    assert re.search(
+        rf"loaded user schemes from {re.escape(str(schemes_file))} in [0-9.]+ ms",
+        caplog.text,
+    )
+
+
+def test_bytecode_goes_to_the_cache_directory(
+    schemes_file: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(sys, "dont_write_bytecode", False)
+    # The directory of the schemes file is read-only, its counter is written
+    schemes_file.with_suffix(".count").write_text("0")
+    schemes_file.parent.chmod(0o555)
+    try:
+        _ = load_user_schemes(str(schemes_file))
+    finally:
+        schemes_file.parent.chmod(0o755)
+    assert not (schemes_file.parent / "__pycache__").exists()
+    assert list((tmp_path / "cache" / "tmux-fzf-links" / "bytecode").rglob("*.pyc"))
+
+
+def test_imported_modules_keep_their_own_bytecode(
+    schemes_file: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(sys, "dont_write_bytecode", False)
+    monkeypatch.syspath_prepend(str(schemes_file.parent))
+    (schemes_file.parent / "fzf_links_helper.py").write_text("")
+    schemes_file.write_text("import fzf_links_helper\n" + SCHEMES.format(tag="first"))
+    try:
+        _ = load_user_schemes(str(schemes_file))
+        helper = sys.modules["fzf_links_helper"]
+    finally:
+        _ = sys.modules.pop("fzf_links_helper", None)
+    assert Path(helper.__cached__).parent == schemes_file.parent / "__pycache__"
+    assert Path(helper.__cached__).exists()
+    cached = list((tmp_path / "cache" / "tmux-fzf-links" / "bytecode").rglob("*.pyc"))
+    assert len(cached) == 1
+
+
+def test_missing_file_raises_import_error(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    with pytest.raises(ImportError):
+        _ = load_user_schemes(str(tmp_path / "missing.py"))
@@ -0,0 +1,111 @@
+import os
+import stat
+from pathlib import Path
+
+import pytest
+
+from tmux_fzf_links.fs_metadata import FileInfo, fs_metadata
+from tmux_fzf_links.ls_colors import LsColors
+
+LS_COLORS = (
+    "di=34:ln=36:or=31:mi=5:pi=33:so=35:ex=32:su=41:tw=42:ow=43:st=44:fi=0:"
+    "*.gz=91:*.tar.gz=92:*.PY=93:*~=90:*.C=94:*.c=95:*README=96"
+)
+
+
+def regular(permissions: int = 0o644) -> FileInfo:
+    return FileInfo(stat.S_IFREG | permissions, stat.S_IFREG | permissions)
+
+
+def directory(permissions: int = 0o755) -> FileInfo:
+    return FileInfo(stat.S_IFDIR | permissions, stat.S_IFDIR | permissions)
+
+
+@pytest.mark.parametrize(
+    ("name", "color"),
+    [
+        ("a.tar.gz", "92"),
+        ("a.gz", "91"),
+        ("A.TAR.GZ", "92"),
+        ("mod.py", "93"),
+        ("notes~", "90"),
+        ("x.C", "94"),
+        ("x.c", "95"),
+        ("README", "96"),
+        ("readme", "96"),
+        ("a.txt", None),
+        ("gz", None),
+    ],
+)
+def test_longest_suffix_wins_regardless_of_case(name: str, color: str | None) -> None:
+    assert LsColors.parse(LS_COLORS).suffix_color(name) == color
+
+
+@pytest.mark.parametrize(
+    ("name", "info", "color"),
+    [
+        ("a.gz", regular(), "91"),
+        ("a.txt", regular(), "0"),
+        ("run.gz", regular(0o755), "32"),
+        ("sudo", regular(0o4755), "41"),
+        ("pkg", directory(), "34"),
+        ("tmp", directory(0o1777), "42"),
+        ("shared", directory(0o777), "43"),
+        ("sticky", directory(0o1755), "44"),
+        ("link.gz", FileInfo(stat.S_IFLNK | 0o777, stat.S_IFREG | 0o644), "36"),
+        ("dangling", FileInfo(stat.S_IFLNK | 0o777, None), "31"),
+        ("fifo", FileInfo(stat.S_IFIFO | 0o644, stat.S_IFIFO | 0o644), "33"),
+        ("socket", FileInfo(stat.S_IFSOCK | 0o644, stat.S_IFSOCK | 0o644), "35"),
+        ("missing.gz", None, "5"),
+    ],
+)
+def test_classification_by_file_type(name: str, info: FileInfo | None, color: str) -> None:
+    assert LsColors.parse(LS_COLORS).color(name, info) == color
+
+
+def test_symlinks_colored_as_their_target() -> None:
+    ls_colors = LsColors.parse("ln=target:di=34:*.gz=91")
+    link = FileInfo(stat.S_IFLNK | 0o777, stat.S_IFREG | 0o644)
+    assert ls_colors.color("a.gz", link) == "91"
+    link = FileInfo(stat.S_IFLNK | 0o777, stat.S_IFDIR | 0o755)
+    assert ls_colors.color("pkg", link) == "34"
+
+
+def test_empty_ls_colors() -> None:
+    assert not LsColors.parse("")
+    assert LsColors.parse("rs=0:di=34")
+
+
+def test_compiled_ls_colors_are_cached_on_disk(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    compiled = LsColors.load(LS_COLORS)
+    [cache_file] = (tmp_path / "cache" / "tmux-fzf-links" / "ls_colors").iterdir()
+    loaded = LsColors.load(LS_COLORS)
+    assert (loaded.types, loaded.suffixes) == (compiled.types, compiled.suffixes)
+    assert loaded.suffix_color("x.C") == "94"
+
+    # A damaged cache is compiled again
+    cache_file.write_text("{")
+    loaded = LsColors.load(LS_COLORS)
+    assert (loaded.types, loaded.suffixes) == (compiled.types, compiled.suffixes)
+
+
+def test_coloring_costs_one_lstat_per_file(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    for i in range(1000):
+        (tmp_path / f"f{i}.tar.gz").write_text("")
+    os.chmod(tmp_path / "f0.tar.gz", 0o755)
+    ls_colors = LsColors.parse(LS_COLORS)
+    fs_metadata.clear()
+    colors = {
+        ls_colors.color(name, fs_metadata.info(name))
+        for name in (f"f{i}.tar.gz" for i in range(1000))
+    }
+    assert colors == {"32", "92"}
+    # The directory listing, then one lstat per file
+    assert fs_metadata.syscalls <= 1001
+    fs_metadata.clear()
@@ -0,0 +1,347 @@
+import re
+import time
+
+import pytest
+
+from tmux_fzf_links.configs import configs
+from tmux_fzf_links.hyperlinks import hyperlink_regex, offset_translator, strip_escapes
+from tmux_fzf_links.matching import (
+    FIRST_BATCH_SIZE,
+    FIRST_CHUNK_LINES,
+    Deadline,
+    collect_items,
+    collect_newest,
+)
+from tmux_fzf_links.memo import HandlerMemo
+from tmux_fzf_links.opener import (
+    OpenerType,
+    PostHandledMatch,
+    PreHandledMatch,
+    SchemeEntry,
+)
+from tmux_fzf_links.spans import SpanIndex
+
+ESC = "\x1b"
+ST = f"{ESC}\\"
+
+
+def make_scheme(
+    tag: str, pattern: str, calls: list[str], escaped: bool = False, accept: bool = True
+) -> SchemeEntry:
+    def pre_handler(match: re.Match[str]) -> PreHandledMatch | None:
+        calls.append(match.group(0))
+        return {"display_text": match.group(0), "tag": tag} if accept else None
+
+    scheme: SchemeEntry = {
+        "tags": (tag,),
+        "opener": OpenerType.BROWSER,
+        "pre_handler": pre_handler,
+        "post_handler": None,
+        "regex": [re.compile(pattern)],
+    }
+    if escaped:
+        scheme["escaped"] = True
+    return scheme
+
+
+def collect(
+    schemes: list[SchemeEntry], escaped: str, memo: HandlerMemo | None = None
+) -> list[str]:
+    items = collect_items(
+        schemes, strip_escapes(escaped), escaped, offset_translator(escaped), memo
+    )
+    return [item[1] for item in items]
+
+
+def test_span_index_overlap_queries() -> None:
+    index = SpanIndex()
+    index.claim([(10, 20), (30, 40), (18, 25)])
+    assert len(index) == 2
+    assert index.overlaps(0, 11)
+    assert index.overlaps(24, 31)
+    assert index.overlaps(12, 13)
+    assert not index.overlaps(0, 10)
+    assert not index.overlaps(25, 30)
+    assert not index.overlaps(40, 50)
+
+
+def test_span_index_ignores_empty_spans() -> None:
+    index = SpanIndex()
+    index.claim([(5, 5)])
+    assert len(index) == 0
+    assert not index.overlaps(0, 10)
+
+
+def test_lower_precedence_scheme_skips_claimed_region() -> None:
+    url_calls: list[str] = []
+    word_calls: list[str] = []
+    schemes = [
+        make_scheme("url", r"https://\S+", url_calls),
+        make_scheme("word", r"[a-z./]+", word_calls),
+    ]
+    found = collect(schemes, "open https://x.org/src/a.py now")
+    assert found == ["https://x.org/src/a.py", "open", "now"]
+    # The URL fragments never reached the second scheme's pre-handler
+    assert word_calls == ["open", "now"]
+
+
+def test_plain_scheme_does_not_rematch_hyperlink_text() -> None:
+    osc8_calls: list[str] = []
+    word_calls: list[str] = []
+    data = f"see {ESC}]8;;https://x.org/a{ST}docs{ESC}]8;;{ST} here"
+    schemes = [
+        make_scheme("link", r"\x1b\]8;;[^\x1b]*\x1b\\(?P<text>.*?)\x1b\]8;;\x1b\\", osc8_calls, escaped=True),
+        make_scheme("word", r"[a-z]+", word_calls),
+    ]
+    collect(schemes, data)
+    assert len(osc8_calls) == 1
+    assert word_calls == ["see", "here"]
+
+
+def test_scheme_does_not_suppress_its_own_overlapping_hits() -> None:
+    calls: list[str] = []
+    scheme = make_scheme("word", r"a b", calls)
+    scheme["regex"].append(re.compile(r"a"))
+    assert collect([scheme], "a b") == ["a b", "a"]
+
+
+def test_rejected_matches_claim_nothing() -> None:
+    first_calls: list[str] = []
+    second_calls: list[str] = []
+    schemes = [
+        make_scheme("never", r"foo", first_calls, accept=False),
+        make_scheme("word", r"[a-z]+", second_calls),
+    ]
+    assert collect(schemes, "foo bar") == ["foo", "bar"]
+
+
+def test_pure_scheme_handles_each_text_once() -> None:
+    calls: list[str] = []
+    scheme = make_scheme("word", r"[a-z]+", calls)
+    scheme["pure"] = True
+    memo = HandlerMemo()
+    assert collect([scheme], " ".join(["foo", "bar"] * 1000), memo) == ["foo", "bar"]
+    assert calls == ["foo", "bar"]
+    # The older repeats are dropped before reaching the memo
+    assert (memo.pre_hits, memo.pre_misses) == (0, 2)
+
+
+def test_pure_scheme_repeats_still_claim_their_region() -> None:
+    url_calls: list[str] = []
+    word_calls: list[str] = []
+    url = make_scheme("url", r"https://\S+", url_calls)
+    url["pure"] = True
+    schemes = [url, make_scheme("word", r"[a-z]+", word_calls)]
+    collect(schemes, "https://x.org/a https://x.org/a")
+    assert url_calls == ["https://x.org/a"]
+    assert word_calls == []
+
+
+def test_pure_scheme_skips_text_listed_by_earlier_scheme() -> None:
+    first_calls: list[str] = []
+    second_calls: list[str] = []
+    second = make_scheme("word", r"[a-z]+", second_calls)
+    second["pure"] = True
+    schemes = [make_scheme("foo", r"^foo", first_calls), second]
+    # `foo` is listed by the first scheme, which only claims the leading one.
+    # The second scheme does not handle the other occurrence, whose result
+    # would be discarded anyway.
+    assert collect(schemes, "foo x foo") == ["foo", "x"]
+    assert second_calls == ["x"]
+
+
+def test_impure_scheme_is_called_for_every_occurrence() -> None:
+    calls: list[str] = []
+    memo = HandlerMemo()
+    collect([make_scheme("word", r"[a-z]+", calls)], "foo foo foo", memo)
+    assert calls == ["foo"] * 3
+    assert (memo.pre_hits, memo.pre_misses) == (0, 0)
+
+
+def test_memo_caches_post_handler_of_pure_scheme() -> None:
+    calls: list[str] = []
+
+    def post_handler(match: re.Match[str]) -> PostHandledMatch:
+        calls.append(match.group(0))
+        return {"url": match.group(0)}
+
+    scheme = make_scheme("word", r"[a-z]+", [])
+    scheme["pure"] = True
+    scheme["post_handler"] = post_handler
+    memo = HandlerMemo()
+    for m in re.finditer(r"[a-z]+", "abc abc"):
+        assert memo.post_handle(scheme, m) == {"url": "abc"}
+    assert calls == ["abc"]
+    assert (memo.post_hits, memo.post_misses) == (1, 1)
+
+
+def test_batch_pre_handler_receives_all_matches_at_once() -> None:
+    batches: list[list[str]] = []
+
+    def pre_handler_batch(matches: list[re.Match[str]]) -> list[PreHandledMatch | None]:
+        batches.append([m.group(0) for m in matches])
+        return [
+            {"display_text": m.group(0), "tag": "word"} if m.group(0) != "b" else None
+            for m in matches
+        ]
+
+    scheme = make_scheme("word", r"[a-z]", [])
+    scheme["pre_handler_batch"] = pre_handler_batch
+    assert collect([scheme], "a b c") == ["a", "c"]
+    assert batches == [["a", "b", "c"]]
+
+
+def test_pure_batch_pre_handler_sees_each_text_once() -> None:
+    batches: list[list[str]] = []
+
+    def pre_handler_batch(matches: list[re.Match[str]]) -> list[PreHandledMatch | None]:
+        batches.append([m.group(0) for m in matches])
+        return [{"display_text": m.group(0), "tag": "word"} for m in matches]
+
+    scheme = make_scheme("word", r"[a-z]", [])
+    scheme["pure"] = True
+    scheme["pre_handler_batch"] = pre_handler_batch
+    memo = HandlerMemo()
+    # Only the most recent occurrence of each text is handled
+    assert collect([scheme], "a b a b a", memo) == ["b", "a"]
+    assert batches == [["b", "a"]]
+    assert (memo.pre_hits, memo.pre_misses) == (0, 2)
+
+
+def test_batch_pre_handler_must_return_one_result_per_match() -> None:
+    scheme = make_scheme("word", r"[a-z]", [])
+    scheme["pre_handler_batch"] = lambda matches: []
+    with pytest.raises(ValueError):
+        collect([scheme], "a b")
+
+
+def test_batch_without_batch_pre_handler_handles_one_by_one() -> None:
+    calls: list[str] = []
+    scheme = make_scheme("word", r"[a-z]", calls, accept=False)
+    matches = list(re.finditer(r"[a-z]", "a b"))
+    assert HandlerMemo().pre_handle_batch(scheme, matches) == [None, None]
+    assert calls == ["a", "b"]
+
+
+def newest_first(items: list) -> list[tuple[str, int]]:
+    return [(item[1], item[2]) for item in sorted(items, key=lambda x: x[2], reverse=True)]
+
+
+def test_collect_newest_matches_full_scan_on_unique_texts() -> None:
+    lines = [f"see url{i} and {ESC}]8;;https://x/{i}{ST}link{i}{ESC}]8;;{ST}" for i in range(300)]
+    escaped = "\n".join(lines) + "\n"
+    plain = strip_escapes(escaped)
+    schemes = [
+        make_scheme("osc8", hyperlink_regex().pattern, [], escaped=True),
+        make_scheme("url", r"url\d+", []),
+    ]
+    full = collect_items(schemes, plain, escaped, offset_translator(escaped))
+    assert len(full) == 600
+    newest = collect_newest(schemes, plain, escaped, 10**6)
+    assert newest_first(newest) == newest_first(full)
+
+
+@pytest.mark.parametrize("pure", [False, True])
+def test_collect_newest_matches_full_scan_on_overlapping_schemes(pure: bool) -> None:
+    # `k<n>` is owned by the `ref` scheme, which only matches some of the
+    # older lines, while the `k` scheme also matches it in the newer ones
+    lines = [
+        f"ref:k{i * 7 % 50}" if i % 3 == 0 else f"k{i * 7 % 50} {i % 40}z"
+        for i in range(400)
+    ]
+    content = "\n".join(lines)
+    ref = make_scheme("ref", r"ref:(?P<k>k\d+)", [])
+    ref["canonical"] = lambda match: match.group("k")
+    schemes = [ref, make_scheme("k", r"k\d+", []), make_scheme("num", r"\d+z?", [])]
+    for scheme in schemes:
+        scheme["pure"] = pure
+    full = collect_items(schemes, content, content, lambda i: i)
+    newest = collect_newest(schemes, content, content, len(full))
+    assert sorted((item[0]["tag"], item[1], item[2]) for item in newest) == sorted(
+        (item[0]["tag"], item[1], item[2]) for item in full
+    )
+
+
+def test_collect_newest_stops_after_limit() -> None:
+    calls: list[str] = []
+    content = "\n".join(f"url{i}" for i in range(10 * FIRST_CHUNK_LINES))
+    items = collect_newest([make_scheme("url", r"url\d+", calls)], content, content, 5)
+    # Only the newest chunk was scanned
+    assert len(calls) == FIRST_CHUNK_LINES
+    assert newest_first(items)[0] == (f"url{10 * FIRST_CHUNK_LINES - 1}", content.rindex("url"))
+    assert all(content[pos:].startswith(text) for text, pos in newest_first(items))
+
+
+def test_collect_newest_lists_repeated_text_once() -> None:
+    content = "\n".join(["dup"] + ["x"] * (2 * FIRST_CHUNK_LINES) + ["dup"])
+    items = collect_newest([make_scheme("w", r"dup", [])], content, content, 10)
+    assert newest_first(items) == [("dup", content.rindex("dup"))]
+
+
+def test_collect_newest_spends_one_budget_per_scheme(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(configs, "handler_budget", 50)
+    calls: list[str] = []
+
+    def slow(match: re.Match[str]) -> PreHandledMatch | None:
+        calls.append(match.group(0))
+        time.sleep(0.01)
+        return None
+
+    scheme = make_scheme("w", r"w\d+", [])
+    scheme["pre_handler"] = slow
+    scheme["budgeted"] = True
+    content = "\n".join(f"w{i}" for i in range(10 * FIRST_CHUNK_LINES))
+    collect_newest([scheme], content, content, 10**6)
+    # The budget is not started again for every chunk of lines
+    assert 0 < len(calls) <= 7
+
+
+def test_deadline_returns_items_ready_so_far() -> None:
+    calls: list[str] = []
+
+    def slow(match: re.Match[str]) -> PreHandledMatch | None:
+        calls.append(match.group(0))
+        time.sleep(0.02)
+        return {"display_text": match.group(0), "tag": "w"}
+
+    first = make_scheme("w", r"w\d+", [])
+    first["pre_handler"] = slow
+    second = make_scheme("x", r"x\d+", calls)
+    content = " ".join(f"w{i}" for i in range(50)) + " x1"
+    deadline = Deadline(50)
+    items = collect_items(
+        [first, second], content, content, lambda i: i, deadline=deadline
+    )
+    assert deadline.reached
+    assert 0 < len(items) == len(calls) < 50
+    assert "x1" not in calls
+
+
+def test_deadline_stops_batches_and_keeps_their_results() -> None:
+    batches: list[int] = []
+
+    def slow_batch(matches: list[re.Match[str]]) -> list[PreHandledMatch | None]:
+        batches.append(len(matches))
+        time.sleep(0.03)
+        return [{"display_text": m.group(0), "tag": "w"} for m in matches]
+
+    scheme = make_scheme("w", r"w\d+", [])
+    scheme["pre_handler_batch"] = slow_batch
+    content = " ".join(f"w{i}" for i in range(1000))
+    deadline = Deadline(20)
+    items = collect_items([scheme], content, content, lambda i: i, deadline=deadline)
+    assert deadline.reached
+    # The batch running at the deadline is completed, and all of it is listed
+    assert batches == [FIRST_BATCH_SIZE]
+    assert len(items) == FIRST_BATCH_SIZE
+
+
+def test_deadline_not_reached_keeps_all_items() -> None:
+    deadline = Deadline(10_000)
+    items = collect_items(
+        [make_scheme("w", r"w\d+", [])], "w1 w2", "w1 w2", lambda i: i, deadline=deadline
+    )
+    assert [item[1] for item in items] == ["w1", "w2"]
+    assert not deadline.reached
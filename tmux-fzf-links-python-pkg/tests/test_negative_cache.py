@@ -0,0 +1,155 @@
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from tmux_fzf_links import negative_cache
+from tmux_fzf_links.configs import configs
+from tmux_fzf_links.fs_metadata import fs_metadata
+from tmux_fzf_links.negative_cache import NegativeCache
+from tmux_fzf_links.schemes import resolve_paths
+
+WORDS = ["the", "error", "done", "failed"]
+
+
+@pytest.fixture
+def pane_dir(in_tmp_dir: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    pane = in_tmp_dir / "pane"
+    pane.mkdir()
+    age(pane)
+    monkeypatch.chdir(pane)
+    return pane
+
+
+def age(directory: Path) -> None:
+    # Directories modified in the last seconds are not recorded
+    past = time.time() - 60
+    os.utime(directory, (past, past))
+
+
+def start_run(pane: Path, ttl: int = 60) -> None:
+    fs_metadata.clear()
+    fs_metadata.negatives = NegativeCache.load(str(pane), ttl)
+
+
+def end_run() -> None:
+    assert fs_metadata.negatives is not None
+    fs_metadata.negatives.save()
+
+
+def probe(words: list[str]) -> list[str]:
+    return [word for word in words if fs_metadata.info(word) is not None]
+
+
+def test_missing_names_are_not_probed_again(pane_dir: Path) -> None:
+    start_run(pane_dir)
+    assert probe(WORDS) == []
+    end_run()
+
+    start_run(pane_dir)
+    assert probe(WORDS) == []
+    # Only the modification time of the pane directory is checked
+    assert fs_metadata.syscalls == 1
+
+
+def test_new_file_invalidates_its_directory(pane_dir: Path) -> None:
+    start_run(pane_dir)
+    assert probe(WORDS) == []
+    end_run()
+
+    (pane_dir / "done").write_text("")
+    start_run(pane_dir)
+    assert probe(WORDS) == ["done"]
+
+
+def test_entries_expire(pane_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    start_run(pane_dir, ttl=60)
+    assert probe(WORDS) == []
+    end_run()
+
+    now = negative_cache.time.time()
+    monkeypatch.setattr(negative_cache.time, "time", lambda: now + 61)
+    start_run(pane_dir, ttl=60)
+    assert probe(WORDS) == []
+    assert fs_metadata.syscalls > 1
+
+
+def test_cache_is_kept_per_pane_directory(pane_dir: Path, tmp_path: Path) -> None:
+    start_run(pane_dir)
+    assert probe(WORDS) == []
+    end_run()
+
+    age(tmp_path)
+    start_run(tmp_path)
+    assert probe(WORDS) == []
+    assert fs_metadata.syscalls > 1
+
+
+def test_entries_of_missing_directories_are_not_recorded(pane_dir: Path) -> None:
+    start_run(pane_dir)
+    assert probe(["nodir/a"]) == []
+    end_run()
+    assert not list((pane_dir.parent / "cache").rglob("*.json"))
+
+
+def test_unreadable_cache_file_is_ignored(pane_dir: Path) -> None:
+    start_run(pane_dir)
+    assert fs_metadata.negatives is not None
+    fs_metadata.negatives.path.write_text("{not json")
+    start_run(pane_dir)
+    assert probe(WORDS) == []
+    end_run()
+    start_run(pane_dir)
+    assert probe(WORDS) == []
+    assert fs_metadata.syscalls == 1
+
+
+def test_recently_modified_directory_is_not_recorded(pane_dir: Path) -> None:
+    (pane_dir / "other").write_text("")
+    start_run(pane_dir)
+    assert probe(WORDS) == []
+    end_run()
+    start_run(pane_dir)
+    assert probe(WORDS) == []
+    assert fs_metadata.syscalls > 1
+
+
+def test_most_recently_found_names_are_kept(
+    pane_dir: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(negative_cache, "MAX_NAMES_PER_DIRECTORY", 3)
+    start_run(pane_dir)
+    assert probe(["a", "b", "c", "d"]) == []
+    end_run()
+
+    start_run(pane_dir)
+    assert probe(["b", "c", "d"]) == []
+    assert fs_metadata.syscalls == 1
+    # Found again, so it is now the most recent
+    assert probe(["a"]) == []
+    assert fs_metadata.syscalls > 1
+    end_run()
+
+    start_run(pane_dir)
+    assert probe(["c", "d", "a"]) == []
+    assert fs_metadata.syscalls == 1
+    assert probe(["b"]) == []
+    assert fs_metadata.syscalls > 1
+
+
+def test_parallel_lookups_use_and_feed_the_cache(
+    pane_dir: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(configs, "path_lookup", "parallel")
+    monkeypatch.setattr(configs, "project_index", False)
+    start_run(pane_dir)
+    found, unknown = resolve_paths(WORDS)
+    assert found == dict.fromkeys(WORDS) and unknown == set()
+    end_run()
+
+    start_run(pane_dir)
+    found, _ = resolve_paths(WORDS)
+    assert found == dict.fromkeys(WORDS)
+    # The modification time of the pane directory, once per word
+    assert fs_metadata.syscalls == len(WORDS)
@@ -0,0 +1,206 @@
+import re
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from tmux_fzf_links import path_lookup, schemes
+from tmux_fzf_links.colors import colors
+from tmux_fzf_links.configs import configs
+from tmux_fzf_links.default_schemes import file_finditer, file_pre_handler_batch
+from tmux_fzf_links.fs_metadata import Probe, fs_metadata
+from tmux_fzf_links.path_lookup import (
+    lookup_concurrently,
+    mount_points,
+    on_network_mount,
+)
+
+MOUNTS = """\
+sysfs /sys sysfs rw 0 0
+/dev/sda1 / ext4 rw 0 0
+server:/export /home/me/nfs nfs4 rw 0 0
+/dev/sdb1 /home/me/nfs/local ext4 rw 0 0
+me@host:/ /mnt/remote\\040box fuse.sshfs rw 0 0
+/dev/sdc1 /media/usb fuseblk rw 0 0
+"""
+
+
+@pytest.fixture
+def mounts(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    table = tmp_path / "mounts"
+    table.write_text(MOUNTS)
+    monkeypatch.setattr(path_lookup, "_MOUNTS_FILE", str(table))
+    mount_points.cache_clear()
+    yield
+    mount_points.cache_clear()
+
+
+@pytest.mark.usefixtures("mounts")
+@pytest.mark.parametrize(
+    ("path", "network"),
+    [
+        ("/home/me/src/a.py", False),
+        ("/home/me/nfs", True),
+        ("/home/me/nfs/src/a.py", True),
+        ("/home/me/nfsx/a.py", False),
+        ("/home/me/nfs/local/a.py", False),
+        ("/mnt/remote box/a.py", True),
+        ("/media/usb/a.py", False),
+    ],
+)
+def test_on_network_mount(path: str, network: bool) -> None:
+    assert on_network_mount([path]) is network
+
+
+@pytest.mark.usefixtures("mounts")
+def test_mount_table_is_scanned_once_per_directory(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    scanned: list[str] = []
+    scan = path_lookup._on_network_mount
+
+    def counting(path: str, mounts: tuple[tuple[str, bool], ...]) -> bool:
+        scanned.append(path)
+        return scan(path, mounts)
+
+    monkeypatch.setattr(path_lookup, "_on_network_mount", counting)
+    paths = [f"/home/me/src/d{i % 3}/f{i}.py" for i in range(1000)]
+    assert not on_network_mount(paths)
+    assert sorted(scanned) == [f"/home/me/src/d{i}" for i in range(3)]
+
+
+def test_lookups_run_concurrently() -> None:
+    def lookup(key: str) -> str:
+        time.sleep(0.05)
+        return key.upper()
+
+    start = time.monotonic()
+    results, unknown = lookup_concurrently(list("abcdefgh"), lookup, timeout=1)
+    assert results == {key: key.upper() for key in "abcdefgh"}
+    assert unknown == set()
+    assert time.monotonic() - start < 0.3
+
+
+def test_lookups_timing_out_are_unknown() -> None:
+    release = threading.Event()
+
+    def lookup(key: str) -> str:
+        if key.startswith("slow"):
+            release.wait(5)
+        return key
+
+    keys = ["a", "slow1", "b", "slow2", "c"]
+    start = time.monotonic()
+    results, unknown = lookup_concurrently(keys, lookup, timeout=0.1, workers=4)
+    release.set()
+    assert results == {"a": "a", "b": "b", "c": "c"}
+    assert unknown == {"slow1", "slow2"}
+    assert time.monotonic() - start < 1
+
+
+def test_keys_are_given_up_once_every_worker_is_stuck() -> None:
+    release = threading.Event()
+    calls: list[str] = []
+
+    def lookup(key: str) -> str:
+        calls.append(key)
+        release.wait(5)
+        return key
+
+    keys = [f"k{i}" for i in range(100)]
+    start = time.monotonic()
+    results, unknown = lookup_concurrently(keys, lookup, timeout=0.1, workers=4)
+    release.set()
+    assert results == {}
+    assert unknown == set(keys)
+    # The stuck threads may be replaced, until all of them are stuck
+    assert len(calls) < 2 * 4
+    assert time.monotonic() - start < 1
+
+
+def test_lookup_errors_propagate() -> None:
+    def lookup(key: str) -> str:
+        raise PermissionError(key)
+
+    with pytest.raises(PermissionError):
+        lookup_concurrently(["a", "b"], lookup, timeout=1)
+
+
+def test_paths_timing_out_are_dimmed(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(configs, "max_path_length", 255)
+    monkeypatch.setattr(configs, "path_lookup", "parallel")
+    monkeypatch.setattr(configs, "path_timeout", 100)
+    fs_metadata.clear()
+    colors.enable_colors(True)
+    (tmp_path / "a.py").write_text("")
+    release = threading.Event()
+    probe = schemes.probe
+
+    def hanging_probe(path: str, missing: object = None) -> Probe:
+        if path == "hung.py":
+            release.wait(5)
+        return probe(path)
+
+    monkeypatch.setattr(schemes, "probe", hanging_probe)
+    matches: list[re.Match[str]] = [
+        next(iter(file_finditer(text))) for text in ("a.py", "hung.py", "gone.py")
+    ]
+    try:
+        monkeypatch.setattr(configs, "unknown_paths", "drop")
+        assert [r and r["tag"] for r in file_pre_handler_batch(matches)] == [
+            "file",
+            None,
+            None,
+        ]
+        monkeypatch.setattr(configs, "unknown_paths", "dim")
+        results = file_pre_handler_batch(matches)
+        assert results[1] == {"display_text": "\033[2mhung.py\033[0m", "tag": "file"}
+        assert results[2] is None
+    finally:
+        release.set()
+        colors.enable_colors(False)
+        fs_metadata.clear()
+
+
+def test_lookups_given_up_leave_no_trace(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(configs, "path_lookup", "parallel")
+    monkeypatch.setattr(configs, "path_timeout", 50)
+    fs_metadata.clear()
+    release = threading.Event()
+    done = threading.Event()
+    probe = schemes.probe
+
+    def hanging_probe(path: str, missing: object = None) -> Probe:
+        if path == "hung.py":
+            release.wait(5)
+            try:
+                return probe(path)
+            finally:
+                done.set()
+        return probe(path)
+
+    monkeypatch.setattr(schemes, "probe", hanging_probe)
+    try:
+        _, unknown = schemes.resolve_paths(["a.py", "hung.py"])
+        assert unknown == {"hung.py"}
+        syscalls = fs_metadata.syscalls
+        # The abandoned thread completes its probe after the lookup gave up
+        release.set()
+        assert done.wait(5)
+        time.sleep(0.01)
+        assert fs_metadata.syscalls == syscalls
+        # Nothing was cached for the path, which is found once created
+        (tmp_path / "hung.py").write_text("")
+        assert fs_metadata.info("hung.py") is not None
+    finally:
+        release.set()
+        colors.enable_colors(False)
+        fs_metadata.clear()
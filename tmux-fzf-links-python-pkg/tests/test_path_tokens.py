@@ -0,0 +1,96 @@
+import random
+import re
+
+import pytest
+
+from tmux_fzf_links.path_tokens import MAX_PATH_LENGTH, is_path_like, path_candidates
+
+# The three regexes the file scheme ran before the tokenizer replaced them. The
+# tokenizer must report exactly the candidates they did, in the same order.
+LEGACY = [
+    re.compile(
+        rf"(?P<link>^[^<>:\"\\|?*\x00-\x1F]{{1,{MAX_PATH_LENGTH}}})(\:(?P<line>\d+))?",
+        re.MULTILINE,
+    ),
+    re.compile(
+        rf"'(?P<link>[^:'\"\\|?*\x00-\x1F]{{1,{MAX_PATH_LENGTH}}})'(\:(?P<line>\d+))?"
+    ),
+    re.compile(
+        rf"(?P<link>[^ :'\"\\|?*\x00-\x1F]{{1,{MAX_PATH_LENGTH}}})(\:(?P<line>\d+))?"
+    ),
+]
+
+MAX_BYTES = 255
+
+Candidate = tuple[tuple[int, int], str, str | None]
+
+
+def legacy(text: str, max_bytes: int = MAX_BYTES) -> list[Candidate]:
+    return [
+        (m.span(), m.group("link"), m.group("line"))
+        for regex in LEGACY
+        for m in regex.finditer(text)
+        if is_path_like(m.group("link"), max_bytes)
+    ]
+
+
+def tokenized(text: str, max_bytes: int = MAX_BYTES) -> list[Candidate]:
+    return [
+        (m.span(), m.group("link"), m.group("line"))
+        for m in path_candidates(text, max_bytes)
+    ]
+
+
+CORPUS = [
+    "",
+    "\n\n",
+    "src/main.py:42: error: missing return",
+    "  File \"/usr/lib/python3.12/json/__init__.py\", line 293, in load",
+    "see 'My Documents/report final.pdf':3 and 'x'",
+    "''quoted'' and 'unterminated",
+    "a:12:b:c 'a':7'b'",
+    "<div> ~/notes.md ~ . .. ... ./run.sh",
+    "build/out\tlog.txt\r\nnext line > redirect",
+    "https://example.com/a/b?c=d#e git@github.com:owner/repo.git",
+    "drwxr-xr-x  5 user staff  160 Jan  1 12:00 .config",
+    "ünïcødé/файл.txt:٣ mixed",
+    "a" * (MAX_PATH_LENGTH + 10) + ":9 tail",
+    "'" + "b" * (MAX_PATH_LENGTH + 1) + "' after",
+    "c" * (2 * MAX_PATH_LENGTH + 3) + "\n" + "d" * 300,
+]
+
+
+@pytest.mark.parametrize("text", CORPUS)
+def test_matches_legacy_regexes_on_corpus(text: str) -> None:
+    assert tokenized(text) == legacy(text)
+
+
+@pytest.mark.parametrize("text", CORPUS)
+def test_matches_legacy_regexes_without_byte_limit(text: str) -> None:
+    assert tokenized(text, 10**6) == legacy(text, 10**6)
+
+
+def test_matches_legacy_regexes_on_random_input() -> None:
+    rng = random.Random(42)
+    alphabet = "ab./ :'\"<>|\t\n\r~12*?\\é٣"
+    for _ in range(5000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 80)))
+        assert tokenized(text) == legacy(text), repr(text)
+
+
+def test_candidates_keep_link_and_line_groups() -> None:
+    # The line-start candidate keeps the quotes, the quoted one strips them
+    line_start, quoted, *_ = path_candidates("'a b.txt':12", MAX_BYTES)
+    assert (line_start.group("link"), line_start.group("line")) == ("'a b.txt'", "12")
+    assert (quoted.group("link"), quoted.group("line")) == ("a b.txt", "12")
+    assert quoted.group(0) == "'a b.txt':12"
+
+
+@pytest.mark.parametrize("link", ["", ".", "..", "~", "x" * (MAX_BYTES + 1), "é" * 200])
+def test_rejects_tokens_that_cannot_be_paths(link: str) -> None:
+    assert not is_path_like(link, MAX_BYTES)
+
+
+@pytest.mark.parametrize("link", ["a", ".env", "~/x", "../up", "x" * MAX_BYTES])
+def test_accepts_path_like_tokens(link: str) -> None:
+    assert is_path_like(link, MAX_BYTES)
@@ -0,0 +1,82 @@
+import logging
+import sys
+from pathlib import Path
+
+import pytest
+
+from tmux_fzf_links.plugins import discover_plugins, load_plugin_schemes
+
+SCHEMES_MODULE = """
+import re
+from tmux_fzf_links.export import OpenerType
+
+user_schemes = [
+    {
+        "tags": ("ticket",),
+        "opener": OpenerType.BROWSER,
+        "pre_handler": None,
+        "post_handler": None,
+        "regex": [re.compile(r"TICKET-\\d+")],
+    }
+]
+"""
+
+
+@pytest.fixture
+def plugin_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    package = tmp_path / "fzf_links_ticket"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    (package / "manifest.py").write_text(
+        'plugin = {"tags": ["ticket"], "triggers": ["TICKET-"],'
+        ' "schemes": "fzf_links_ticket.schemes:user_schemes"}\n'
+    )
+    (package / "schemes.py").write_text(SCHEMES_MODULE)
+    dist_info = tmp_path / "fzf_links_ticket-0.1.dist-info"
+    dist_info.mkdir()
+    (dist_info / "METADATA").write_text(
+        "Metadata-Version: 2.1\nName: fzf-links-ticket\nVersion: 0.1\n"
+    )
+    (dist_info / "entry_points.txt").write_text(
+        "[tmux_fzf_links.schemes]\nticket = fzf_links_ticket.manifest:plugin\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    for name in ("fzf_links_ticket", "fzf_links_ticket.manifest", "fzf_links_ticket.schemes"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    return tmp_path
+
+
+def test_plugin_is_discovered_without_importing_its_schemes(plugin_dir: Path) -> None:
+    plugins = discover_plugins()
+    assert plugins == [
+        (
+            "ticket",
+            {
+                "tags": ["ticket"],
+                "triggers": ["TICKET-"],
+                "schemes": "fzf_links_ticket.schemes:user_schemes",
+            },
+        )
+    ]
+    assert "fzf_links_ticket.schemes" not in sys.modules
+
+
+def test_plugin_schemes_are_imported_only_when_triggered(plugin_dir: Path) -> None:
+    plugins = discover_plugins()
+    assert load_plugin_schemes(plugins, ["nothing to see"]) == []
+    assert "fzf_links_ticket.schemes" not in sys.modules
+
+    assert load_plugin_schemes(plugins, ["no", "see TICKET-12"], {"url"}) == []
+    assert "fzf_links_ticket.schemes" not in sys.modules
+
+    schemes = load_plugin_schemes(plugins, ["see TICKET-12"])
+    assert [scheme["tags"] for scheme in schemes] == [("ticket",)]
+
+
+def test_broken_plugin_is_skipped(caplog: pytest.LogCaptureFixture) -> None:
+    plugins = [
+        ("broken", {"tags": ["x"], "triggers": [], "schemes": "no_such_module:schemes"})
+    ]
+    with caplog.at_level(logging.ERROR):
+        assert load_plugin_schemes(plugins, [""]) == []  # pyright: ignore[reportArgumentType]
+    assert "failed to load scheme plugin 'broken'" in caplog.text
@@ -0,0 +1,159 @@
+import subprocess
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from tmux_fzf_links import project_index
+from tmux_fzf_links.configs import configs
+from tmux_fzf_links.fs_metadata import fs_metadata
+from tmux_fzf_links.project_index import ProjectIndex, project_indexes
+from tmux_fzf_links.schemes import heuristic_find_file, resolve_paths
+
+FILES = [
+    "README.md",
+    "src/pkg/mod.py",
+    "src/pkg/util.py",
+    "src/other/util.py",
+    "docs/guide.md",
+]
+
+
+def git(root: Path, *args: str) -> None:
+    subprocess.run(["git", "-C", str(root), *args], check=True, capture_output=True)
+
+
+def new_run() -> None:
+    fs_metadata.clear()
+    project_indexes.clear()
+
+
+@pytest.fixture
+def repo(in_tmp_dir: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Path]:
+    monkeypatch.setattr(configs, "project_index", True)
+    root = in_tmp_dir / "repo"
+    for file in FILES:
+        (root / file).parent.mkdir(parents=True, exist_ok=True)
+        (root / file).write_text("")
+    git(root, "init", "-q")
+    git(root, "add", ".")
+    monkeypatch.chdir(root / "docs")
+    new_run()
+    yield root.resolve()
+    new_run()
+
+
+def test_suffix_lookup() -> None:
+    index = ProjectIndex.from_files("/r", FILES)
+    assert index.find("mod.py") == ["src/pkg/mod.py"]
+    assert index.find("pkg/mod.py") == ["src/pkg/mod.py"]
+    assert index.find("src/pkg/mod.py") == ["src/pkg/mod.py"]
+    assert len(index.find("util.py")) == 2
+    assert index.find("pkg/util.py") == ["src/pkg/util.py"]
+    assert index.find("kg/mod.py") == []
+    assert index.find("mod") == []
+
+
+def test_path_relative_to_repository_root(repo: Path) -> None:
+    assert heuristic_find_file("src/pkg/mod.py") == repo / "src/pkg/mod.py"
+
+
+@pytest.mark.parametrize(
+    ("text", "found"),
+    [
+        (".../pkg/mod.py", "src/pkg/mod.py"),
+        ("…/pkg/mod.py", "src/pkg/mod.py"),
+        ("...kg/util.py", None),
+        ("...rc/pkg/util.py", "src/pkg/util.py"),
+        ("pkg/util.py", "src/pkg/util.py"),
+        ("README.md", "README.md"),
+        ("util.py", None),
+        ("the", None),
+        ("../src/pkg/mod.py", "src/pkg/mod.py"),
+        ("/src/pkg/mod.py", None),
+    ],
+)
+def test_partial_and_truncated_paths(repo: Path, text: str, found: str | None) -> None:
+    assert heuristic_find_file(text) == (repo / found if found else None)
+
+
+def test_direct_lookup_comes_first(repo: Path) -> None:
+    (repo / "docs" / "mod.py").write_text("")
+    assert heuristic_find_file("mod.py") == repo / "docs" / "mod.py"
+
+
+def test_deleted_file_is_not_found(repo: Path) -> None:
+    (repo / "src" / "pkg" / "mod.py").unlink()
+    assert heuristic_find_file(".../pkg/mod.py") is None
+
+
+def test_index_is_cached_until_the_git_index_changes(
+    repo: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    listings: list[str] = []
+    ls_files = project_index._ls_files
+
+    def counting_ls_files(root: str) -> list[str] | None:
+        listings.append(root)
+        return ls_files(root)
+
+    monkeypatch.setattr(project_index, "_ls_files", counting_ls_files)
+    assert heuristic_find_file("pkg/mod.py") is not None
+    new_run()
+    assert heuristic_find_file("pkg/mod.py") is not None
+    assert len(listings) == 1
+
+    (repo / "src" / "new.py").write_text("")
+    git(repo, "add", "src/new.py")
+    new_run()
+    assert heuristic_find_file("...c/new.py") == repo / "src" / "new.py"
+    assert len(listings) == 2
+
+
+def test_disabled_or_outside_a_repository(
+    repo: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(configs, "project_index", False)
+    assert heuristic_find_file("pkg/mod.py") is None
+    monkeypatch.setattr(configs, "project_index", True)
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    monkeypatch.chdir(outside)
+    new_run()
+    assert heuristic_find_file("pkg/mod.py") is None
+
+
+def test_parallel_lookups_use_the_index(
+    repo: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(configs, "path_lookup", "parallel")
+    found, unknown = resolve_paths([".../pkg/mod.py", "guide.md", "the"])
+    assert found == {
+        ".../pkg/mod.py": repo / "src/pkg/mod.py",
+        "guide.md": repo / "docs/guide.md",
+        "the": None,
+    }
+    assert unknown == set()
+
+
+def test_slow_index_is_bounded_by_the_path_timeout(
+    repo: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(configs, "path_lookup", "parallel")
+    monkeypatch.setattr(configs, "path_timeout", 50)
+    release = threading.Event()
+    ls_files = project_index._ls_files
+
+    def hanging_ls_files(root: str) -> list[str] | None:
+        release.wait(5)
+        return ls_files(root)
+
+    monkeypatch.setattr(project_index, "_ls_files", hanging_ls_files)
+    start = time.monotonic()
+    found, unknown = resolve_paths(["src/pkg/mod.py", "guide.md"])
+    assert time.monotonic() - start < 1
+    release.set()
+    assert found == {"src/pkg/mod.py": None, "guide.md": repo / "docs/guide.md"}
+    assert unknown == {"src/pkg/mod.py"}
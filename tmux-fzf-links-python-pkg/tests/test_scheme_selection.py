@@ -0,0 +1,46 @@
+import logging
+from pathlib import Path
+
+import pytest
+
+from tmux_fzf_links.__main__ import select_schemes
+from tmux_fzf_links.colors import colors
+from tmux_fzf_links.default_schemes import default_schemes
+
+
+def tags_of(schemes) -> list[tuple[str, ...]]:
+    return [tuple(scheme["tags"]) for scheme in schemes]
+
+
+def test_empty_allowlist_keeps_every_scheme() -> None:
+    assert select_schemes(default_schemes, "") == default_schemes
+
+
+def test_allowlist_keeps_schemes_with_any_requested_tag() -> None:
+    selected = select_schemes(default_schemes, "url, link")
+    assert tags_of(selected) == [
+        ("link", "PR", "issue", "commit"),
+        ("url",),
+    ]
+    assert tags_of(select_schemes(default_schemes, "code err.")) == [
+        ("code err.", "Python")
+    ]
+
+
+def test_unknown_tag_is_reported(caplog: pytest.LogCaptureFixture) -> None:
+    with caplog.at_level(logging.WARNING):
+        assert select_schemes(default_schemes, "nope") == []
+    assert "no scheme with tag 'nope'" in caplog.text
+
+
+def test_ls_colors_are_parsed_on_first_use(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    ls_colors = tmp_path / "ls_colors.txt"
+    ls_colors.write_text("di=01;34")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setattr(colors, "_ls_colors", None)
+    colors.defer_ls_colors(str(ls_colors))
+    assert colors._ls_colors is None
+    assert colors.get_file_color(tmp_path) == "01;34"
+    assert colors._ls_colors_pending is None
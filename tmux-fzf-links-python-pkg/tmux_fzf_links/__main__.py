@@ -2,96 +2,59 @@
 #   Author: (c) 2024 Andrea Alberti
 # ===============================================================================
 
-import importlib.util
 import logging
 import os
-import pathlib
 import re
 import subprocess
 import sys
 import unicodedata
-from typing import cast
 
+from .binary_files import binary_files
 from .colors import colors
 from .configs import configs
 from .default_schemes import default_schemes
 from .errors_types import (
     CommandFailed,
     FailedChDir,
+    FailedParsingUserOption,
     FailedTmuxPaneSize,
     FileLoggingNotAllow,
     FzfError,
     FzfNotFound,
     FzfUserInterrupt,
-    LsColorsNotConfigured,
     MissingPostHandler,
     NoBrowserConfigured,
     NoEditorConfigured,
     NoSuitableAppFound,
     PatternNotMatching,
 )
-from .fzf_handler import FzfReturnType, run_fzf
+from .fs_metadata import fs_metadata
+from .fzf_handler import FzfReturnType, maxnum_displayed, run_fzf
+from .git_objects import git_objects
 from .hyperlinks import (
+    canonical_url,
     hyperlink_regex,
     offset_translator,
     parse_links,
     set_links,
     strip_escapes,
 )
+from .isolation import clear_overrun_reports
+from .loading import load_user_schemes
 from .logging import set_up_logger
+from .matching import Deadline, Item, collect_items, collect_newest
+from .memo import HandlerMemo
+from .negative_cache import NegativeCache
 from .opener import (
     OpenerType,
     PostHandledMatch,
-    PreHandledMatch,
     SchemeEntry,
     open_link,
 )
+from .plugins import discover_plugins, load_plugin_schemes
+from .project_index import project_indexes
 
-
-def load_user_module(file_path: str) -> tuple[list[SchemeEntry], list[str]]:
-    """Dynamically load a Python module from the given file path."""
-    try:
-        # Ensure the file path is absolute
-        file_path = str(pathlib.Path(file_path).resolve())
-
-        # Create a module spec
-        spec = importlib.util.spec_from_file_location("user_schemes_module", file_path)
-        if spec and spec.loader:
-            # Create a new module based on the spec
-            user_module = importlib.util.module_from_spec(spec)
-            # Execute the module to populate its namespace
-            spec.loader.exec_module(user_module)
-
-            # Retrieve the user_schemes attribute
-            user_schemes = cast(
-                list[SchemeEntry] | None, getattr(user_module, "user_schemes", None)
-            )
-
-            # Retrieve the rm_default_schemes attribute
-            rm_default_schemes = cast(
-                list[str] | None, getattr(user_module, "rm_default_schemes", None)
-            )
-
-            if user_schemes is None or not isinstance(user_schemes, list):  # pyright: ignore[reportUnnecessaryIsInstance]
-                raise TypeError(
-                    f"'user_schemes' must be a list, got {type(user_schemes)}"
-                )
-
-            if rm_default_schemes is None:
-                rm_default_schemes = []
-            if not isinstance(rm_default_schemes, list):  # pyright: ignore[reportUnnecessaryIsInstance]
-                raise TypeError(
-                    f"'rm_default_schemes' must be a list, got {type(rm_default_schemes)}"
-                )
-
-            return (
-                user_schemes,
-                rm_default_schemes,
-            )
-        else:
-            raise ImportError(f"cannot create a module spec for {file_path}")
-    except Exception as e:
-        raise ImportError(f"failed to load user module: {e}")
+logger = logging.getLogger()  # root logger when no argument is provided
 
 
 def trim_str(s: str) -> str:
@@ -100,17 +63,18 @@ def trim_str(s: str) -> str:
 
 
 def drop_hyperlinked_duplicates(
-    items: list[tuple[PreHandledMatch, str, int, re.Match[str]]],
-) -> list[tuple[PreHandledMatch, str, int, re.Match[str]]]:
+    items: list[Item],
+) -> list[Item]:
     """Remove plain-text matches that resolve to the same target as an OSC 8
     hyperlink already present (e.g. a bare URL that was also hyperlinked to
-    itself). The hyperlink row carries the canonical target, so it wins. Keying
+    itself, or with a trailing slash). The hyperlink row carries the canonical
+    target, so it wins. Keying
     on the target rather than the visible text avoids dropping an unrelated
     match (such as a filename) that merely shares a hyperlink's label.
     """
     hyperlink_re = hyperlink_regex()
     osc8_targets = {
-        item[3].group("uri").strip()
+        canonical_url(item[3].group("uri"))
         for item in items
         if item[3].re is hyperlink_re
     }
@@ -119,7 +83,29 @@ def drop_hyperlinked_duplicates(
     return [
         item
         for item in items
-        if item[3].re is hyperlink_re or item[1].strip() not in osc8_targets
+        if item[3].re is hyperlink_re or canonical_url(item[1]) not in osc8_targets
+    ]
+
+
+def parse_scheme_tags(scheme_tags: str) -> set[str]:
+    """Parse the comma-separated allowlist of scheme tags of a key binding."""
+    return {tag.strip() for tag in scheme_tags.split(",") if tag.strip()}
+
+
+def select_schemes(schemes: list[SchemeEntry], scheme_tags: str) -> list[SchemeEntry]:
+    """Keep the schemes with at least one tag in `scheme_tags`, a comma-separated
+    allowlist. All the schemes are kept when the allowlist is empty.
+
+    This lets a key binding run only the schemes it needs, e.g. only URLs.
+    """
+    allowed = parse_scheme_tags(scheme_tags)
+    if not allowed:
+        return schemes
+    known = {tag for scheme in schemes for tag in scheme["tags"]}
+    for tag in sorted(allowed - known):
+        logger.warning(f"no scheme with tag '{tag}' to select")
+    return [
+        scheme for scheme in schemes if any(tag in allowed for tag in scheme["tags"])
     ]
 
 
@@ -137,6 +123,7 @@ def run(
     ls_colors_filename: str,
     hide_bottom_bar: str,
     hide_fzf_header: str,
+    scheme_tags: str = "",
 ):
 
     # First thing: set up the logger
@@ -172,13 +159,8 @@ def run(
     colors.enable_colors(configs.use_colors)
 
     if colors.enabled:
-        if ls_colors_filename:
-            try:
-                colors.configure_ls_colors_from_file(ls_colors_filename)
-            except LsColorsNotConfigured as e:
-                logger.warning(f"{e}")
-        else:
-            colors.configure_ls_colors_from_env()
+        # Parsed only once a scheme colors a file
+        colors.defer_ls_colors(ls_colors_filename)
 
     # Retrieve the current pane size
     try:
@@ -236,26 +218,37 @@ def run(
     # token to the URL it was hyperlinked to (see hyperlinks.target_for).
     content = strip_escapes(content_escaped)
     set_links(parse_links(content_escaped))
-    # Maps escaped-capture offsets to their plain-text positions, so escaped
-    # schemes sort by on-screen position alongside the plain-text schemes.
-    escaped_to_plain = offset_translator(content_escaped)
 
     # Load user schemes
     user_schemes: list[SchemeEntry]
     rm_default_schemes: list[str]
     if user_schemes_path:
-        loaded_user_module = load_user_module(user_schemes_path)
+        loaded_user_module = load_user_schemes(user_schemes_path)
         user_schemes = loaded_user_module[0]
-        for user_scheme in user_schemes:
-            # Translation for backward compatibility
-            if user_scheme["opener"] == OpenerType.CUSTOM:
-                user_scheme["opener"] = OpenerType.CUSTOM_OPEN
         rm_default_schemes = loaded_user_module[1]
         # print(rm_default_schemes)
     else:
         user_schemes = []
         rm_default_schemes = []
 
+    # Append the schemes of the installed plugins triggered by the capture
+    if configs.plugins:
+        user_schemes = user_schemes + load_plugin_schemes(
+            discover_plugins(),
+            [content, content_escaped],
+            parse_scheme_tags(scheme_tags),
+        )
+
+    for user_scheme in user_schemes:
+        # Translation for backward compatibility
+        if user_scheme["opener"] == OpenerType.CUSTOM:
+            user_scheme["opener"] = OpenerType.CUSTOM_OPEN
+        # Give up on slow handlers once their time budget is spent
+        user_scheme.setdefault("budgeted", True)
+        # Run untrusted handlers in a worker process with a hard timeout
+        if configs.handler_isolation:
+            user_scheme.setdefault("isolated", True)
+
     # Merge both schemes giving precedence to user schemes
 
     # Set of schemes of already checked out
@@ -270,6 +263,9 @@ def run(
             schemes.append(scheme)
     del checked
 
+    # Run only the schemes requested by the key binding
+    schemes = select_schemes(schemes, scheme_tags)
+
     # Create the new dictionary mapping tags to indexes
     tag_to_index = {
         tag: index
@@ -294,62 +290,56 @@ def run(
     except Exception as e:
         raise FailedChDir(f"current directory could not be changed: {e}")
 
-    # We use the unique set as an expedient to sort over
-    # pre_handled_text while keeping the original text
-    seen: set[str] = set()
-    items: list[tuple[PreHandledMatch, str, int, re.Match[str]]] = []
-
-    # Process each scheme
-    for scheme in schemes:
-        # Escaped schemes (e.g. the OSC 8 hyperlink scheme) match the raw
-        # capture. Everything else matches the reconstructed plain text.
-        source = content_escaped if scheme.get("escaped") else content
-        # Use regex.finditer to iterate over all matches
-        for regex in scheme["regex"]:
-            for match in regex.finditer(source):
-                entire_match: str = match.group(0)
-                match_start: int = match.start()
-                if scheme.get("escaped"):
-                    # Offsets into the escaped capture are inflated by the escape
-                    # bytes. Translate to the plain-text coordinate space so the
-                    # match sorts by its on-screen position alongside the other
-                    # schemes.
-                    match_start = escaped_to_plain(match_start)
-
-                # Extract and process the matching string
-                pre_handled_match: PreHandledMatch | None
-                if scheme["pre_handler"]:
-                    pre_handled_match = scheme["pre_handler"](match)
-                else:
-                    # fallback case when no pre_handler is provided for the scheme
-                    pre_handled_match = {
-                        "display_text": entire_match,
-                        "tag": scheme["tags"][0],
-                    }
-
-                # Validate the current match
-                if pre_handled_match:
-                    # Skip matches for which the pre_handler returns None
-                    # Skip matches for texts that has already been processed by a previous scheme
-                    if entire_match not in seen:
-                        if pre_handled_match["tag"] not in scheme["tags"]:
-                            logger.warning(
-                                f"the tag returned dynamically '{pre_handled_match['tag']}' is not included in: {scheme['tags']}"
-                            )
-                            continue
-
-                        seen.add(entire_match)
-                        # We keep a copy of the original matched text for later
-                        items.append(
-                            (
-                                pre_handled_match,
-                                entire_match,
-                                match_start,
-                                match,
-                            )
-                        )
-    # Clean up no longer needed variables
-    del seen
+    # Number of items after which the scan of older history stops
+    scan_limit = configs.scan_limit
+    if configs.scan_limit_auto:
+        scan_limit = maxnum_displayed(configs.fzf_display_options, window_height) or 0
+
+    # Open the popup with the items ready when the matching phase runs late
+    deadline = Deadline(configs.match_budget) if configs.match_budget else None
+
+    # Run the schemes in precedence order and collect the accepted matches.
+    # Relative paths are looked up from the pane's directory, so the metadata
+    # of a previous run is not reused.
+    memo = HandlerMemo()
+    fs_metadata.clear()
+    project_indexes.clear()
+    binary_files.clear()
+    git_objects.clear()
+    clear_overrun_reports()
+    if configs.negative_cache_ttl:
+        fs_metadata.negatives = NegativeCache.load(
+            os.getcwd(), configs.negative_cache_ttl
+        )
+    if scan_limit:
+        items = collect_newest(
+            schemes, content, content_escaped, scan_limit, memo, deadline
+        )
+    else:
+        # Maps escaped-capture offsets to their plain-text positions, so escaped
+        # schemes sort by on-screen position alongside the plain-text schemes.
+        escaped_to_plain = offset_translator(content_escaped)
+        items = collect_items(
+            schemes,
+            content,
+            content_escaped,
+            escaped_to_plain,
+            memo,
+            deadline=deadline,
+        )
+    logger.debug(f"handler memo: {memo.stats()}")
+    logger.debug(f"filesystem calls while matching: {fs_metadata.syscalls}")
+    if fs_metadata.negatives is not None:
+        fs_metadata.negatives.save()
+    binary_files.save()
+    # The selected hashes were validated while matching
+    git_objects.close()
+
+    partial = deadline is not None and deadline.reached
+    if partial:
+        logger.info(
+            f"matching stopped after {configs.match_budget} ms with {len(items)} items"
+        )
 
     # Drop plain-text matches that an OSC 8 hyperlink already covers.
     items = drop_hyperlinked_duplicates(items)
@@ -383,6 +373,7 @@ def run(
             colors.enabled,
             window_height,
             window_width,
+            partial,
         )
     except FzfUserInterrupt as e:
         sys.exit(0)
@@ -439,7 +430,7 @@ def run(
             # Process the rematch with the post handler
             post_handled_link: PostHandledMatch
             if post_handler:
-                post_handled_link = post_handler(selected_match)
+                post_handled_link = memo.post_handle(scheme, selected_match)
                 if post_handled_link is None:
                     continue
             else:
@@ -503,6 +494,10 @@ def run(
             logger.error(f"error: malformed selection: {selected_choice}")
             continue
 
+    # Verdicts found while opening the selection
+    binary_files.save()
+    git_objects.close()
+
     if clipboard != []:
         plural: str = "s" if len(clipboard) > 1 else ""
         clipped_text = "\n".join(clipboard)
@@ -542,6 +537,7 @@ if __name__ == "__main__":
         FzfNotFound,
         FileLoggingNotAllow,
         FailedChDir,
+        FailedParsingUserOption,
         MissingPostHandler,
     ) as e:
         logging.error(f"{e}")
@@ -0,0 +1,75 @@
+# ===============================================================================
+#   Author: (c) 2024 Andrea Alberti
+# ===============================================================================
+
+"""Support for coroutine pre- and post-handlers.
+
+A handler defined with ``async def`` can await I/O, such as checking a path on a
+slow mount or asking a local service whether a ticket exists. The engine runs
+the pre-handler coroutines of one scheme concurrently, at most `limit` at a
+time, instead of awaiting them one match after the other.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+import re
+from collections.abc import Awaitable, Callable
+from typing import TypeVar, cast
+
+T = TypeVar("T")
+
+
+def is_async_handler(handler: object) -> bool:
+    """Whether `handler` is a coroutine function (`async def`)."""
+    return inspect.iscoroutinefunction(handler)
+
+
+def resolve(result: T | Awaitable[T]) -> T:
+    """Await `result` if a handler returned an awaitable, else return it as is."""
+    if inspect.isawaitable(result):
+        return asyncio.run(_await(result))
+    return cast(T, result)
+
+
+async def _await(awaitable: Awaitable[T]) -> T:
+    return await awaitable
+
+
+def run_concurrently(
+    handler: Callable[[re.Match[str]], Awaitable[T]],
+    matches: list[re.Match[str]],
+    limit: int,
+    timeout: float | None = None,
+) -> tuple[list[T | None], int]:
+    """Await `handler` on every match, at most `limit` at a time.
+
+    The results are returned in the order of `matches`, along with the number
+    of calls cancelled because they had not completed within `timeout` seconds.
+    A cancelled call yields None. An exception raised by any call propagates,
+    as it would from a synchronous handler.
+    """
+    if not matches:
+        return [], 0
+
+    async def main() -> tuple[list[T | None], int]:
+        semaphore = asyncio.Semaphore(max(limit, 1))
+
+        async def bounded(match: re.Match[str]) -> T:
+            async with semaphore:
+                return await handler(match)
+
+        tasks = [asyncio.ensure_future(bounded(match)) for match in matches]
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            _ = task.cancel()
+        if pending:
+            _ = await asyncio.gather(*pending, return_exceptions=True)
+        results = [task.result() if task in done else None for task in tasks]
+        return results, len(pending)
+
+    return asyncio.run(main())
+
+
+__all__ = ["is_async_handler", "resolve", "run_concurrently"]
@@ -0,0 +1,186 @@
+# ===============================================================================
+#   Author: (c) 2024 Andrea Alberti
+# ===============================================================================
+
+"""Tell binary files from text files.
+
+Binary files cannot be opened with the editor. Telling them apart used to mean
+reading the first 4 KB of every selected file, again on every selection. The
+verdict now comes, in order, from:
+
+- a table of well-known extensions, which costs nothing;
+- the verdicts of earlier runs, kept on disk while the size and modification
+  time of the file are unchanged, read from the run's metadata cache;
+- the MIME type of the extension (only images, audio, video and fonts count
+  as binary, since e.g. `.ts` is also a video type);
+- a sniff of the first bytes, where a null byte means binary.
+"""
+
+from __future__ import annotations
+
+import mimetypes
+import os
+import time
+from pathlib import Path
+from typing import Any, ClassVar, cast
+
+from .cache import cache_dir, read_json, write_json_atomically
+from .fs_metadata import fs_metadata
+from .negative_cache import RACY_SECONDS
+
+# Bytes read from a file whose extension tells nothing
+SNIFF_BYTES = 4096
+# Verdicts kept on disk, the most recently found ones
+MAX_VERDICTS = 10000
+
+TEXT_EXTENSIONS = frozenset(
+    (
+        "c cc cfg cjs conf cpp cs css csv cts cxx diff el erl ex exs fish go "
+        "h hpp hs htm html ini java jl js json jsx kt lock log lua m md mjs "
+        "ml mts nim nix patch php pl proto py pyi r rb rs rst scala scss sh "
+        "sql svg swift tex toml ts tsv tsx txt vim vue xml yaml yml zig zsh"
+    ).split()
+)
+
+BINARY_EXTENSIONS = frozenset(
+    (
+        "7z a avi bin bmp bz2 class db dll dmg doc docx dylib exe flac gif "
+        "gz ico iso jar jpeg jpg mkv mov mp3 mp4 o obj ogg otf pdf png ppt "
+        "pptx pyc pyo rar so sqlite tar tgz ttf wasm wav webm webp woff "
+        "woff2 xls xlsx xz zip zst"
+    ).split()
+)
+
+# Top-level MIME types of binary content
+_BINARY_MIME_TYPES = ("image/", "audio/", "video/", "font/")
+
+_VERSION = 1
+
+
+def _extension(name: str) -> str:
+    stem, dot, extension = name.rpartition(".")
+    # A leading dot, as in `.bashrc`, starts a name rather than an extension
+    return extension.lower() if dot and stem else ""
+
+
+def by_extension(name: str) -> bool | None:
+    """Whether the file `name` is binary, as told by its extension, or None
+    when the extension tells nothing."""
+    extension = _extension(name)
+    if extension in TEXT_EXTENSIONS:
+        return False
+    if extension in BINARY_EXTENSIONS:
+        return True
+    return None
+
+
+def _by_mime_type(name: str) -> bool | None:
+    if not _extension(name):
+        return None
+    mime_type, _ = mimetypes.guess_type(name, strict=False)
+    if mime_type is None:
+        return None
+    if mime_type.startswith("text/") or mime_type.endswith(("+xml", "+json")):
+        return False
+    if mime_type.startswith(_BINARY_MIME_TYPES):
+        return True
+    return None
+
+
+def _sniff(path: str) -> bool:
+    try:
+        with open(path, "rb") as file:
+            chunk = file.read(SNIFF_BYTES)
+    except OSError:
+        # Left to the editor, which reports the error
+        return False
+    return b"\0" in chunk
+
+
+class BinaryFilesSingletonCls:
+    _instance: ClassVar[BinaryFilesSingletonCls | None] = None
+
+    # Verdicts by path, as [modification time, size, binary], None until loaded
+    _verdicts: dict[str, list[Any]] | None
+    _changed: bool
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance.clear()
+        return cls._instance
+
+    def clear(self) -> None:
+        """Forget the verdicts read from disk, e.g. at the start of a new run."""
+        self._verdicts = None
+        self._changed = False
+
+    def _cache_file(self) -> Path | None:
+        directory = cache_dir("binary")
+        return None if directory is None else directory / "verdicts.json"
+
+    def _load(self) -> dict[str, list[Any]]:
+        if self._verdicts is None:
+            self._verdicts = {}
+            cache_file = self._cache_file()
+            data = None if cache_file is None else read_json(cache_file, _VERSION)
+            if data is not None and isinstance(data.get("files"), dict):
+                self._verdicts = cast(dict[str, list[Any]], data["files"])
+        return self._verdicts
+
+    def is_binary(self, path: str | Path) -> bool:
+        """Whether `path` names a binary file.
+
+        Anything but an existing regular file counts as text, and is left to
+        the opener.
+        """
+        key = str(path)
+        verdict = by_extension(os.path.basename(key))
+        if verdict is not None:
+            return verdict
+        info = fs_metadata.info(key)
+        if info is None or not info.is_file or not info.size:
+            return False
+
+        verdicts = self._load()
+        entry = verdicts.get(key)
+        if entry is not None and entry[:2] == [info.mtime_ns, info.size]:
+            return bool(entry[2])
+
+        verdict = _by_mime_type(os.path.basename(key))
+        if verdict is None:
+            verdict = _sniff(key)
+        # A file modified this recently might change again within the same
+        # clock tick, with the same size
+        mtime_ns = info.mtime_ns
+        if mtime_ns is not None and time.time() - mtime_ns / 1e9 >= RACY_SECONDS:
+            # Moved to the end, as the most recent verdict
+            verdicts.pop(key, None)
+            verdicts[key] = [mtime_ns, info.size, verdict]
+            self._changed = True
+        return verdict
+
+    def save(self) -> None:
+        """Write the verdicts, if any was found in this run."""
+        if not self._changed or self._verdicts is None:
+            return
+        self._changed = False
+        cache_file = self._cache_file()
+        if cache_file is None:
+            return
+        files = dict(list(self._verdicts.items())[-MAX_VERDICTS:])
+        data = {"version": _VERSION, "files": files}
+        write_json_atomically(cache_file, data)
+
+
+# Instantiate the singleton class
+binary_files = BinaryFilesSingletonCls()
+
+__all__ = [
+    "BINARY_EXTENSIONS",
+    "MAX_VERDICTS",
+    "SNIFF_BYTES",
+    "TEXT_EXTENSIONS",
+    "binary_files",
+    "by_extension",
+]
@@ -0,0 +1,74 @@
+# ===============================================================================
+#   Author: (c) 2024 Andrea Alberti
+# ===============================================================================
+
+"""Location of the plugin's on-disk caches."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, cast
+
+logger = logging.getLogger()  # root logger when no argument is provided
+
+
+def cache_dir(*parts: str) -> Path | None:
+    """Return the cache directory `$XDG_CACHE_HOME/tmux-fzf-links/<parts>`,
+    creating it if needed.
+
+    Returns None when the directory cannot be created, in which case the
+    caller runs without the cache.
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    directory = Path(base, "tmux-fzf-links", *parts)
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        return None
+    return directory
+
+
+def read_json(path: Path, version: int) -> dict[str, Any] | None:
+    """Return the data of the cache file `path`, or None when it is missing,
+    unreadable, or written with another `version` of its format."""
+    try:
+        with open(path, "r") as file:
+            data = json.load(file)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.debug(f"ignoring the cache file {path}: {e}")
+        return None
+    if not isinstance(data, dict):
+        logger.debug(f"ignoring the cache file {path}: not a JSON object")
+        return None
+    data = cast(dict[str, Any], data)
+    return data if data.get("version") == version else None
+
+
+def write_json_atomically(path: Path, data: dict[str, Any]) -> None:
+    """Write `data` to the cache file `path`, logging any failure.
+
+    The file is replaced atomically, as another pane may be reading it.
+    """
+    try:
+        descriptor, temporary = tempfile.mkstemp(dir=path.parent)
+        try:
+            with os.fdopen(descriptor, "w") as file:
+                json.dump(data, file)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+    except (OSError, TypeError, ValueError) as e:
+        # TypeError: a value with no JSON counterpart, such as a TOML date
+        logger.debug(f"could not write the cache file {path}: {e}")
+
+
+__all__ = ["cache_dir", "read_json", "write_json_atomically"]
@@ -6,11 +6,16 @@
 
 from __future__ import annotations
 
+import logging
 import os
 from pathlib import Path
 from typing import ClassVar
 
 from .errors_types import LsColorsNotConfigured
+from .fs_metadata import fs_metadata
+from .ls_colors import LsColors
+
+logger = logging.getLogger()  # root logger when no argument is provided
 
 # Index / tag / dash colors, given as ANSI palette codes (not absolute RGB) so
 # the terminal's active theme picks the actual shade and they stay legible when
@@ -26,7 +31,8 @@ DEFAULT_DASH_COLOR = 2  # dim default fg
 class ColorsSingletonCls:
     _instance: ClassVar[ColorsSingletonCls | None] = None
 
-    _color_mapping: dict[str, str] = {}  # dictionary storing LS_COLORS
+    _ls_colors: LsColors | None = None  # compiled LS_COLORS
+    _ls_colors_pending: str | None = None  # LS_COLORS file to load, "" for env
     enabled: bool = False  # whether to use colors
     tag_color: str = ""  # fallback case
     index_color: str = ""  # fallback case
@@ -87,12 +93,8 @@ class ColorsSingletonCls:
             return ""
 
     def configure_ls_colors_from_str(self, ls_colors: str):
-        """Parse the LS_COLORS into a dictionary."""
-
-        for item in ls_colors.split(":"):
-            if "=" in item:
-                key, value = item.split("=")
-                self._color_mapping[key] = value
+        """Compile the LS_COLORS, or load them compiled from the disk cache."""
+        self._ls_colors = LsColors.load(ls_colors)
 
     def configure_ls_colors_from_file(self, ls_colors_filename: str):
         try:
@@ -110,54 +112,39 @@ class ColorsSingletonCls:
         if ls_colors:
             self.configure_ls_colors_from_str(ls_colors)
 
+    def defer_ls_colors(self, ls_colors_filename: str) -> None:
+        """Configure LS_COLORS from `ls_colors_filename`, or from the environment
+        when it is empty, the first time a file is colored.
+
+        A run that lists no file never pays for parsing LS_COLORS.
+        """
+        self._ls_colors_pending = ls_colors_filename
+
+    def _load_pending_ls_colors(self) -> None:
+        ls_colors_filename = self._ls_colors_pending
+        self._ls_colors_pending = None
+        if ls_colors_filename:
+            try:
+                self.configure_ls_colors_from_file(ls_colors_filename)
+            except LsColorsNotConfigured as e:
+                logger.warning(f"{e}")
+        else:
+            self.configure_ls_colors_from_env()
+
     def get_file_color(self, filepath: Path) -> str:
         """Determine the color for a given file based on LS_COLORS.
 
         Return an empty string as the fallback case when no color code is found for filepath.
         """
-        if not self._color_mapping:
+        if self._ls_colors_pending is not None:
+            self._load_pending_ls_colors()
+
+        if not self._ls_colors:
             return ""
 
-        # Handle specific file types
-        if filepath.is_dir():
-            return self._color_mapping.get("di", "")  # Directory
-        elif filepath.is_symlink():
-            return self._color_mapping.get("ln", "")  # Symbolic link
-        elif filepath.is_block_device():
-            return self._color_mapping.get("bd", "")  # Block device
-        elif filepath.is_char_device():
-            return self._color_mapping.get("cd", "")  # Character device
-        elif filepath.is_fifo():
-            return self._color_mapping.get("pi", "")  # Named pipe (FIFO)
-        elif filepath.is_socket():
-            return self._color_mapping.get("so", "")  # Socket
-        elif filepath.is_file() and os.access(filepath, os.X_OK):
-            return self._color_mapping.get("ex", "")  # Executable file
-
-        # Check for file extension mapping
-        ext = filepath.suffix  # Extract the file extension (e.g., '.txt')
-        if ext:
-            ext_key = f"*{ext}"  # Convert '.txt' to '*.txt'
-            if ext_key in self._color_mapping:
-                return self._color_mapping[ext_key]
-
-        # Handle additional cases based on LS_COLORS
-        file_name = filepath.name
-        if file_name.startswith("."):
-            return self._color_mapping.get("mh", "")  # Multi-hard link
-        elif file_name.endswith("~"):
-            return self._color_mapping.get("ow", "")  # Other writable file
-        elif not filepath.exists():
-            return self._color_mapping.get("mi", "")  # Missing file
-        elif filepath.is_symlink() and not filepath.exists():
-            return self._color_mapping.get("or", "")  # Orphan symbolic link
-        elif filepath.is_symlink() and filepath.is_dir():
-            return self._color_mapping.get("tw", "")  # Sticky and other-writable dir
-        elif filepath.is_file():
-            return self._color_mapping.get("fi", "")  # Regular file
-
-        # Fallback strategy for unknown types
-        return ""
+        # The metadata is usually in the run's cache already, filled in by the
+        # handlers resolving the path
+        return self._ls_colors.color(filepath.name, fs_metadata.info(filepath))
 
 
 # Instantiate the singleton class
@@ -12,6 +12,43 @@ import subprocess
 from typing import ClassVar
 
 
+# Options read on every key press through a single `display-message` call, so
+# they can be changed at runtime without re-sourcing the plugin
+DYNAMIC_OPTIONS = [
+    "@fzf-links-fzf-display-options",
+    "@fzf-links-other-colors",
+    "@fzf-links-handler-concurrency",
+    "@fzf-links-handler-budget",
+    "@fzf-links-handler-isolation",
+    "@fzf-links-regex-guard",
+    "@fzf-links-regex-max-line-length",
+    "@fzf-links-regex-timeout",
+    "@fzf-links-scan-limit",
+    "@fzf-links-match-budget",
+    "@fzf-links-plugins",
+    "@fzf-links-negative-cache-ttl",
+    "@fzf-links-path-lookup",
+    "@fzf-links-path-timeout",
+    "@fzf-links-unknown-paths",
+    "@fzf-links-project-index",
+    "@fzf-links-binary-files",
+    "@fzf-links-commit-open",
+]
+
+# Maximum number of coroutine handlers awaited at the same time
+DEFAULT_HANDLER_CONCURRENCY = 16
+# Time, in milliseconds, the pre-handlers of one user or plugin scheme may take
+# in total
+DEFAULT_HANDLER_BUDGET = 1000
+# Characters of a line that regex schemes scan in guarded mode
+DEFAULT_REGEX_MAX_LINE_LENGTH = 4096
+# Time, in milliseconds, the regexes of one scheme may take on a single line
+# in guarded mode
+DEFAULT_REGEX_TIMEOUT = 200
+# Time, in milliseconds, a path lookup may take when lookups run concurrently
+DEFAULT_PATH_TIMEOUT = 200
+
+
 class ConfigurationManager:
     """Parse the configurations and assert their validity"""
 
@@ -43,6 +80,28 @@ class ConfigurationManager:
             self.ls_colors_filename: str = ""
             self.hide_bottom_bar: bool = False
             self.max_path_length: int = 0
+            self.handler_concurrency: int = DEFAULT_HANDLER_CONCURRENCY
+            self.handler_budget: int = DEFAULT_HANDLER_BUDGET
+            self.handler_isolation: bool = False
+            self.regex_guard: bool = False
+            self.regex_max_line_length: int = DEFAULT_REGEX_MAX_LINE_LENGTH
+            self.regex_timeout: int = DEFAULT_REGEX_TIMEOUT
+            # Number of items after which the newest-first scan stops (0 scans
+            # the whole capture). When `scan_limit_auto` is set, the limit is
+            # taken from `--maxnum-displayed` instead.
+            self.scan_limit: int = 0
+            self.scan_limit_auto: bool = False
+            # Time, in milliseconds, after which the popup opens with the items
+            # matched so far (0 waits for the whole matching phase)
+            self.match_budget: int = 0
+            self.plugins: bool = False
+            self.negative_cache_ttl: int = 0
+            self.path_lookup: str = "auto"
+            self.path_timeout: int = DEFAULT_PATH_TIMEOUT
+            self.unknown_paths: str = "drop"
+            self.project_index: bool = False
+            self.binary_files: str = "show"
+            self.commit_open: str = "browser"
 
             # Root logger
             self.logger: logging.Logger = logging.getLogger()
@@ -121,6 +180,49 @@ class ConfigurationManager:
         # Determine max supported length for filenames
         self.max_path_length = self.check_filename_length("/")
 
+    def parse_int_option(
+        self, value: str, option: str, default: int, minimum: int = 1
+    ) -> int:
+        """Parse an integer option of at least `minimum`, warning and falling
+        back to `default`. Options that `0` disables take a `minimum` of 0."""
+        if not value:
+            return default
+        try:
+            parsed = int(value)
+            if parsed < minimum:
+                raise ValueError(f"{parsed} is less than {minimum}")
+            return parsed
+        except ValueError as e:
+            self.logger.warning(
+                f"Input parameter '{option}' must be an integer of at least {minimum}: {e}"
+            )
+            return default
+
+    def parse_on_off_option(self, value: str, option: str, default: bool) -> bool:
+        """Parse an `on`/`off` option, warning and falling back to `default`."""
+        if value == "on":
+            return True
+        elif value == "off":
+            return False
+        elif value:
+            self.logger.warning(
+                f"Input parameter '{option}' must either be 'on' or 'off', while it was provided: '{value}'"
+            )
+        return default
+
+    def parse_choice_option(
+        self, value: str, option: str, choices: tuple[str, ...]
+    ) -> str:
+        """Parse an option taking one of `choices`, warning and falling back to
+        the first one."""
+        if value in choices:
+            return value
+        elif value:
+            self.logger.warning(
+                f"Input parameter '{option}' must be one of {', '.join(repr(c) for c in choices)}, while it was provided: '{value}'"
+            )
+        return choices[0]
+
     def load_dynamic_options(self):
         """Read options that must reflect the current tmux state at runtime."""
         try:
@@ -129,7 +231,7 @@ class ConfigurationManager:
                     "tmux",
                     "display-message",
                     "-p",
-                    "#{@fzf-links-fzf-display-options}\x1f#{@fzf-links-other-colors}",
+                    "\x1f".join(f"#{{{option}}}" for option in DYNAMIC_OPTIONS),
                 ],
                 text=True,
                 shell=False,
@@ -145,19 +247,109 @@ class ConfigurationManager:
             #   $ tmux display-message -p $'A\x1fB' | xxd
             #   00000000: 415c 3033 3742 0a   # "A\037B\n"
             result = result.replace("\\037", "\x1f")
-            lines = result.split("\x1f")
-            fzf_display_options = lines[0] if len(lines) > 0 else ""
-            other_colors = lines[1] if len(lines) > 1 else ""
+            # Strip the newline display-message appends to the last field
+            lines = result.rstrip("\n").split("\x1f")
         except Exception as e:
             self.logger.warning(f"Could not read dynamic tmux options: {e}")
-            fzf_display_options = ""
-            other_colors = ""
+            lines = []
+        values = dict(zip(DYNAMIC_OPTIONS, lines))
 
         self.fzf_display_options = (
-            fzf_display_options
+            values.get("@fzf-links-fzf-display-options", "")
             or "-w 100% --maxnum-displayed 20 --multi --track --no-preview"
         )
-        self.other_colors = other_colors
+        self.other_colors = values.get("@fzf-links-other-colors", "")
+        self.handler_concurrency = self.parse_int_option(
+            values.get("@fzf-links-handler-concurrency", ""),
+            "@fzf-links-handler-concurrency",
+            DEFAULT_HANDLER_CONCURRENCY,
+        )
+        self.handler_budget = self.parse_int_option(
+            values.get("@fzf-links-handler-budget", ""),
+            "@fzf-links-handler-budget",
+            DEFAULT_HANDLER_BUDGET,
+        )
+        self.handler_isolation = self.parse_on_off_option(
+            values.get("@fzf-links-handler-isolation", ""),
+            "@fzf-links-handler-isolation",
+            False,
+        )
+        self.regex_guard = self.parse_on_off_option(
+            values.get("@fzf-links-regex-guard", ""),
+            "@fzf-links-regex-guard",
+            False,
+        )
+        self.regex_max_line_length = self.parse_int_option(
+            values.get("@fzf-links-regex-max-line-length", ""),
+            "@fzf-links-regex-max-line-length",
+            DEFAULT_REGEX_MAX_LINE_LENGTH,
+        )
+        self.regex_timeout = self.parse_int_option(
+            values.get("@fzf-links-regex-timeout", ""),
+            "@fzf-links-regex-timeout",
+            DEFAULT_REGEX_TIMEOUT,
+        )
+
+        scan_limit = values.get("@fzf-links-scan-limit", "")
+        self.scan_limit_auto = scan_limit == "auto"
+        if scan_limit in ("auto", "off"):
+            self.scan_limit = 0
+        else:
+            self.scan_limit = self.parse_int_option(
+                scan_limit, "@fzf-links-scan-limit", 0, minimum=0
+            )
+
+        match_budget = values.get("@fzf-links-match-budget", "")
+        self.match_budget = (
+            0
+            if match_budget == "off"
+            else self.parse_int_option(
+                match_budget, "@fzf-links-match-budget", 0, minimum=0
+            )
+        )
+        self.plugins = self.parse_on_off_option(
+            values.get("@fzf-links-plugins", ""), "@fzf-links-plugins", False
+        )
+
+        negative_cache_ttl = values.get("@fzf-links-negative-cache-ttl", "")
+        self.negative_cache_ttl = (
+            0
+            if negative_cache_ttl == "off"
+            else self.parse_int_option(
+                negative_cache_ttl, "@fzf-links-negative-cache-ttl", 0, minimum=0
+            )
+        )
+
+        self.path_lookup = self.parse_choice_option(
+            values.get("@fzf-links-path-lookup", ""),
+            "@fzf-links-path-lookup",
+            ("auto", "serial", "parallel"),
+        )
+        self.path_timeout = self.parse_int_option(
+            values.get("@fzf-links-path-timeout", ""),
+            "@fzf-links-path-timeout",
+            DEFAULT_PATH_TIMEOUT,
+        )
+        self.unknown_paths = self.parse_choice_option(
+            values.get("@fzf-links-unknown-paths", ""),
+            "@fzf-links-unknown-paths",
+            ("drop", "dim"),
+        )
+        self.project_index = self.parse_on_off_option(
+            values.get("@fzf-links-project-index", ""),
+            "@fzf-links-project-index",
+            False,
+        )
+        self.binary_files = self.parse_choice_option(
+            values.get("@fzf-links-binary-files", ""),
+            "@fzf-links-binary-files",
+            ("show", "tag", "hide"),
+        )
+        self.commit_open = self.parse_choice_option(
+            values.get("@fzf-links-commit-open", ""),
+            "@fzf-links-commit-open",
+            ("browser", "show"),
+        )
 
 
 # Instantiate the singleton class
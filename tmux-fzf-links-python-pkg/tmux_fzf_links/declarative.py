@@ -0,0 +1,280 @@
+# ===============================================================================
+#   Author: (c) 2024 Andrea Alberti
+# ===============================================================================
+
+"""Declarative user schemes, written in TOML or JSON.
+
+Most user schemes are a regex, a tag, a color and a URL or command template.
+Such schemes can be declared in a data file instead of a Python module, and
+are turned into regular schemes with templated handlers. No user Python is
+executed.
+
+.. code-block:: toml
+
+    rm_default_schemes = []
+
+    [[schemes]]
+    tags = ["IPv4"]
+    regex = '(?<!://)(?P<ip>\\b(?:\\d{1,3}\\.){3}\\d{1,3}\\b(:\\d+)?)'
+    display = "{ip}"
+    color = 94
+    cmd = ["tmux", "set-buffer", "-w", "{ip}"]
+
+Templates are formatted with `str.format`: `{0}` is the whole match, `{1}`,
+`{2}`, ... the groups, and `{name}` the named groups. A field that no regex of
+the scheme defines is rejected when the file is loaded. Literal braces are
+written `{{` and `}}`. Each scheme has exactly one action: `url` opens the
+browser, `file` (with an optional `line`) opens the editor, and `cmd` runs a
+command given as a list of arguments.
+
+Every key press starts a new interpreter, which loads the file again. A TOML
+file is parsed once: its content is kept on disk as JSON, keyed by the path of
+the file, and used while the size and modification time of the file are
+unchanged, so that neither `tomllib` is imported nor the file parsed again.
+The schemes themselves hold compiled regexes and handlers, which are built in
+every run. A JSON file is read as fast as the cache would be, and is not
+cached.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import string
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any, cast
+
+from .cache import cache_dir, read_json, write_json_atomically
+from .colors import colors
+from .negative_cache import RACY_SECONDS
+from .opener import OpenerType, PostHandledMatch, PreHandledMatch, SchemeEntry
+
+DECLARATIVE_SUFFIXES = (".toml", ".json")
+
+_KEYS = {"tags", "regex", "display", "color", "url", "file", "line", "cmd"}
+_ACTIONS = ("url", "file", "cmd")
+
+_VERSION = 1
+
+
+def _format(template: str, match: re.Match[str]) -> str:
+    return template.format(
+        match.group(0), *match.groups(default=""), **match.groupdict(default="")
+    )
+
+
+def _check_template(key: str, template: str, regexes: list[re.Pattern[str]]) -> None:
+    # Every field must be defined by every regex, since any of them may match
+    try:
+        parsed = list(string.Formatter().parse(template))
+    except ValueError as e:
+        raise ValueError(f"'{key}' template {template!r} is invalid: {e}")
+    fields = [field for _, field, _, _ in parsed if field is not None]
+    auto_index = 0
+    for field in fields:
+        name = re.split(r"[.\[]", field, maxsplit=1)[0]
+        if not name:
+            # `{}` takes the next positional argument
+            name = str(auto_index)
+            auto_index += 1
+        for regex in regexes:
+            if name.isdigit():
+                valid = int(name) <= regex.groups
+            else:
+                valid = name in regex.groupindex
+            if not valid:
+                raise ValueError(
+                    f"'{key}' template {template!r} refers to '{{{name}}}', which "
+                    f"regex {regex.pattern!r} does not define; write '{{{{' and "
+                    "'}}' for literal braces"
+                )
+
+
+def _color_code(color: object) -> Callable[[], str]:
+    # The color is looked up when the handler runs, since colors may be
+    # disabled after the schemes are loaded
+    if color is None:
+        return lambda: ""
+    if isinstance(color, int):
+        return lambda: colors.ansi_color(color)
+    if (
+        isinstance(color, list)
+        and len(cast(list[object], color)) == 3
+        and all(isinstance(c, int) for c in cast(list[object], color))
+    ):
+        r, g, b = cast(list[int], color)
+        return lambda: colors.rgb_color(r, g, b)
+    raise ValueError(f"'color' must be an ANSI code or [R, G, B], got {color!r}")
+
+
+def _string_list(entry: dict[str, Any], key: str) -> list[str]:
+    value = entry[key]
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, list) and value and all(isinstance(v, str) for v in value):
+        return cast(list[str], value)
+    raise ValueError(f"'{key}' must be a string or a non-empty list of strings")
+
+
+def compile_scheme(entry: dict[str, Any]) -> SchemeEntry:
+    """Turn one declarative entry into a scheme."""
+    unknown = set(entry) - _KEYS
+    if unknown:
+        raise ValueError(f"unknown keys {sorted(unknown)}")
+    for key in ("tags", "regex"):
+        if key not in entry:
+            raise ValueError(f"missing key '{key}'")
+    actions = [action for action in _ACTIONS if action in entry]
+    if len(actions) != 1:
+        raise ValueError(f"exactly one of {list(_ACTIONS)} must be given")
+
+    tags = tuple(_string_list(entry, "tags"))
+    regexes = [re.compile(pattern) for pattern in _string_list(entry, "regex")]
+    display = str(entry.get("display", "{0}"))
+    color = _color_code(entry.get("color"))
+    action = actions[0]
+
+    # Templates by key, checked before any match is formatted with them
+    templates = [("display", display)]
+    if action == "cmd":
+        templates += [("cmd", arg) for arg in _string_list(entry, "cmd")]
+    else:
+        templates.append((action, str(entry[action])))
+    if action == "file" and entry.get("line") is not None:
+        templates.append(("line", str(entry["line"])))
+    for key, template in templates:
+        _check_template(key, template, regexes)
+
+    def pre_handler(match: re.Match[str]) -> PreHandledMatch:
+        return {
+            "display_text": f"{color()}{_format(display, match)}{colors.reset_color}",
+            "tag": tags[0],
+        }
+
+    opener: OpenerType
+    post_handler: Callable[[re.Match[str]], PostHandledMatch]
+    if action == "url":
+        url = str(entry["url"])
+        opener = OpenerType.BROWSER
+        post_handler = lambda match: {"url": _format(url, match)}
+    elif action == "file":
+        file = str(entry["file"])
+        line = entry.get("line")
+        opener = OpenerType.EDITOR
+
+        def file_post_handler(match: re.Match[str]) -> PostHandledMatch:
+            if line is None:
+                return {"file": _format(file, match)}
+            return {"file": _format(file, match), "line": _format(str(line), match)}
+
+        post_handler = file_post_handler
+
+    else:
+        cmd = _string_list(entry, "cmd")
+        opener = OpenerType.CUSTOM_OPEN
+        post_handler = lambda match: {
+            "cmd": _format(cmd[0], match),
+            "args": [_format(arg, match) for arg in cmd[1:]],
+        }
+
+    return {
+        "tags": tags,
+        "opener": opener,
+        "pre_handler": pre_handler,
+        "post_handler": post_handler,
+        "regex": regexes,
+        # The templated handlers depend only on the matched text
+        "pure": True,
+    }
+
+
+def _parse_toml(path: Path) -> dict[str, Any]:
+    try:
+        import tomllib
+    except ImportError:
+        raise ImportError("TOML schemes require Python 3.11 or newer; use JSON")
+    with open(path, "rb") as file:
+        return tomllib.load(file)
+
+
+def _cache_file(path: Path) -> Path | None:
+    directory = cache_dir("declarative")
+    if directory is None:
+        return None
+    digest = hashlib.sha256(str(path.absolute()).encode("utf-8", "surrogateescape"))
+    return directory / f"{digest.hexdigest()[:32]}.json"
+
+
+def _parse_cached_toml(path: Path) -> dict[str, Any]:
+    # Taken before reading, so that a change made meanwhile is seen next time
+    stat = path.stat()
+    cache_file = _cache_file(path)
+    if cache_file is None:
+        return _parse_toml(path)
+    cached = read_json(cache_file, _VERSION)
+    if (
+        cached is not None
+        and cached.get("mtime_ns") == stat.st_mtime_ns
+        and cached.get("size") == stat.st_size
+        and isinstance(cached.get("data"), dict)
+    ):
+        return cast(dict[str, Any], cached["data"])
+
+    data = _parse_toml(path)
+    # A file changed again within the resolution of its modification time
+    # would keep the same time, and possibly the same size
+    if time.time() - stat.st_mtime_ns / 1e9 < RACY_SECONDS:
+        return data
+    write_json_atomically(
+        cache_file,
+        {
+            "version": _VERSION,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "data": data,
+        },
+    )
+    return data
+
+
+def _parse(path: Path) -> dict[str, Any]:
+    if path.suffix == ".toml":
+        return _parse_cached_toml(path)
+    with open(path, "r") as file:
+        return cast(dict[str, Any], json.load(file))
+
+
+def load_declarative_schemes(file_path: str) -> tuple[list[SchemeEntry], list[str]]:
+    """Load the schemes declared in a TOML or JSON file."""
+    try:
+        data = _parse(Path(file_path))
+        if not isinstance(data, dict):  # pyright: ignore[reportUnnecessaryIsInstance]
+            raise TypeError(f"expected a table at the top level, got {type(data)}")
+        entries = data.get("schemes", [])
+        if not isinstance(entries, list):
+            raise TypeError(f"'schemes' must be a list, got {type(entries)}")
+        user_schemes: list[SchemeEntry] = []
+        for index, entry in enumerate(cast(list[object], entries)):
+            if not isinstance(entry, dict):
+                raise TypeError(f"scheme #{index + 1} must be a table")
+            entry = cast(dict[str, Any], entry)
+            try:
+                user_schemes.append(compile_scheme(entry))
+            except (ValueError, re.error) as e:
+                raise ValueError(
+                    f"scheme #{index + 1} (tags {entry.get('tags')!r}): {e}"
+                )
+        rm_default_schemes = data.get("rm_default_schemes", [])
+        if not isinstance(rm_default_schemes, list):
+            raise TypeError(
+                f"'rm_default_schemes' must be a list, got {type(rm_default_schemes)}"
+            )
+        return user_schemes, cast(list[str], rm_default_schemes)
+    except Exception as e:
+        raise ImportError(f"failed to load declarative schemes from {file_path}: {e}")
+
+
+__all__ = ["DECLARATIVE_SUFFIXES", "compile_scheme", "load_declarative_schemes"]
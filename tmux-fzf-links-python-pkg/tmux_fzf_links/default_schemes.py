@@ -6,18 +6,98 @@
 
 import re
 import shlex
+from collections.abc import Iterator
+from pathlib import Path
 
-from .errors_types import FailedResolvePath, NoEditorConfigured
+from .errors_types import (
+    FailedResolvePath,
+    NoEditorConfigured,
+)
 from .export import (
     OpenerType,
     PostHandledMatch,
     PreHandledMatch,
     SchemeEntry,
+    binary_files,
+    canonical_path,
+    canonical_url,
     colors,
     configs,
+    fs_metadata,
+    git_objects,
     heuristic_find_file,
+    heuristic_find_files,
+    resolve_paths,
+)
+from .git_objects import forge_commit_url
+from .hyperlinks import (
+    clean_text,
+    file_hyperlink_regex,
+    file_uri_target,
+    hyperlink_regex,
+    url_kind,
 )
-from .hyperlinks import clean_text, hyperlink_regex, url_kind
+from .opener import browser_cmd
+from .path_tokens import is_path_like, path_candidates
+
+# >>> OSC 8 FILE HYPERLINK SCHEME >>>
+
+# `ls --hyperlink`, `rg --hyperlink-format` and `fd` link every name they print
+# to its absolute `file://` URI. The target is taken as is: it is neither looked
+# up nor stat-ed until selected. Links to other hosts are left to the OSC 8
+# scheme below.
+
+
+def osc8_file_pre_handler(match: re.Match[str]) -> PreHandledMatch | None:
+    text = clean_text(match.group("text"))
+    target = file_uri_target(match.group("uri"))
+    if not text or target is None:
+        return None
+
+    path, line = target
+    location = f"{path}:{line}" if line else path
+    display_text = (
+        f"{colors.rgb_color(41, 121, 255)}{text}{colors.reset_color} "
+        f"{colors.dim_color}→ {location}{colors.reset_color}"
+    )
+
+    return {"display_text": display_text, "tag": "file-link"}
+
+
+def osc8_file_post_handler(match: re.Match[str]) -> PostHandledMatch:
+    target = file_uri_target(match.group("uri"))
+    if target is None:
+        # This is not supposed to happen, as the pre-handler dropped the match
+        raise FailedResolvePath(f"not a local file: {match.group('uri')}")
+    path, line = target
+    if fs_metadata.info(path) is None:
+        raise FailedResolvePath(f"could not resolve the path of: {path}")
+    return _open_path(path, line or "1")
+
+
+def osc8_file_canonical(match: re.Match[str]) -> str:
+    # Same key as the file scheme, which then skips plain-text mentions of the
+    # linked files without looking them up
+    target = file_uri_target(match.group("uri"))
+    if target is None:
+        return match.group(0)
+    path, line = target
+    path = canonical_path(path)
+    return f"{path}:{line}" if line else path
+
+
+osc8_file_scheme: SchemeEntry = {
+    "tags": ("file-link",),
+    "opener": OpenerType.CUSTOM_OPEN,
+    "pure": True,
+    "escaped": True,
+    "canonical": osc8_file_canonical,
+    "post_handler": osc8_file_post_handler,
+    "pre_handler": osc8_file_pre_handler,
+    "regex": [file_hyperlink_regex()],
+}
+
+# <<< OSC 8 FILE HYPERLINK SCHEME <<<
 
 # >>> OSC 8 HYPERLINK SCHEME >>>
 
@@ -51,10 +131,16 @@ def osc8_post_handler(match: re.Match[str]) -> PostHandledMatch:
     return {"url": match.group("uri").strip()}
 
 
+def osc8_canonical(match: re.Match[str]) -> str:
+    return canonical_url(match.group("uri"))
+
+
 osc8_scheme: SchemeEntry = {
     "tags": (_OSC8_FALLBACK_TAG, *_OSC8_TAGS.values()),
     "opener": OpenerType.BROWSER,
+    "pure": True,
     "escaped": True,
+    "canonical": osc8_canonical,
     "post_handler": osc8_post_handler,
     "pre_handler": osc8_pre_handler,
     "regex": [hyperlink_regex()],
@@ -75,6 +161,7 @@ def git_post_handler(match: re.Match[str]) -> PostHandledMatch:
 git_scheme: SchemeEntry = {
     "tags": ("git",),
     "opener": OpenerType.BROWSER,
+    "pure": True,
     "post_handler": git_post_handler,
     "pre_handler": lambda m: {
         "display_text": f"{colors.ansi_color(94)}{m.group(0)}{colors.reset_color}",
@@ -99,6 +186,27 @@ def code_error_pre_handler(match: re.Match[str]) -> PreHandledMatch | None:
     # fully resolved path
     resolved_path = heuristic_find_file(file)
 
+    return _code_error_pre_handled(file, line, resolved_path)
+
+
+def code_error_pre_handler_batch(
+    matches: list[re.Match[str]],
+) -> list[PreHandledMatch | None]:
+    # A traceback names the same few files over and over: resolve each once
+    resolved_paths = heuristic_find_files(match.group("file") for match in matches)
+    return [
+        _code_error_pre_handled(
+            match.group("file"),
+            match.group("line"),
+            resolved_paths[match.group("file")],
+        )
+        for match in matches
+    ]
+
+
+def _code_error_pre_handled(
+    file: str, line: str, resolved_path: Path | None
+) -> PreHandledMatch | None:
     if resolved_path is None:
         # drop the match if it cannot resolve the path
         return None
@@ -130,19 +238,210 @@ def code_error_post_handler(match: re.Match[str]) -> PostHandledMatch:
 
     line = match.group("line")
 
-    return {"file": str(resolved_path.resolve()), "line": line}
+    return {"file": str(resolved_path), "line": line}
+
+
+def code_error_canonical(match: re.Match[str]) -> str:
+    return f"{canonical_path(match.group('file'))}:{match.group('line')}"
 
 
 code_error_scheme: SchemeEntry = {
     "tags": ("code err.", "Python"),
     "opener": OpenerType.EDITOR,
+    "pure": True,
+    "canonical": code_error_canonical,
     "post_handler": code_error_post_handler,
     "pre_handler": code_error_pre_handler,
+    "pre_handler_batch": code_error_pre_handler_batch,
     "regex": [re.compile(r"File \"(?P<file>...*?)\"\, line (?P<line>[0-9]+)")],
 }
 
 # <<< CODE ERROR SCHEME <<<
 
+# >>> DIAGNOSTICS SCHEME >>>
+
+# Diagnostics of compilers, linters and test runners:
+#
+#   src/a.c:12:5: warning: ...           (gcc, clang, go, eslint -f unix)
+#   --> src/main.rs:3:5                  (rustc)
+#   pkg/mod.py:12: error: ...            (mypy, pytest)
+#   src/a.ts(12,5): error TS2322: ...    (tsc, msvc)
+#
+# The path must have a directory or an extension, so that times (12:30:00) and
+# the like are not taken for one.
+_DIAGNOSTIC_FILE = (
+    r"(?<![^\s'\"(\[])"
+    r"(?P<file>(?=[^\s:'\"()<>\[\]|*?]*[./])[^\s:'\"()<>\[\]|*?]*[^\s:'\"()<>\[\]|*?.,])"
+)
+
+
+def diagnostic_pre_handler(match: re.Match[str]) -> PreHandledMatch | None:
+    file = match.group("file")
+    if not is_path_like(file, configs.max_path_length):
+        return None
+    return _diagnostic_pre_handled(match, heuristic_find_file(file))
+
+
+def diagnostic_pre_handler_batch(
+    matches: list[re.Match[str]],
+) -> list[PreHandledMatch | None]:
+    # A build log names the same few files thousands of times: each distinct
+    # path is resolved once, and the result is kept for the post-handler
+    files = {match.group("file") for match in matches}
+    resolved_paths = heuristic_find_files(
+        file for file in files if is_path_like(file, configs.max_path_length)
+    )
+    return [
+        _diagnostic_pre_handled(match, resolved_paths.get(match.group("file")))
+        for match in matches
+    ]
+
+
+def _diagnostic_pre_handled(
+    match: re.Match[str], resolved_path: Path | None
+) -> PreHandledMatch | None:
+    if resolved_path is None:
+        # drop the match if it cannot resolve the path
+        return None
+
+    info = fs_metadata.info(resolved_path)
+    if info is None or not info.is_file:
+        # A directory has no line to open
+        return None
+
+    location = f"{match.group('file')}:{match.group('line')}"
+    col = match.group("col")
+    if col:
+        location += f":{col}"
+    display_text = f"{colors.ansi_color(91)}{location}{colors.reset_color}"
+
+    return {"display_text": display_text, "tag": "diagnostic"}
+
+
+def diagnostic_post_handler(match: re.Match[str]) -> PostHandledMatch:
+    file = match.group("file")
+
+    # Answered from the lookups of the pre-handler
+    resolved_path = heuristic_find_file(file)
+
+    if resolved_path is None:
+        raise FailedResolvePath(f"could not resolve the path of: {file}")
+
+    return {
+        "file": str(resolved_path),
+        "line": match.group("line"),
+        "col": match.group("col") or "1",
+    }
+
+
+def diagnostic_canonical(match: re.Match[str]) -> str:
+    key = f"{canonical_path(match.group('file'))}:{match.group('line')}"
+    col = match.group("col")
+    return f"{key}:{col}" if col else key
+
+
+diagnostic_scheme: SchemeEntry = {
+    "tags": ("diagnostic",),
+    "opener": OpenerType.EDITOR,
+    "pure": True,
+    "canonical": diagnostic_canonical,
+    "post_handler": diagnostic_post_handler,
+    "pre_handler": diagnostic_pre_handler,
+    "pre_handler_batch": diagnostic_pre_handler_batch,
+    "regex": [
+        # path:line[:col]
+        re.compile(
+            _DIAGNOSTIC_FILE + r":(?P<line>\d+)(?::(?P<col>\d+))?(?=[:\s,)]|$)",
+            re.MULTILINE,
+        ),
+        # path(line[,col])
+        re.compile(
+            _DIAGNOSTIC_FILE + r"\((?P<line>\d+)(?:,(?P<col>\d+))?\)(?=:)",
+            re.MULTILINE,
+        ),
+    ],
+}
+
+# <<< DIAGNOSTICS SCHEME <<<
+
+# >>> COMMIT HASH SCHEME >>>
+
+# Abbreviated or full commit hashes, as in `git log --oneline`. A token must
+# have a letter, so that plain numbers are not looked up, and must not be part
+# of a path, a URL or a longer word. Either end of a range, as in `a..b` or
+# `a...b`, is a token of its own, and so is a hash ending a sentence. A short
+# hash made only of digits (about 3.7% of 7-character hashes) is therefore
+# never listed.
+_COMMIT_HASH = re.compile(
+    r"(?<![\w/-])(?<![\w/-]\.)(?=[0-9]*[a-f])[0-9a-f]{7,64}(?!\.?[\w/-])"
+)
+
+
+def commit_pre_handler(match: re.Match[str]) -> PreHandledMatch | None:
+    return commit_pre_handler_batch([match])[0]
+
+
+def commit_pre_handler_batch(
+    matches: list[re.Match[str]],
+) -> list[PreHandledMatch | None]:
+    # One `git cat-file` process checks all the candidates
+    commits = git_objects.commits(match.group(0) for match in matches)
+    pre_handled: list[PreHandledMatch | None] = []
+    for match in matches:
+        if commits[match.group(0)] is None:
+            # Not a hash, or the hash of no commit of this repository
+            pre_handled.append(None)
+            continue
+        display_text = f"{colors.ansi_color(33)}{match.group(0)}{colors.reset_color}"
+        pre_handled.append({"display_text": display_text, "tag": "sha"})
+    return pre_handled
+
+
+def commit_post_handler(match: re.Match[str]) -> PostHandledMatch:
+    sha = git_objects.commit(match.group(0))
+    if sha is None:
+        raise FailedResolvePath(f"not a commit of the repository: {match.group(0)}")
+
+    if configs.commit_open == "browser":
+        remote = git_objects.remote_url()
+        url = forge_commit_url(remote, sha) if remote is not None else None
+        if url is not None:
+            return _open_url(url)
+
+    # No forge to show the commit: show it in a new window
+    return {
+        "cmd": "tmux",
+        "args": [
+            "new-window",
+            "-c",
+            fs_metadata.cwd(),
+            "-n",
+            sha[:7],
+            "git",
+            "show",
+            sha,
+        ],
+    }
+
+
+def _open_url(url: str) -> PostHandledMatch:
+    # The browser is started as a custom command, like `git show`
+    args = browser_cmd({"url": url}, configs.browser_open_cmd)
+    return {"cmd": args[0], "args": args[1:]}
+
+
+commit_scheme: SchemeEntry = {
+    "tags": ("sha",),
+    "opener": OpenerType.CUSTOM_OPEN,
+    "pure": True,
+    "post_handler": commit_post_handler,
+    "pre_handler": commit_pre_handler,
+    "pre_handler_batch": commit_pre_handler_batch,
+    "regex": [_COMMIT_HASH],
+}
+
+# <<< COMMIT HASH SCHEME <<<
+
 # >>> URL SCHEME >>>
 
 _URL_TRAILING_PUNCTUATION = ".,;:!?'\""
@@ -174,9 +473,15 @@ def url_post_handler(match: re.Match[str]) -> PostHandledMatch:
     return {"url": trim_url(match.group(0))}
 
 
+def url_canonical(match: re.Match[str]) -> str:
+    return canonical_url(trim_url(match.group(0)))
+
+
 url_scheme: SchemeEntry = {
     "tags": ("url",),
     "opener": OpenerType.BROWSER,
+    "pure": True,
+    "canonical": url_canonical,
     "post_handler": url_post_handler,
     "pre_handler": url_pre_handler,
     "regex": [
@@ -199,26 +504,59 @@ def file_pre_handler(match: re.Match[str]) -> PreHandledMatch | None:
         # This is not supposed to happen, but to be on the safe side
         return None
 
-    # configs.logger.warning(f"LEN: {configs.max_path_length}")
-    if len(file_path.encode("utf-8")) > configs.max_path_length:
-        return None
-
-    # Drop matches containing only `.` such as current and previous folder
-    if all(char == "." for char in file_path):
-        return None
-
-    # Drop matches containing only `~` for the home directory
-    if file_path == "~":
+    # Drop matches that cannot name a file (too long, only `.` or `~`). The
+    # tokenizer already filters its own candidates; this covers user schemes
+    # reusing the handler with a regex of their own.
+    if not is_path_like(file_path, configs.max_path_length):
         return None
 
     # Return the fully resolved path
     resolved_path = heuristic_find_file(file_path)
 
+    return _file_pre_handled(file_path, resolved_path)
+
+
+def file_pre_handler_batch(
+    matches: list[re.Match[str]],
+) -> list[PreHandledMatch | None]:
+    # Candidates differing only by their `:line` suffix share one lookup and
+    # one display text
+    links = [match.group("link") for match in matches]
+    resolved_paths, unknown = resolve_paths(
+        link for link in links if is_path_like(link, configs.max_path_length)
+    )
+    pre_handled: dict[str, PreHandledMatch | None] = {
+        link: _file_pre_handled(link, resolved_path)
+        for link, resolved_path in resolved_paths.items()
+    }
+    if configs.unknown_paths == "dim":
+        # Paths on a filesystem too slow to answer are listed, dimmed. They
+        # are looked up again if selected.
+        for link in unknown:
+            pre_handled[link] = {
+                "display_text": f"{colors.dim_color}{link}{colors.reset_color}",
+                "tag": "file",
+            }
+    return [pre_handled.get(link) for link in links]
+
+
+def _file_pre_handled(
+    file_path: str, resolved_path: Path | None
+) -> PreHandledMatch | None:
     # Drop match if heuristic_find_file failed to find an associated file
     if resolved_path == None:
         return None
 
-    tag = "dir" if resolved_path.is_dir() else "file"
+    info = fs_metadata.info(resolved_path)
+    tag = "dir" if info is not None and info.is_dir else "file"
+    if (
+        tag == "file"
+        and configs.binary_files != "show"
+        and binary_files.is_binary(resolved_path)
+    ):
+        if configs.binary_files == "hide":
+            return None
+        tag = "binary"
     if colors.enabled:
         color_code = colors.get_file_color(resolved_path)
         display_text = f"\033[{color_code}m{file_path}\033[0m"
@@ -240,66 +578,77 @@ def file_post_handler(match: re.Match[str]) -> PostHandledMatch:
     if resolved_path is None:
         raise FailedResolvePath(f"could not resolve the path of: {file_path}")
 
-    resolved_path_str = str(resolved_path)
+    return _open_path(str(resolved_path), line)
 
-    if resolved_path.is_file():
+
+def _open_path(path: str, line: str, col: str = "1") -> PostHandledMatch:
+    info = fs_metadata.info(path)
+    if info is not None and info.is_file:
         if configs.editor_open_cmd:
             # Open the the file with configured editor
             args = shlex.split(
-                configs.editor_open_cmd.replace(f"%file", resolved_path_str).replace(
-                    f"%line", line
-                )
+                configs.editor_open_cmd.replace(f"%file", path)
+                .replace(f"%line", line)
+                .replace(f"%col", col)
             )
-            return {"cmd": args[0], "args": args[1:], "file": resolved_path_str}
+            return {"cmd": args[0], "args": args[1:], "file": path}
         else:
             raise NoEditorConfigured("no editor command is configured")
     else:
         # If directory, then cd into the selected directory
         return {
             "cmd": "tmux",
-            "args": ["send-keys", f'cd "{resolved_path_str}"', "C-m"],
-            "file": resolved_path_str,
+            "args": ["send-keys", f'cd "{path}"', "C-m"],
+            "file": path,
         }
 
 
-# Upper bound on max path length -- this is further narrowed down by configs.max_path_length
-MAX_PATH_LENGTH = 4096
+def file_canonical(match: re.Match[str]) -> str:
+    # The same file at different lines stays listed once per line
+    line = match.group("line")
+    path = canonical_path(match.group("link"))
+    return f"{path}:{line}" if line else path
+
+
+def file_finditer(content: str) -> Iterator[re.Match[str]]:
+    # Line-start, quoted and bare path candidates, in one linear pass
+    return path_candidates(content, configs.max_path_length)
+
 
 file_scheme: SchemeEntry = {
     "tags": (
         "file",
         "dir",
+        "binary",
     ),
     "opener": OpenerType.CUSTOM_OPEN,
+    "pure": True,
+    # Paths are also part of code errors and git remotes, which stay listed
+    "claims": False,
+    "canonical": file_canonical,
     "post_handler": file_post_handler,
     "pre_handler": file_pre_handler,
-    # Use fr prefix and double the curly braces for the regex quantifier
-    "regex": [
-        # filename with spaces, starting at the line beginning
-        re.compile(
-            rf"(?P<link>^[^<>:\"\\|?*\x00-\x1F]{{1,{MAX_PATH_LENGTH}}})(\:(?P<line>\d+))?",
-            re.MULTILINE,
-        ),
-        # filename with spaces, quoted
-        re.compile(
-            rf"'(?P<link>[^:'\"\\|?*\x00-\x1F]{{1,{MAX_PATH_LENGTH}}})'(\:(?P<line>\d+))?"
-        ),
-        # filename not including spaces
-        re.compile(
-            rf"(?P<link>[^ :'\"\\|?*\x00-\x1F]{{1,{MAX_PATH_LENGTH}}})(\:(?P<line>\d+))?"
-        ),
-    ],
+    "pre_handler_batch": file_pre_handler_batch,
+    # Candidates come from the tokenizer in `path_tokens`, not from a regex
+    "regex": [],
+    "finditer": file_finditer,
 }
 
 # <<< FILE SCHEME <<<
 
-# Define schemes
+# Define schemes. The order sets the precedence: a scheme skips the regions
+# already claimed by the schemes before it. The diagnostic scheme comes before
+# the file scheme, which then skips `path:line:col` locations. The file scheme
+# claims nothing, so the schemes after it still list code errors and remotes.
 default_schemes: list[SchemeEntry] = [
+    osc8_file_scheme,
     osc8_scheme,
     url_scheme,
+    diagnostic_scheme,
     file_scheme,
     git_scheme,
     code_error_scheme,
+    commit_scheme,
 ]
 
 __all__ = ["default_schemes"]
@@ -2,20 +2,35 @@
 #   Author: (c) 2024 Andrea Alberti
 # ===============================================================================
 
+from .binary_files import binary_files
 from .colors import colors
 from .configs import configs
-from .hyperlinks import target_for, url_kind
+from .fs_metadata import fs_metadata
+from .git_objects import git_objects
+from .hyperlinks import canonical_url, target_for, url_kind
 from .opener import OpenerType, PostHandledMatch, PreHandledMatch, SchemeEntry
-from .schemes import heuristic_find_file
+from .schemes import (
+    canonical_path,
+    heuristic_find_file,
+    heuristic_find_files,
+    resolve_paths,
+)
 
 __all__ = [
     "OpenerType",
     "SchemeEntry",
+    "binary_files",
+    "canonical_path",
+    "canonical_url",
     "colors",
     "configs",
+    "fs_metadata",
+    "git_objects",
     "heuristic_find_file",
+    "heuristic_find_files",
     "PreHandledMatch",
     "PostHandledMatch",
+    "resolve_paths",
     "target_for",
     "url_kind",
 ]
@@ -0,0 +1,377 @@
+# ===============================================================================
+#   Author: (c) 2024 Andrea Alberti
+# ===============================================================================
+
+"""Per-run cache of filesystem metadata.
+
+Resolving a path candidate, tagging it as a file or directory, coloring it with
+LS_COLORS and opening it after selection all ask the filesystem about the same
+path. Each `Path.is_*` or `exists()` call is a `stat` of its own, so a single
+listed file used to cost a dozen syscalls. The cache does one `lstat` per path,
+plus one `stat` for symlinks, and answers every question from the result.
+
+Most bare words of a capture ("the", "error", "done") name no file. Once a
+directory was asked about a second entry, it is listed with `os.scandir`, and
+names missing from the listing are rejected without a syscall of their own.
+Only the names found in it are `lstat`-ed.
+
+Lookups running on other threads, which may be abandoned while blocked on a
+slow filesystem, do not touch the cache: they `probe` a path, and the result is
+`merge`d into the cache on the main thread.
+
+The cache lives for one run: `run()` clears it, since files may change between
+two key presses. Names found missing can also be kept across runs, in a
+`NegativeCache` checked against the modification time of their directory.
+"""
+
+from __future__ import annotations
+
+import errno
+import os
+import stat
+from collections.abc import Mapping
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import ClassVar
+
+from .negative_cache import NegativeCache
+
+# Errors meaning that nothing usable exists at a path
+_MISSING_ERRNOS = {errno.ENOENT, errno.ENOTDIR, errno.ELOOP, errno.ENAMETOOLONG}
+
+# A directory is listed once this many of its entries have been looked up. A
+# single lookup is cheaper with `lstat` than with a listing.
+INDEX_AFTER_LOOKUPS = 2
+# Directories with more entries are not indexed, their entries are looked up one
+# by one
+MAX_INDEXED_ENTRIES = 10000
+
+# Listing of a directory that does not exist
+_ABSENT: frozenset[str] = frozenset()
+
+
+@dataclass(frozen=True)
+class FileInfo:
+    """The metadata of a path, as seen by `lstat` and, for symlinks, `stat`."""
+
+    # Metadata of the path itself
+    link_mode: int
+    # Metadata of the target, following symlinks. None for a dangling symlink.
+    mode: int | None
+    # Size and modification time of the target, when it exists
+    size: int | None = None
+    mtime_ns: int | None = None
+
+    @property
+    def exists(self) -> bool:
+        return self.mode is not None
+
+    @property
+    def is_symlink(self) -> bool:
+        return stat.S_ISLNK(self.link_mode)
+
+    @property
+    def is_dir(self) -> bool:
+        return self.mode is not None and stat.S_ISDIR(self.mode)
+
+    @property
+    def is_file(self) -> bool:
+        return self.mode is not None and stat.S_ISREG(self.mode)
+
+    @property
+    def is_executable(self) -> bool:
+        # Like `ls`, any execute bit counts, whoever the caller is
+        return (
+            self.mode is not None
+            and stat.S_ISREG(self.mode)
+            and bool(self.mode & 0o111)
+        )
+
+
+@dataclass(frozen=True)
+class Probe:
+    """The metadata of a path, looked up without the cache by `probe`."""
+
+    info: FileInfo | None
+    # Modification time of the parent directory, taken before the lookup, when
+    # asked for
+    parent_mtime_ns: int | None
+    syscalls: int
+
+
+def _split(path: str) -> tuple[str, str]:
+    # Parent directory and name of a path
+    head, separator, name = path.rpartition("/")
+    return head or ("/" if separator else "."), name
+
+
+def _stat(path: str) -> tuple[FileInfo | None, int]:
+    # The metadata of `path`, and the number of syscalls it took
+    syscalls = 0
+    try:
+        syscalls += 1
+        result: os.stat_result | None = os.lstat(path)
+        link_mode = result.st_mode
+        if stat.S_ISLNK(link_mode):
+            try:
+                syscalls += 1
+                result = os.stat(path)
+            except OSError as e:
+                if e.errno not in _MISSING_ERRNOS:
+                    raise
+                result = None
+        if result is None:
+            return FileInfo(link_mode, None), syscalls
+        return (
+            FileInfo(link_mode, result.st_mode, result.st_size, result.st_mtime_ns),
+            syscalls,
+        )
+    except OSError as e:
+        if e.errno not in _MISSING_ERRNOS:
+            raise
+    except ValueError:
+        # Embedded null byte: no file can have such a name
+        pass
+    return None, syscalls
+
+
+def probe(
+    path: str, missing: Mapping[str, tuple[int, frozenset[str]]] | None = None
+) -> Probe:
+    """Look up `path` without reading or changing the cache, e.g. on a thread
+    of its own.
+
+    `missing` holds the names known to be missing, by parent directory, with
+    the modification time they hold for (see `NegativeCache.valid_entries`).
+    When given, the parent's modification time is taken, and a known missing
+    name is not looked up.
+    """
+    parent, name = _split(path)
+    mtime_ns: int | None = None
+    syscalls = 0
+    if missing is not None and name not in ("", ".", ".."):
+        syscalls += 1
+        try:
+            mtime_ns = os.stat(parent).st_mtime_ns
+        except (OSError, ValueError):
+            pass
+        entry = missing.get(parent)
+        if entry is not None and entry[0] == mtime_ns and name in entry[1]:
+            return Probe(None, mtime_ns, syscalls)
+    info, count = _stat(path)
+    return Probe(info, mtime_ns, syscalls + count)
+
+
+class FsMetadataSingletonCls:
+    _instance: ClassVar[FsMetadataSingletonCls | None] = None
+
+    _infos: dict[str, FileInfo | None]  # metadata by path, None when missing
+    _resolved: dict[str, Path]  # resolved path by path
+    # Resolved path by path whose parent directory is resolved already
+    _real: dict[str, str]
+    _cwd: str | None  # current directory, looked up once per run
+    # Casefolded entry names by directory, None when it cannot be indexed
+    _listings: dict[str, frozenset[str] | None]
+    _lookups: dict[str, int]  # number of entries looked up by directory
+    _mtimes: dict[str, int | None]  # modification time by directory
+    negatives: NegativeCache | None  # names found missing in earlier runs
+    syscalls: int  # number of filesystem calls made since the last clear
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance.clear()
+        return cls._instance
+
+    def clear(self) -> None:
+        """Forget everything, e.g. at the start of a new run."""
+        self._infos = {}
+        self._resolved = {}
+        self._real = {}
+        self._cwd = None
+        self._listings = {}
+        self._lookups = {}
+        self._mtimes = {}
+        self.negatives = None
+        self.syscalls = 0
+
+    def info(self, path: str | Path) -> FileInfo | None:
+        """Return the metadata of `path`, or None when there is nothing there.
+
+        Errors other than a missing file or a name too long (e.g. permission
+        denied) are raised, like `Path.exists()` does.
+        """
+        key = str(path)
+        if key in self._infos:
+            return self._infos[key]
+        parent, name = _split(key)
+        negatives = self.negatives
+        mtime_ns: int | None = None
+        if negatives is not None and name not in ("", ".", ".."):
+            # Taken before the lookup, so that a file created meanwhile
+            # invalidates the name recorded as missing
+            mtime_ns = self._mtime(parent)
+        if mtime_ns is not None and negatives is not None:
+            if negatives.is_missing(parent, mtime_ns, name):
+                self._infos[key] = None
+                return None
+        info = self._lookup(key, parent, name)
+        if info is None and mtime_ns is not None and negatives is not None:
+            negatives.record(parent, mtime_ns, name)
+        self._infos[key] = info
+        return info
+
+    def _lookup(self, path: str, parent: str, name: str) -> FileInfo | None:
+        if self._surely_missing(parent, name):
+            return None
+        info, syscalls = _stat(path)
+        self.syscalls += syscalls
+        return info
+
+    def merge(self, path: str | Path, probed: Probe) -> None:
+        """Record the result of a `probe` of `path`, as if `info` looked it up."""
+        key = str(path)
+        self.syscalls += probed.syscalls
+        if key in self._infos:
+            return
+        parent, name = _split(key)
+        mtime_ns = probed.parent_mtime_ns
+        if mtime_ns is not None:
+            self._mtimes.setdefault(parent, mtime_ns)
+            if probed.info is None and self.negatives is not None:
+                self.negatives.record(parent, mtime_ns, name)
+        self._infos[key] = probed.info
+
+    def _mtime(self, directory: str) -> int | None:
+        if directory not in self._mtimes:
+            self.syscalls += 1
+            try:
+                self._mtimes[directory] = os.stat(directory).st_mtime_ns
+            except (OSError, ValueError):
+                self._mtimes[directory] = None
+        return self._mtimes[directory]
+
+    def _surely_missing(self, parent: str, name: str) -> bool:
+        """Whether the listing of `parent` rules out its entry `name`."""
+        if name in ("", ".", ".."):
+            return False
+        if parent not in self._listings:
+            lookups = self._lookups.get(parent, 0) + 1
+            self._lookups[parent] = lookups
+            if lookups < INDEX_AFTER_LOOKUPS:
+                return False
+            self._listings[parent] = self._list(parent)
+        listing = self._listings[parent]
+        if listing is _ABSENT:
+            return True
+        if listing is None or name.casefold() in listing:
+            return False
+        # The filesystem may ignore the case or the normalization of names,
+        # e.g. on macOS. Casefolded ASCII names cover the former, and the
+        # others are left to `lstat`.
+        return name.isascii()
+
+    def _list(self, directory: str) -> frozenset[str] | None:
+        self.syscalls += 1
+        names: set[str] = set()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if len(names) == MAX_INDEXED_ENTRIES:
+                        return None
+                    names.add(entry.name.casefold())
+        except OSError as e:
+            if e.errno in _MISSING_ERRNOS:
+                return _ABSENT
+            # E.g. a directory that can be traversed but not read
+            return None
+        except ValueError:
+            return None
+        return frozenset(names)
+
+    def cwd(self) -> str:
+        """Return the current directory, looked up once per run."""
+        if self._cwd is None:
+            self.syscalls += 1
+            self._cwd = os.getcwd()
+        return self._cwd
+
+    def resolve(self, path: str | Path) -> Path:
+        """Return the absolute path of `path`, with every symlink resolved.
+
+        Components are resolved one by one, and each resolved prefix is kept
+        for the run, so the files of one tree share the lookups of their
+        common directories. Missing components are kept as they are, as
+        `Path.resolve()` does.
+
+        The resolved path is a real file, whose metadata is the target's one,
+        so it is recorded without a further syscall.
+        """
+        key = str(path)
+        resolved = self._resolved.get(key)
+        if resolved is None:
+            base = "/"
+            if not key.startswith("/"):
+                # The current directory is free of symlinks already
+                base = self.cwd()
+                # The path and its absolute form name the same file, which
+                # need not be looked up again
+                info = self._infos.get(key)
+                if info is not None and ".." not in key.split("/"):
+                    self._infos.setdefault(f"{base.rstrip('/')}/{key}", info)
+            try:
+                real = self._realpath(base, key, set())
+            except (RuntimeError, OSError):
+                # A symlink loop, or a component that cannot be read. Left to
+                # pathlib, which reports or tolerates them.
+                real = str(Path(key).resolve())
+            resolved = self._resolved[key] = Path(real)
+            info = self._infos.get(key)
+            if info is not None and info.mode is not None:
+                self._infos.setdefault(real, replace(info, link_mode=info.mode))
+        return resolved
+
+    def _realpath(self, real: str, path: str, links: set[str]) -> str:
+        # Resolve `path` relative to the resolved directory `real`. `links`
+        # holds the symlinks being followed, to detect loops.
+        if path.startswith("/"):
+            real = "/"
+        for part in path.split("/"):
+            if part in ("", "."):
+                continue
+            if part == "..":
+                # The prefix is resolved, or missing, so its parent is too
+                real = os.path.dirname(real)
+                continue
+            child = real.rstrip("/") + "/" + part
+            cached = self._real.get(child)
+            if cached is None:
+                info = self.info(child)
+                if info is None:
+                    # Kept as is, like `Path.resolve()` does
+                    real = child
+                    continue
+                if info.is_symlink:
+                    if child in links:
+                        raise RuntimeError(f"symlink loop at {child}")
+                    self.syscalls += 1
+                    target = os.readlink(child)
+                    cached = self._realpath(real, target, links | {child})
+                else:
+                    cached = child
+                self._real[child] = cached
+            real = cached
+        return real
+
+
+# Instantiate the singleton class
+fs_metadata = FsMetadataSingletonCls()
+
+__all__ = [
+    "INDEX_AFTER_LOOKUPS",
+    "MAX_INDEXED_ENTRIES",
+    "FileInfo",
+    "Probe",
+    "fs_metadata",
+    "probe",
+]
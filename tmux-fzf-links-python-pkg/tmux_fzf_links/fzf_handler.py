@@ -65,6 +65,25 @@ def parse_int_option(option_arg: str | None, ref_value: int | None) -> int | Non
     return int_value
 
 
+def vertical_border(partial: bool = False) -> int:
+    """Number of lines of the popup not available to list the items."""
+    # 2 tmux popup borders + fzf info line + fzf prompt line + optional header
+    # + optional note about partial results
+    return 4 + (0 if configs.hide_bottom_bar else 1) + (1 if partial else 0)
+
+
+def maxnum_displayed(fzf_display_options: str, pane_height: int) -> int | None:
+    """Return the value of `--maxnum-displayed`, or None if it is not set."""
+    cmd_user_args: list[str] = shlex.split(fzf_display_options)
+    try:
+        maxnum_str = extract_option(cmd_user_args, "--maxnum-displayed")
+        return parse_int_option(maxnum_str, pane_height - vertical_border())
+    except (IndexError, ValueError):
+        raise FailedParsingUserOption(
+            "option '--maxnum-displayed' is defined but its value is missing or invalid"
+        )
+
+
 def run_fzf(
     fzf_path: str,
     fzf_display_options: str,
@@ -72,15 +91,18 @@ def run_fzf(
     use_colors: bool,
     pane_height: int,
     pane_width: int,
+    partial: bool = False,
 ) -> FzfReturnType:
-    """Run fzf within a tmux popup with the given options and handle output via mkfifo."""
+    """Run fzf within a tmux popup with the given options and handle output via mkfifo.
+
+    When `partial` is true, the header notes that matching was stopped by the
+    `@fzf-links-match-budget` deadline.
+    """
 
     # Parse user options into a list
     cmd_user_args: list[str] = shlex.split(fzf_display_options)
 
-    VER_BORDER = 4 + (
-        0 if configs.hide_bottom_bar else 1
-    )  # 2 tmux popup borders + fzf info line + fzf prompt line + optional header
+    VER_BORDER = vertical_border(partial)
     HOR_BORDER = 2  # number of characters taken by horizontal border
 
     # Command to launch tmux popup
@@ -175,6 +197,12 @@ def run_fzf(
     if use_colors:
         fzf_args.append("--ansi")
 
+    header_lines: list[str] = []
+    if partial:
+        header_lines.append(
+            f"partial results: matching stopped after {configs.match_budget} ms"
+        )
+
     if not configs.hide_bottom_bar:
         if sys.platform == "darwin":
             # meta_key = "⌥"  # option key
@@ -187,13 +215,13 @@ def run_fzf(
             # meta_key = "meta"  # symbol: ◆
             explorer = "explorer"
 
-        fzf_args.extend(
-            [
-                "--header",
-                f"↵ to open with configured opener, ^-d to open with system's default opener, ^-r to reveal in {explorer}, ^-c to copy to tmux buffer",
-            ]
+        header_lines.append(
+            f"↵ to open with configured opener, ^-d to open with system's default opener, ^-r to reveal in {explorer}, ^-c to copy to tmux buffer"
         )
 
+    if header_lines:
+        fzf_args.extend(["--header", "\n".join(header_lines)])
+
     # Combine fzf arguments, giving user options higher priority
     cmd_args = fzf_args + cmd_user_args
 
@@ -0,0 +1,213 @@
+# ===============================================================================
+#   Author: (c) 2024 Andrea Alberti
+# ===============================================================================
+
+"""Validation of commit hashes against the repository of the pane.
+
+`git log --oneline`, `git rebase` and CI output are full of abbreviated commit
+hashes, and of hex tokens that are not hashes at all. The candidates are checked
+by a single `git cat-file --batch-check` process per repository, started on the
+first lookup of the run and fed the names incrementally, one per line, rather
+than by one `git` call per candidate or per batch. The process is closed at the
+end of the run, and the verdicts are kept until then.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import select
+import subprocess
+from collections.abc import Iterable
+from typing import ClassVar
+from urllib.parse import urlsplit
+
+from .fs_metadata import fs_metadata
+from .project_index import GIT_TIMEOUT
+
+logger = logging.getLogger()  # root logger when no argument is provided
+
+# Remotes in the scp-like syntax of ssh, e.g. `git@github.com:owner/repo.git`
+_SCP_REMOTE = re.compile(r"(?:[^@/]+@)?(?P<host>[^:/]+):(?P<path>.+)")
+
+# Names written to `cat-file` before its answers are read, so that neither
+# side blocks on a full pipe
+_NAMES_PER_WRITE = 256
+
+
+class _CatFile:
+    """A `git cat-file --batch-check` process answering one name per line."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.process = subprocess.Popen(
+            [
+                "git",
+                "-C",
+                directory,
+                "cat-file",
+                "--batch-check=%(objectname) %(objecttype)",
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        # Output read past the last complete line
+        self._pending = b""
+
+    def _read_lines(self, count: int) -> list[str]:
+        stdout = self.process.stdout
+        assert stdout is not None
+        while self._pending.count(b"\n") < count:
+            ready, _, _ = select.select([stdout], [], [], GIT_TIMEOUT)
+            if not ready:
+                raise TimeoutError(f"no answer within {GIT_TIMEOUT} s")
+            chunk = os.read(stdout.fileno(), 65536)
+            if not chunk:
+                raise EOFError("git cat-file exited")
+            self._pending += chunk
+        *lines, self._pending = self._pending.split(b"\n", count)
+        return [line.decode("utf-8", "replace") for line in lines]
+
+    def check(self, names: list[str]) -> dict[str, str | None]:
+        """Return the full hash of the commit each name abbreviates, or None."""
+        stdin = self.process.stdin
+        assert stdin is not None
+        commits: dict[str, str | None] = {}
+        for start in range(0, len(names), _NAMES_PER_WRITE):
+            chunk = names[start : start + _NAMES_PER_WRITE]
+            stdin.write("".join(f"{name}\n" for name in chunk).encode())
+            stdin.flush()
+            # `cat-file` answers each name on a line of its own, in order: the
+            # object name and type, or the name followed by `missing` or
+            # `ambiguous`
+            for name, line in zip(chunk, self._read_lines(len(chunk))):
+                object_name, _, object_type = line.partition(" ")
+                commits[name] = object_name if object_type == "commit" else None
+        return commits
+
+    def close(self) -> None:
+        """Let the process exit, killing it if it does not."""
+        try:
+            if self.process.stdin is not None:
+                self.process.stdin.close()
+            _ = self.process.wait(GIT_TIMEOUT)
+        except (OSError, subprocess.SubprocessError):
+            self.process.kill()
+            _ = self.process.wait()
+        if self.process.stdout is not None:
+            self.process.stdout.close()
+
+
+def forge_commit_url(remote: str, sha: str) -> str | None:
+    """Return the web page of commit `sha` on the forge hosting `remote`, or
+    None when the remote is not hosted on a web server (e.g. a local path)."""
+    if "://" in remote:
+        parts = urlsplit(remote)
+        if parts.scheme not in ("https", "http", "ssh", "git"):
+            return None
+        host = parts.hostname
+        path = parts.path
+    else:
+        match = _SCP_REMOTE.fullmatch(remote)
+        if match is None:
+            return None
+        host = match.group("host")
+        path = match.group("path")
+    path = path.strip("/").removesuffix(".git")
+    if not host or "/" not in path:
+        return None
+    # Both spellings are recognized as commits by `url_kind`
+    commit = "-/commit" if "gitlab" in host else "commit"
+    return f"https://{host}/{path}/{commit}/{sha}"
+
+
+class GitObjectsSingletonCls:
+    _instance: ClassVar[GitObjectsSingletonCls | None] = None
+
+    # Full hash by candidate name, None when it names no commit
+    _commits: dict[str, str | None]
+    # The `cat-file` process of each repository directory, None once it failed
+    _cat_files: dict[str, _CatFile | None]
+    # URL of the `origin` remote, None when there is none, unset until read
+    _remote: str | None
+    _remote_read: bool
+    processes: int  # number of git processes started since the last clear
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._cat_files = {}
+            cls._instance.clear()
+        return cls._instance
+
+    def clear(self) -> None:
+        """Forget the verdicts, e.g. at the start of a new run."""
+        self.close()
+        self._commits = {}
+        self._remote = None
+        self._remote_read = False
+        self.processes = 0
+
+    def commits(self, names: Iterable[str]) -> dict[str, str | None]:
+        """Return the full hash of the commit each name abbreviates, or None."""
+        names = list(dict.fromkeys(names))
+        unknown = [name for name in names if name not in self._commits]
+        if unknown:
+            self._commits.update(self._check(fs_metadata.cwd(), unknown))
+        return {name: self._commits[name] for name in names}
+
+    def _check(self, directory: str, names: list[str]) -> dict[str, str | None]:
+        if directory not in self._cat_files:
+            self.processes += 1
+            try:
+                self._cat_files[directory] = _CatFile(directory)
+            except OSError as e:
+                logger.debug(f"could not start git cat-file in {directory}: {e}")
+                self._cat_files[directory] = None
+        cat_file = self._cat_files[directory]
+        if cat_file is None:
+            return dict.fromkeys(names)
+        try:
+            return cat_file.check(names)
+        except (OSError, EOFError, TimeoutError) as e:
+            # E.g. not a repository: `cat-file` exits at once
+            logger.debug(f"could not look up git objects in {directory}: {e}")
+            cat_file.close()
+            self._cat_files[directory] = None
+            return dict.fromkeys(names)
+
+    def close(self) -> None:
+        """End the `cat-file` processes, e.g. at the end of a run."""
+        for cat_file in self._cat_files.values():
+            if cat_file is not None:
+                cat_file.close()
+        self._cat_files = {}
+
+    def commit(self, name: str) -> str | None:
+        """Return the full hash of the commit `name` abbreviates, or None."""
+        return self.commits([name])[name]
+
+    def remote_url(self) -> str | None:
+        """Return the URL of the `origin` remote of the pane's repository."""
+        if not self._remote_read:
+            self._remote_read = True
+            self.processes += 1
+            try:
+                self._remote = subprocess.run(
+                    ["git", "-C", fs_metadata.cwd(), "remote", "get-url", "origin"],
+                    capture_output=True,
+                    check=True,
+                    text=True,
+                    timeout=GIT_TIMEOUT,
+                ).stdout.strip() or None
+            except (OSError, subprocess.SubprocessError) as e:
+                logger.debug(f"could not read the origin remote: {e}")
+        return self._remote
+
+
+# Instantiate the singleton class
+git_objects = GitObjectsSingletonCls()
+
+__all__ = ["forge_commit_url", "git_objects"]
@@ -0,0 +1,197 @@
+# ===============================================================================
+#   Author: (c) 2024 Andrea Alberti
+# ===============================================================================
+
+"""Guarded matching mode for scheme regexes.
+
+A regex that backtracks badly can take minutes on a single pathological line,
+such as a megabyte of minified JSON, and would hang the tmux binding. When
+`@fzf-links-regex-guard` is on, the regexes of a scheme scan the capture line by
+line, each line capped at `max_line_length` characters, in a forked worker. A
+line on which the worker spends longer than `@fzf-links-regex-timeout` is
+skipped: the worker is killed and a new one resumes with the next line.
+
+Matches cannot span lines in guarded mode. Schemes providing `finditer` bring
+their own scanner and are not guarded.
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import re
+import time
+from multiprocessing.connection import Connection
+from typing import Any
+
+from .isolation import can_isolate
+from .opener import SchemeEntry
+
+logger = logging.getLogger()  # root logger when no argument is provided
+
+# Longest interval, in seconds, between two checks of the worker's progress
+_POLL_INTERVAL = 0.05
+
+# Hits of one line: (line number, [(index of the regex, match start), ...])
+_LineHits = tuple[int, list[tuple[int, int]]]
+
+
+def line_spans(source: str, max_line_length: int) -> list[tuple[int, int]]:
+    """Return the `(start, end)` offsets of the lines of `source`, each end
+    capped at `max_line_length` characters past the start."""
+    spans: list[tuple[int, int]] = []
+    start = 0
+    while start <= len(source):
+        end = source.find("\n", start)
+        if end == -1:
+            end = len(source)
+        spans.append((start, min(end, start + max_line_length)))
+        start = end + 1
+    return spans
+
+
+def _scan(
+    regexes: list[re.Pattern[str]],
+    source: str,
+    spans: list[tuple[int, int]],
+    first: int,
+    progress: Any,
+    sender: Connection,
+) -> None:
+    # Runs in the worker. `progress` holds the number of the line being
+    # scanned, so the parent can tell which line the worker is stuck on.
+    try:
+        for number in range(first, len(spans)):
+            progress.value = number
+            start, end = spans[number]
+            hits = [
+                (index, match.start())
+                for index, regex in enumerate(regexes)
+                for match in regex.finditer(source, start, end)
+            ]
+            if hits:
+                sender.send(("line", number, hits))
+        sender.send(("done",))
+    except Exception as e:
+        sender.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        sender.close()
+
+
+def _scan_in_worker(
+    regexes: list[re.Pattern[str]],
+    source: str,
+    spans: list[tuple[int, int]],
+    first: int,
+    timeout: float,
+) -> tuple[list[_LineHits], int | None]:
+    """Scan the lines from `first` on, returning the hits collected and the
+    number of the line the worker was killed on (None if it completed)."""
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+    progress = context.RawValue("q", first)
+    process = context.Process(
+        target=_scan,
+        args=(regexes, source, spans, first, progress, sender),
+        daemon=True,
+    )
+    process.start()
+    sender.close()
+
+    collected: list[_LineHits] = []
+    watched: int = first
+    since = time.monotonic()
+    try:
+        while True:
+            if receiver.poll(min(timeout, _POLL_INTERVAL)):
+                try:
+                    message = receiver.recv()
+                except EOFError:
+                    raise RuntimeError("regex worker exited unexpectedly")
+                if message[0] == "done":
+                    return collected, None
+                if message[0] == "error":
+                    raise RuntimeError(f"regex scan failed in worker: {message[1]}")
+                collected.append((message[1], message[2]))
+            now = time.monotonic()
+            if progress.value != watched:
+                watched, since = progress.value, now
+            elif now - since > timeout:
+                return collected, watched
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join()
+        receiver.close()
+
+
+def guarded_matches(
+    scheme: SchemeEntry,
+    source: str,
+    max_line_length: int,
+    timeout_ms: int,
+    first_line: int = 0,
+) -> list[re.Match[str]]:
+    """Match the regexes of `scheme` against `source` line by line.
+
+    The matches come in the order of `scheme_matches`: all the matches of the
+    first regex, then those of the second one, and so on. `first_line` is the
+    index in the pane of the first line of `source`, which may be a chunk of
+    the capture, so that the lines logged are numbered as in the pane.
+    """
+    regexes = scheme["regex"]
+    if not regexes:
+        return []
+    max_line_length = scheme.get("max_line_length", max_line_length)
+    spans = line_spans(source, max_line_length)
+    for number, (start, end) in enumerate(spans):
+        if end - start == max_line_length and source[end : end + 1] not in ("", "\n"):
+            logger.info(
+                f"scheme with tags {scheme['tags']}: line {first_line + number + 1} truncated to {max_line_length} characters"
+            )
+
+    collected: list[_LineHits] = []
+    if can_isolate():
+        first = 0
+        while first < len(spans):
+            hits, stuck = _scan_in_worker(
+                regexes, source, spans, first, timeout_ms / 1000
+            )
+            collected += hits
+            if stuck is None:
+                break
+            logger.warning(
+                f"scheme with tags {scheme['tags']}: line {first_line + stuck + 1} skipped, matching took longer than {timeout_ms} ms"
+            )
+            first = stuck + 1
+    else:
+        # The line cap still applies, but a scan cannot be interrupted
+        logger.warning(
+            f"scheme with tags {scheme['tags']} cannot be guarded on this platform"
+        )
+        for number, (start, end) in enumerate(spans):
+            collected.append(
+                (
+                    number,
+                    [
+                        (index, match.start())
+                        for index, regex in enumerate(regexes)
+                        for match in regex.finditer(source, start, end)
+                    ],
+                )
+            )
+
+    # Re-create the match objects, which cannot be sent across processes. A
+    # match at a known position succeeds in a single attempt, with the same
+    # groups as in the worker.
+    per_regex: list[list[re.Match[str]]] = [[] for _ in regexes]
+    for number, hits in collected:
+        end = spans[number][1]
+        for index, start in hits:
+            match = regexes[index].match(source, start, end)
+            if match is not None:
+                per_regex[index].append(match)
+    return [match for matches in per_regex for match in matches]
+
+
+__all__ = ["guarded_matches", "line_spans"]
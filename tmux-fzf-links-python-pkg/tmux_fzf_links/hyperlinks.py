@@ -25,8 +25,11 @@ so the remaining (non-escaped) schemes match exactly what they did before.
 from __future__ import annotations
 
 import bisect
+import os
 import re
 from collections.abc import Callable
+from functools import lru_cache
+from urllib.parse import unquote, urlsplit, urlunsplit
 
 # ST (string terminator) is ESC \ or BEL. The URI runs to the terminator. The
 # visible text may carry its own SGR color codes, stripped out below.
@@ -35,6 +38,13 @@ _HYPERLINK = re.compile(
     rf"\x1b\]8;[^;]*;(?P<uri>[^\x1b\x07]*){_ST}(?P<text>.*?)\x1b\]8;;{_ST}",
     re.DOTALL,
 )
+# Hyperlinks to files, as emitted by `ls --hyperlink`, `rg` or `fd`
+_FILE_HYPERLINK = re.compile(
+    rf"\x1b\]8;[^;]*;(?P<uri>[ \t]*[Ff][Ii][Ll][Ee]:[^\x1b\x07]*){_ST}(?P<text>.*?)\x1b\]8;;{_ST}",
+    re.DOTALL,
+)
+# Line number carried by the fragment of a file URI, e.g. `#L12` or `#12:5`
+_FRAGMENT_LINE = re.compile(r"[Ll]?(?P<line>\d+)(?:[:,][Cc]?\d+)?")
 # Any OSC 8 marker (open or close), used to scrub orphans left when a hyperlink
 # is split across the capture boundary.
 _OSC8_ANY = re.compile(rf"\x1b\]8;[^\x1b\x07]*{_ST}")
@@ -47,6 +57,36 @@ def hyperlink_regex() -> re.Pattern[str]:
     return _HYPERLINK
 
 
+def file_hyperlink_regex() -> re.Pattern[str]:
+    """The compiled pattern of OSC 8 hyperlinks with a `file:` target."""
+    return _FILE_HYPERLINK
+
+
+@lru_cache(maxsize=1)
+def _local_hosts() -> frozenset[str]:
+    nodename = os.uname().nodename
+    return frozenset({"", "localhost", nodename.lower(), nodename.split(".")[0].lower()})
+
+
+def file_uri_target(uri: str) -> tuple[str, str | None] | None:
+    """Return the absolute path and the line number, if any, of a `file:` URI.
+
+    Returns None when the URI names a file on another host, or no absolute
+    path. The line number is read from the fragment, e.g. `#L12` or `#12`.
+    """
+    try:
+        parts = urlsplit(uri.strip())
+    except ValueError:
+        return None
+    if parts.scheme.lower() != "file" or parts.netloc.lower() not in _local_hosts():
+        return None
+    path = unquote(parts.path)
+    if not path.startswith("/"):
+        return None
+    line = _FRAGMENT_LINE.fullmatch(parts.fragment)
+    return path, line.group("line") if line else None
+
+
 def clean_text(text: str) -> str:
     """Strip SGR codes from a hyperlink's visible text."""
     return _ANSI.sub("", text).strip()
@@ -131,6 +171,34 @@ def url_kind(url: str) -> str:
 _links: dict[str, str] = {}
 
 
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonical_url(url: str) -> str:
+    """Normalize a URL so that equivalent spellings compare equal.
+
+    The scheme and host are lowercased, a default port is dropped, and so are
+    trailing slashes of the path: `HTTPS://X.org:443/a/` becomes
+    `https://x.org/a`. The query and fragment are kept as they are.
+    """
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or "").lower()
+    if ":" in netloc:
+        # An IPv6 address keeps its brackets
+        netloc = f"[{netloc}]"
+    if parts.username is not None:
+        userinfo = parts.netloc.rpartition("@")[0]
+        netloc = f"{userinfo}@{netloc}"
+    if port is not None and port != _DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{port}"
+    return urlunsplit((scheme, netloc, parts.path.rstrip("/"), parts.query, parts.fragment))
+
+
 def set_links(links: dict[str, str]) -> None:
     """Install the ``visible-text -> URI`` map for the current capture."""
     global _links
@@ -143,6 +211,8 @@ def target_for(text: str) -> str | None:
 
 
 __all__ = [
+    "file_hyperlink_regex",
+    "file_uri_target",
     "hyperlink_regex",
     "clean_text",
     "strip_escapes",
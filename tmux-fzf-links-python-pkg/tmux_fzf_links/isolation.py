@@ -0,0 +1,168 @@
+# ===============================================================================
+#   Author: (c) 2024 Andrea Alberti
+# ===============================================================================
+
+"""Time budgets for scheme handlers, and a worker process to isolate them.
+
+Every user and plugin scheme gets a time budget for its pre-handlers. Once it
+is spent, the remaining matches of the scheme are skipped (pending coroutines
+are cancelled), so one slow user handler cannot stall the popup. The built-in
+schemes are not limited, so that no valid match of theirs is ever dropped. A
+synchronous handler that is already running cannot be interrupted in-process,
+though. Schemes marked as isolated therefore run their handlers in a forked
+worker process, which is killed when the budget runs out.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import multiprocessing
+import time
+from collections.abc import Callable, Iterable
+from typing import Generic, TypeVar
+
+from .opener import SchemeEntry
+
+logger = logging.getLogger()  # root logger when no argument is provided
+
+T = TypeVar("T")
+
+# Tags of the schemes whose overrun was reported during this run
+_reported: set[tuple[str, ...]] = set()
+# Tags of the schemes reported as impossible to isolate during this run
+_not_isolated: set[tuple[str, ...]] = set()
+
+
+class Budget:
+    """A deadline measured on the monotonic clock, or none at all when
+    `milliseconds` is None."""
+
+    def __init__(self, milliseconds: int | None) -> None:
+        self.milliseconds: int | None = milliseconds
+        self.deadline: float = math.inf
+        if milliseconds is not None:
+            self.deadline = time.monotonic() + milliseconds / 1000
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline, never negative."""
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.deadline
+
+
+def report_overrun(scheme: SchemeEntry, budget: Budget, skipped: int) -> None:
+    """Log, once per scheme and run, that a scheme exceeded its budget."""
+    key = tuple(scheme["tags"])
+    if key in _reported:
+        return
+    _reported.add(key)
+    if skipped:
+        what = f"skipped its {skipped} remaining match{'es' if skipped > 1 else ''}"
+    else:
+        what = "its handlers could not be interrupted"
+    logger.warning(
+        f"scheme with tags {scheme['tags']} exceeded its time budget of {budget.milliseconds} ms; {what}"
+    )
+
+
+def report_not_isolated(scheme: SchemeEntry) -> None:
+    """Log, once per scheme and run, that a scheme cannot be isolated."""
+    key = tuple(scheme["tags"])
+    if key in _not_isolated:
+        return
+    _not_isolated.add(key)
+    logger.warning(
+        f"scheme with tags {scheme['tags']} cannot be isolated on this platform"
+    )
+
+
+def clear_overrun_reports() -> None:
+    """Forget the schemes already reported, e.g. at the start of a new run."""
+    _reported.clear()
+    _not_isolated.clear()
+
+
+class WorkerResult(Generic[T]):
+    """Results streamed back by a worker, and whether it ran to completion."""
+
+    def __init__(self, results: list[T], complete: bool) -> None:
+        self.results: list[T] = results
+        self.complete: bool = complete
+
+
+def can_isolate() -> bool:
+    """Whether handlers can run in a worker process on this platform.
+
+    The worker is forked so it inherits the compiled schemes and the matches,
+    neither of which can be pickled.
+    """
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def run_in_worker(
+    work: Callable[[], Iterable[T]],
+    expected: int,
+    budget: Budget,
+    deadline: Budget | None = None,
+) -> WorkerResult[T]:
+    """Run `work` in a forked process, collecting what it yields until `budget`,
+    or `deadline` if given, expires.
+
+    Results are streamed one by one, so the ones produced before the deadline
+    are kept even when the worker is killed. An exception raised by `work` is
+    re-raised in the caller.
+    """
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+
+    def target() -> None:
+        try:
+            for result in work():
+                sender.send(("result", result))
+        except Exception as e:
+            sender.send(("error", f"{type(e).__name__}: {e}"))
+        finally:
+            sender.close()
+
+    process = context.Process(target=target, daemon=True)
+    process.start()
+    sender.close()
+
+    results: list[T] = []
+    complete = False
+    try:
+        while len(results) < expected:
+            timeout = budget.remaining()
+            if deadline is not None:
+                timeout = min(timeout, deadline.remaining())
+            if not receiver.poll(timeout):
+                break
+            try:
+                kind, payload = receiver.recv()
+            except EOFError:
+                raise RuntimeError("handler worker exited unexpectedly")
+            if kind == "error":
+                raise RuntimeError(f"handler failed in worker: {payload}")
+            results.append(payload)
+        else:
+            complete = True
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join()
+        receiver.close()
+
+    return WorkerResult(results, complete)
+
+
+__all__ = [
+    "Budget",
+    "WorkerResult",
+    "can_isolate",
+    "clear_overrun_reports",
+    "report_not_isolated",
+    "report_overrun",
+    "run_in_worker",
+]
@@ -0,0 +1,149 @@
+# ===============================================================================
+#   Author: (c) 2024 Andrea Alberti
+# ===============================================================================
+
+"""Loading of the user schemes file.
+
+The file set with `@fzf-links-user-schemes-path` is either a Python module or a
+file of declarative schemes (see declarative). Every key press starts a new
+interpreter, which loads the file again. No list of schemes is kept across key
+presses, as the schemes of a Python module hold functions that only exist once
+the module runs. What is kept is the bytecode of the module: it is written to
+the plugin's cache directory, so the module is not compiled again even when its
+own directory is read-only.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import importlib.machinery
+import importlib.util
+import logging
+import marshal
+import os
+import pathlib
+import sys
+import time
+from types import CodeType
+from typing import cast
+
+from .cache import cache_dir
+from .declarative import DECLARATIVE_SUFFIXES, load_declarative_schemes
+from .opener import SchemeEntry
+
+logger = logging.getLogger()  # root logger when no argument is provided
+
+
+class _CachedBytecodeLoader(importlib.machinery.SourceFileLoader):
+    """Loader of the user module keeping its bytecode under `bytecode_dir`
+    instead of next to the file, which may be read-only. The modules it
+    imports are cached as usual."""
+
+    def __init__(self, fullname: str, path: str, bytecode_dir: pathlib.Path) -> None:
+        super().__init__(fullname, path)
+        digest = hashlib.sha256(path.encode("utf-8", "surrogateescape"))
+        self.bytecode_path = str(
+            bytecode_dir
+            / f"{digest.hexdigest()[:32]}.{sys.implementation.cache_tag}.pyc"
+        )
+
+    def _header(self) -> bytes:
+        # Magic number, flags, and the modification time and size of the
+        # source, as in a `__pycache__` file
+        stat = os.stat(self.path)
+        return (
+            importlib.util.MAGIC_NUMBER
+            + (0).to_bytes(4, "little")
+            + (int(stat.st_mtime) & 0xFFFFFFFF).to_bytes(4, "little")
+            + (stat.st_size & 0xFFFFFFFF).to_bytes(4, "little")
+        )
+
+    def get_code(self, fullname: str) -> CodeType:
+        header = self._header()
+        try:
+            data = self.get_data(self.bytecode_path)
+            if data[:16] == header:
+                return cast(CodeType, marshal.loads(data[16:]))
+        except (OSError, ValueError, EOFError, TypeError):
+            pass
+        code = self.source_to_code(self.get_data(self.path), self.path)
+        if not sys.dont_write_bytecode:
+            self.set_data(self.bytecode_path, header + marshal.dumps(code))
+        return code
+
+
+def load_user_module(file_path: str) -> tuple[list[SchemeEntry], list[str]]:
+    """Dynamically load a Python module from the given file path."""
+    try:
+        # Ensure the file path is absolute
+        file_path = str(pathlib.Path(file_path).resolve())
+
+        # The bytecode goes to the plugin's cache directory
+        bytecode_dir = cache_dir("bytecode")
+        loader = (
+            None
+            if bytecode_dir is None
+            else _CachedBytecodeLoader("user_schemes_module", file_path, bytecode_dir)
+        )
+        # Create a module spec
+        spec = importlib.util.spec_from_file_location(
+            "user_schemes_module", file_path, loader=loader
+        )
+        if spec and loader is not None:
+            spec.cached = loader.bytecode_path
+        if spec and spec.loader:
+            # Create a new module based on the spec
+            user_module = importlib.util.module_from_spec(spec)
+            # Execute the module to populate its namespace
+            spec.loader.exec_module(user_module)
+
+            # Retrieve the user_schemes attribute
+            user_schemes = cast(
+                list[SchemeEntry] | None, getattr(user_module, "user_schemes", None)
+            )
+
+            # Retrieve the rm_default_schemes attribute
+            rm_default_schemes = cast(
+                list[str] | None, getattr(user_module, "rm_default_schemes", None)
+            )
+
+            if user_schemes is None or not isinstance(user_schemes, list):  # pyright: ignore[reportUnnecessaryIsInstance]
+                raise TypeError(
+                    f"'user_schemes' must be a list, got {type(user_schemes)}"
+                )
+
+            if rm_default_schemes is None:
+                rm_default_schemes = []
+            if not isinstance(rm_default_schemes, list):  # pyright: ignore[reportUnnecessaryIsInstance]
+                raise TypeError(
+                    f"'rm_default_schemes' must be a list, got {type(rm_default_schemes)}"
+                )
+
+            return (
+                user_schemes,
+                rm_default_schemes,
+            )
+        else:
+            raise ImportError(f"cannot create a module spec for {file_path}")
+    except Exception as e:
+        raise ImportError(f"failed to load user module: {e}")
+
+
+def load_user_schemes(file_path: str) -> tuple[list[SchemeEntry], list[str]]:
+    """Return the user schemes and the tags of the default schemes to remove."""
+    start = time.perf_counter()
+    path = str(pathlib.Path(file_path).resolve())
+    # TOML and JSON files hold declarative schemes, anything else is a Python
+    # module
+    if path.endswith(DECLARATIVE_SUFFIXES):
+        user_schemes, rm_default_schemes = load_declarative_schemes(path)
+    else:
+        user_schemes, rm_default_schemes = load_user_module(path)
+
+    logger.debug(
+        f"loaded user schemes from {path} in {(time.perf_counter() - start) * 1000:.1f} ms"
+    )
+    return user_schemes, rm_default_schemes
+
+
+__all__ = ["load_user_module", "load_user_schemes"]
@@ -0,0 +1,180 @@
+# ===============================================================================
+#   Author: (c) 2024 Andrea Alberti
+# ===============================================================================
+
+"""LS_COLORS compiled for fast lookups.
+
+The LS_COLORS string is split into the colors of the file types (`di`, `ln`,
+`ex`, ...) and a trie of the name suffixes (`*.py`, `*.tar.gz`, `*~`), walked
+from the last character of a name. The longest suffix wins, so `*.tar.gz`
+beats `*.gz`, and suffixes match regardless of case, as with GNU `ls`, unless
+two of them differ only by case.
+
+Compiling a large LS_COLORS (themes define a thousand suffixes) costs about a
+millisecond, twice as much as loading the result, so it is kept on disk keyed
+by the hash of the string.
+
+A path is classified from the file type bits of its `lstat` mode, which the
+run's metadata cache holds already, so coloring costs no syscall of its own.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import stat
+from typing import Any, cast
+
+from .cache import cache_dir, read_json, write_json_atomically
+from .fs_metadata import FileInfo
+
+# A trie node maps the next character, walking a name backwards, to its child.
+# The color of the suffix ending at the node is stored under `_COLOR`, or, when
+# suffixes differ only by case, by exact suffix under `_EXACT`.
+Trie = dict[str, Any]
+_COLOR = ""
+_EXACT = "\0"
+
+# LS_COLORS key of each file type other than regular files and directories
+_TYPE_KEYS = {
+    stat.S_IFIFO: "pi",
+    stat.S_IFSOCK: "so",
+    stat.S_IFBLK: "bd",
+    stat.S_IFCHR: "cd",
+}
+
+_VERSION = 1
+
+
+class LsColors:
+    """The colors of LS_COLORS, by file type and by name suffix."""
+
+    def __init__(self, types: dict[str, str], suffixes: Trie) -> None:
+        # Colors by two-letter file type key, e.g. `di`
+        self.types = types
+        # Colors by name suffix, reversed
+        self.suffixes = suffixes
+
+    def __bool__(self) -> bool:
+        return bool(self.types or self.suffixes)
+
+    @classmethod
+    def parse(cls, ls_colors: str) -> LsColors:
+        """Compile an LS_COLORS string."""
+        types: dict[str, str] = {}
+        # Colors by suffix, in their original case
+        by_suffix: dict[str, str] = {}
+        for item in ls_colors.split(":"):
+            key, separator, value = item.partition("=")
+            if not separator:
+                continue
+            if key.startswith("*"):
+                if key[1:]:
+                    by_suffix[key[1:]] = value
+            else:
+                types[key] = value
+
+        folded: dict[str, dict[str, str]] = {}
+        for suffix, value in by_suffix.items():
+            folded.setdefault(suffix.casefold(), {})[suffix] = value
+
+        suffixes: Trie = {}
+        for key, variants in folded.items():
+            node = suffixes
+            for char in reversed(key):
+                node = node.setdefault(char, {})
+            if len(set(variants.values())) == 1:
+                node[_COLOR] = next(iter(variants.values()))
+            else:
+                # Colored differently depending on the case: match exactly
+                node[_EXACT] = variants
+        return cls(types, suffixes)
+
+    @classmethod
+    def load(cls, ls_colors: str) -> LsColors:
+        """Compile an LS_COLORS string, or load it compiled from the disk cache."""
+        directory = cache_dir("ls_colors")
+        if directory is None:
+            return cls.parse(ls_colors)
+        digest = hashlib.sha256(ls_colors.encode("utf-8", "surrogateescape"))
+        cache_file = directory / f"{digest.hexdigest()[:32]}.json"
+        data = read_json(cache_file, _VERSION)
+        if (
+            data is not None
+            and isinstance(data.get("types"), dict)
+            and isinstance(data.get("suffixes"), dict)
+        ):
+            return cls(
+                cast(dict[str, str], data["types"]), cast(Trie, data["suffixes"])
+            )
+
+        compiled = cls.parse(ls_colors)
+        data = {
+            "version": _VERSION,
+            "types": compiled.types,
+            "suffixes": compiled.suffixes,
+        }
+        write_json_atomically(cache_file, data)
+        return compiled
+
+    def suffix_color(self, name: str) -> str | None:
+        """Return the color of the longest suffix of `name` in LS_COLORS."""
+        color: str | None = None
+        node = self.suffixes
+        folded = name.casefold()
+        for index in range(len(folded) - 1, -1, -1):
+            child = node.get(folded[index])
+            if child is None:
+                break
+            node = child
+            if _COLOR in node:
+                color = node[_COLOR]
+            elif _EXACT in node:
+                for suffix, value in cast(dict[str, str], node[_EXACT]).items():
+                    if name.endswith(suffix):
+                        color = value
+                        break
+        return color
+
+    def color(self, name: str, info: FileInfo | None) -> str:
+        """Return the color of the file `name`, described by `info`, or an
+        empty string when LS_COLORS defines none."""
+        types = self.types
+        if info is None:
+            return types.get("mi", "")  # Missing file
+
+        mode = info.link_mode
+        file_type = stat.S_IFMT(mode)
+        if file_type == stat.S_IFLNK:
+            if info.mode is None:
+                return types.get("or", types.get("ln", ""))  # Dangling symlink
+            if types.get("ln") != "target":
+                return types.get("ln", "")  # Symbolic link
+            # Colored as the file it points to
+            mode = info.mode
+            file_type = stat.S_IFMT(mode)
+
+        if file_type == stat.S_IFREG:
+            if mode & stat.S_ISUID and types.get("su"):
+                return types["su"]  # Setuid file
+            if mode & stat.S_ISGID and types.get("sg"):
+                return types["sg"]  # Setgid file
+            if mode & 0o111 and types.get("ex"):
+                return types["ex"]  # Executable file
+            color = self.suffix_color(name)
+            if color is not None:
+                return color
+            return types.get("fi", "")  # Regular file
+        if file_type == stat.S_IFDIR:
+            writable = bool(mode & stat.S_IWOTH)
+            sticky = bool(mode & stat.S_ISVTX)
+            if writable and sticky and types.get("tw"):
+                return types["tw"]  # Sticky and other-writable directory
+            if writable and types.get("ow"):
+                return types["ow"]  # Other-writable directory
+            if sticky and types.get("st"):
+                return types["st"]  # Sticky directory
+            return types.get("di", "")  # Directory
+        return types.get(_TYPE_KEYS.get(file_type, ""), "")
+
+
+__all__ = ["LsColors"]
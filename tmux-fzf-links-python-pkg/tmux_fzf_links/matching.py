@@ -0,0 +1,487 @@
+# ===============================================================================
+#   Author: (c) 2024 Andrea Alberti
+# ===============================================================================
+
+"""Matching phase: run the merged schemes over the capture and collect items."""
+
+from __future__ import annotations
+
+import logging
+import re
+from collections.abc import Awaitable, Callable, Iterable, Iterator
+from typing import cast
+
+from .async_handlers import is_async_handler, run_concurrently
+from .configs import configs
+from .guard import guarded_matches
+from .hyperlinks import offset_translator
+from .isolation import (
+    Budget,
+    can_isolate,
+    report_not_isolated,
+    report_overrun,
+    run_in_worker,
+)
+from .memo import HandlerMemo
+from .opener import PreHandledMatch, SchemeEntry
+from .spans import SpanIndex
+
+logger = logging.getLogger()  # root logger when no argument is provided
+
+# (pre-handled match, matched text, plain-text start, match object)
+Item = tuple[PreHandledMatch, str, int, re.Match[str]]
+
+AsyncPreHandler = Callable[[re.Match[str]], Awaitable[PreHandledMatch | None]]
+
+# Lines scanned first by `collect_newest`. Every further chunk of lines is
+# twice as large as the previous one.
+FIRST_CHUNK_LINES = 64
+# Matches passed to the first call of a batch pre-handler. Every further batch
+# is twice as large as the previous one.
+FIRST_BATCH_SIZE = 64
+
+
+class Deadline(Budget):
+    """Latency budget of the whole matching phase.
+
+    Once it expires, no further match is scanned or pre-handled, and the items
+    collected so far are shown. `reached` tells whether that happened.
+    """
+
+    def __init__(self, milliseconds: int) -> None:
+        super().__init__(milliseconds)
+        self.reached: bool = False
+
+    def check(self) -> bool:
+        """Whether the deadline has been reached, remembering it if so."""
+        if not self.reached and self.expired():
+            self.reached = True
+        return self.reached
+
+
+def scheme_matches(
+    scheme: SchemeEntry, source: str, first_line: int = 0
+) -> Iterator[re.Match[str]]:
+    """Iterate over the matches of a scheme, in the order they are processed.
+
+    `first_line` is the index in the pane of the first line of `source`.
+    """
+    finder = scheme.get("finditer")
+    if finder is not None:
+        yield from finder(source)
+        return
+    if configs.regex_guard:
+        yield from guarded_matches(
+            scheme,
+            source,
+            configs.regex_max_line_length,
+            configs.regex_timeout,
+            first_line,
+        )
+        return
+    for regex in scheme["regex"]:
+        yield from regex.finditer(source)
+
+
+def scheme_budget(scheme: SchemeEntry) -> Budget:
+    """Start the time budget of a scheme's pre-handlers.
+
+    Budgeted schemes, i.e. the user and plugin ones, and isolated schemes,
+    whose worker is killed at the deadline, get `@fzf-links-handler-budget`.
+    The other schemes are not limited.
+    """
+    if scheme.get("budgeted", False) or scheme.get("isolated", False):
+        return Budget(configs.handler_budget)
+    return Budget(None)
+
+
+def pre_handle_all(
+    scheme: SchemeEntry,
+    matches: list[re.Match[str]],
+    memo: HandlerMemo,
+    budget: Budget | None = None,
+    deadline: Deadline | None = None,
+) -> Iterable[PreHandledMatch | None]:
+    """Pre-handle the matches of a scheme within its time budget.
+
+    Matches left over when the budget runs out, or once `deadline` is reached,
+    are skipped: the iterable ends early, or yields None for them. `budget` is
+    the scheme's budget for the run, when the scheme is pre-handled in several
+    calls; a fresh one is started otherwise.
+    """
+    if budget is None:
+        budget = scheme_budget(scheme)
+    pre_handler = scheme["pre_handler"]
+    batched = "pre_handler_batch" in scheme
+    if scheme.get("isolated", False) and (batched or pre_handler is not None):
+        if can_isolate():
+            return memo.pre_handle_batch(
+                scheme, matches, lambda batch: _isolated(scheme, batch, budget, deadline)
+            )
+        report_not_isolated(scheme)
+    if batched:
+        return _in_batches(scheme, matches, memo, budget, deadline)
+    if is_async_handler(pre_handler):
+        # Await the coroutines of all the matches concurrently
+        return memo.pre_handle_batch(
+            scheme,
+            matches,
+            lambda batch: _concurrent(scheme, batch, budget, deadline),
+        )
+    return _one_by_one(scheme, matches, memo, budget, deadline)
+
+
+def _one_by_one(
+    scheme: SchemeEntry,
+    matches: list[re.Match[str]],
+    memo: HandlerMemo,
+    budget: Budget,
+    deadline: Deadline | None,
+) -> Iterator[PreHandledMatch | None]:
+    for index, match in enumerate(matches):
+        if budget.expired():
+            report_overrun(scheme, budget, len(matches) - index)
+            return
+        if deadline is not None and deadline.check():
+            return
+        yield memo.pre_handle(scheme, match)
+
+
+def _in_batches(
+    scheme: SchemeEntry,
+    matches: list[re.Match[str]],
+    memo: HandlerMemo,
+    budget: Budget,
+    deadline: Deadline | None,
+) -> Iterator[PreHandledMatch | None]:
+    # A call of the batch pre-handler cannot be interrupted, so the matches
+    # are passed in batches of growing size, and the budget and the deadline
+    # are checked between two of them. All the results of a batch are kept.
+    start = 0
+    size = FIRST_BATCH_SIZE
+    while start < len(matches):
+        if budget.expired():
+            report_overrun(scheme, budget, len(matches) - start)
+            return
+        if deadline is not None and deadline.check():
+            return
+        yield from memo.pre_handle_batch(scheme, matches[start : start + size])
+        start += size
+        size *= 2
+    if budget.expired():
+        # The last batch ran over, though nothing was skipped
+        report_overrun(scheme, budget, 0)
+
+
+def _concurrent(
+    scheme: SchemeEntry,
+    matches: list[re.Match[str]],
+    budget: Budget,
+    deadline: Deadline | None,
+) -> list[PreHandledMatch | None]:
+    if deadline is not None and deadline.check():
+        return [None] * len(matches)
+    timeout = budget.remaining()
+    if deadline is not None:
+        timeout = min(timeout, deadline.remaining())
+    results, cancelled = run_concurrently(
+        cast(AsyncPreHandler, scheme["pre_handler"]),
+        matches,
+        configs.handler_concurrency,
+        timeout,
+    )
+    if cancelled:
+        # Calls cancelled at the deadline are not the scheme's fault
+        if budget.expired():
+            report_overrun(scheme, budget, cancelled)
+        elif deadline is not None:
+            _ = deadline.check()
+    return results
+
+
+def _isolated(
+    scheme: SchemeEntry,
+    matches: list[re.Match[str]],
+    budget: Budget,
+    deadline: Deadline | None,
+) -> list[PreHandledMatch | None]:
+    if deadline is not None and deadline.check():
+        return [None] * len(matches)
+
+    def work() -> Iterator[PreHandledMatch | None]:
+        # Runs in the worker process, so the parent's memo is of no use here
+        if "pre_handler_batch" in scheme:
+            yield from scheme["pre_handler_batch"](matches)
+        elif is_async_handler(scheme["pre_handler"]):
+            yield from run_concurrently(
+                cast(AsyncPreHandler, scheme["pre_handler"]),
+                matches,
+                configs.handler_concurrency,
+            )[0]
+        else:
+            yield from (HandlerMemo().pre_handle(scheme, match) for match in matches)
+
+    worker = run_in_worker(work, len(matches), budget, deadline)
+    results = worker.results
+    if not worker.complete:
+        if budget.expired():
+            report_overrun(scheme, budget, len(matches) - len(results))
+        elif deadline is not None:
+            _ = deadline.check()
+        results += [None] * (len(matches) - len(results))
+    return results
+
+
+def collect_items(
+    schemes: list[SchemeEntry],
+    content: str,
+    content_escaped: str,
+    escaped_to_plain: Callable[[int], int],
+    memo: HandlerMemo | None = None,
+    owners: dict[str, int] | None = None,
+    deadline: Deadline | None = None,
+    budgets: dict[int, Budget] | None = None,
+    first_line: int = 0,
+) -> list[Item]:
+    """Run every scheme, in precedence order, and return the accepted matches.
+
+    `owners` maps each key already accepted to the index of its scheme, and
+    `budgets` each scheme's time budget, by `id`; both are updated in place.
+    Once `deadline` is reached, the items accepted so far are returned.
+    """
+    if memo is None:
+        memo = HandlerMemo()
+
+    # We use the unique set as an expedient to sort over
+    # pre_handled_text while keeping the original text
+    if owners is None:
+        owners = {}
+    claimed = SpanIndex()
+    items: list[Item] = []
+
+    # Process each scheme
+    for precedence, scheme in enumerate(schemes):
+        if deadline is not None and deadline.check():
+            break
+        # Escaped schemes (e.g. the OSC 8 hyperlink scheme) match the raw
+        # capture. Everything else matches the reconstructed plain text.
+        escaped = scheme.get("escaped", False)
+        pure = scheme.get("pure", False)
+        canonical = scheme.get("canonical")
+        source = content_escaped if escaped else content
+        # Regions accepted by this scheme. They only take effect for the
+        # schemes that follow, so a scheme never suppresses its own hits.
+        claims: list[tuple[int, int]] = []
+        # Hits that survive the cheap filters, as (match, start, end, key)
+        candidates: list[tuple[re.Match[str], int, int, str]] = []
+        for match in scheme_matches(scheme, source, first_line):
+            if deadline is not None and deadline.check():
+                break
+            match_start, match_end = match.span()
+            if escaped:
+                # Offsets into the escaped capture are inflated by the escape
+                # bytes. Translate to the plain-text coordinate space so the
+                # match sorts by its on-screen position alongside the other
+                # schemes.
+                match_start = escaped_to_plain(match_start)
+                match_end = escaped_to_plain(match_end)
+
+            # Skip hits inside a region a previous scheme already owns
+            if claimed.overlaps(match_start, match_end):
+                continue
+
+            # Matches are deduplicated by the scheme's canonical form of the
+            # match, or else by the matched text
+            key = canonical(match) if canonical is not None else match.group(0)
+
+            # A pure scheme would only have its result discarded for a key
+            # that is already listed, so the pre-handler is not even called.
+            # Repeats of a text this scheme accepted are memo hits instead and
+            # still claim their region.
+            owner = owners.get(key)
+            if (
+                pure
+                and owner is not None
+                and (
+                    owner < precedence
+                    or (owner == precedence and not memo.has_pre(scheme, match))
+                )
+            ):
+                continue
+
+            candidates.append((match, match_start, match_end, key))
+
+        # The most recent hit of each key, which is the one listed
+        latest: dict[str, int] = {}
+        for index, (_, match_start, _, key) in enumerate(candidates):
+            if key not in latest or match_start > candidates[latest[key]][1]:
+                latest[key] = index
+
+        # The older hits sharing a key with a hit of a pure scheme share its
+        # fate. They are not pre-handled, and their regions are claimed along
+        # with it.
+        equivalents: dict[str, list[tuple[int, int]]] = {}
+        if pure:
+            kept: list[tuple[re.Match[str], int, int, str]] = []
+            for index, candidate in enumerate(candidates):
+                _, match_start, match_end, key = candidate
+                if latest[key] == index:
+                    kept.append(candidate)
+                else:
+                    equivalents.setdefault(key, []).append((match_start, match_end))
+            candidates = kept
+
+        # Index in `items` of the keys listed by this scheme
+        listed: dict[str, int] = {}
+
+        budget: Budget | None = None
+        if budgets is not None:
+            budget = budgets.get(id(scheme))
+            if budget is None:
+                budget = budgets[id(scheme)] = scheme_budget(scheme)
+
+        # Extract and process the matching strings
+        results = pre_handle_all(
+            scheme, [c[0] for c in candidates], memo, budget, deadline
+        )
+
+        for (match, match_start, match_end, key), pre_handled_match in zip(
+            candidates, results
+        ):
+            entire_match: str = match.group(0)
+
+            # Validate the current match
+            if pre_handled_match:
+                # Skip matches for which the pre_handler returns None
+                # Skip matches for keys that has already been processed by a previous scheme
+                # Replace the item of a key listed by this scheme with a more recent occurrence
+                # Take over a key owned by a later scheme, as found in another
+                # part of the capture
+                index = listed.get(key)
+                owner = owners.get(key)
+                if (
+                    owner is None
+                    or owner > precedence
+                    or (index is not None and match_start > items[index][2])
+                ):
+                    if pre_handled_match["tag"] not in scheme["tags"]:
+                        logger.warning(
+                            f"the tag returned dynamically '{pre_handled_match['tag']}' is not included in: {scheme['tags']}"
+                        )
+                        continue
+
+                    # We keep a copy of the original matched text for later
+                    item: Item = (
+                        pre_handled_match,
+                        entire_match,
+                        match_start,
+                        match,
+                    )
+                    if index is not None:
+                        items[index] = item
+                    else:
+                        owners[key] = precedence
+                        listed[key] = len(items)
+                        items.append(item)
+                claims.append((match_start, match_end))
+                claims += equivalents.get(key, ())
+        # Schemes with `claims` set to false claim nothing
+        if scheme.get("claims", True):
+            claimed.claim(claims)
+
+    return items
+
+
+def collect_newest(
+    schemes: list[SchemeEntry],
+    content: str,
+    content_escaped: str,
+    limit: int,
+    memo: HandlerMemo | None = None,
+    deadline: Deadline | None = None,
+) -> list[Item]:
+    """Collect items scanning the capture from the bottom up, stopping once at
+    least `limit` distinct items are found.
+
+    The capture is scanned in chunks of whole lines, each one twice as large as
+    the previous one, so the older history is only matched when the newer one
+    does not hold enough items. The positions of the items refer to the whole
+    capture, as with `collect_items`. A text repeated in several chunks is
+    listed at its occurrence in the newest one, and a match cannot span two
+    chunks. When a scheme accepts, in an older chunk, a text listed by a
+    lower-precedence scheme in a newer one, the lines scanned so far are
+    scanned again as one chunk, so that each text has the owner and the
+    claims it would have in a scan of the whole capture.
+    """
+    plain_lines = content.split("\n")
+    escaped_lines = content_escaped.split("\n")
+    if len(plain_lines) != len(escaped_lines):
+        # The lines of the two captures cannot be paired. Scan everything.
+        return collect_items(
+            schemes,
+            content,
+            content_escaped,
+            offset_translator(content_escaped),
+            memo,
+            deadline=deadline,
+        )
+    if memo is None:
+        memo = HandlerMemo()
+
+    # Plain-text offset of each line
+    line_offsets = [0]
+    for line in plain_lines:
+        line_offsets.append(line_offsets[-1] + len(line) + 1)
+
+    # Index in `schemes` of the scheme owning each key
+    owners: dict[str, int] = {}
+    # Each scheme has one budget for all the chunks
+    budgets: dict[int, Budget] = {}
+
+    def scan(start: int, end: int) -> list[Item]:
+        escaped = "\n".join(escaped_lines[start:end])
+        found = collect_items(
+            schemes,
+            "\n".join(plain_lines[start:end]),
+            escaped,
+            offset_translator(escaped),
+            memo,
+            owners,
+            deadline,
+            budgets,
+            start,
+        )
+        base = line_offsets[start]
+        return [(pre, text, base + pos, match) for pre, text, pos, match in found]
+
+    items: list[Item] = []
+    end = len(plain_lines)
+    size = FIRST_CHUNK_LINES
+    while end > 0 and len(items) < limit:
+        if deadline is not None and deadline.check():
+            break
+        start = max(end - size, 0)
+        previous = dict(owners)
+        found = scan(start, end)
+        if any(owners[key] < owner for key, owner in previous.items()):
+            # The items and claims of the newer chunks no longer hold
+            owners.clear()
+            items = scan(start, len(plain_lines))
+        else:
+            items += found
+        end = start
+        size *= 2
+    if end > 0:
+        logger.debug(f"newest-first scan stopped with {end} lines left unscanned")
+    return items
+
+
+__all__ = [
+    "Deadline",
+    "Item",
+    "collect_items",
+    "collect_newest",
+    "pre_handle_all",
+    "scheme_budget",
+    "scheme_matches",
+]
@@ -0,0 +1,132 @@
+# ===============================================================================
+#   Author: (c) 2024 Andrea Alberti
+# ===============================================================================
+
+"""Per-run memo table for the handlers of pure schemes.
+
+A scheme declaring ``"pure": True`` promises that its handlers depend only on
+the matched text (and on state that does not change during one run, such as the
+pane directory). The same URL or path printed thousands of times in a log is
+then handled once, and every further occurrence is a table lookup.
+"""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Sequence
+
+from .async_handlers import resolve
+from .opener import PostHandledMatch, PreHandledMatch, PreHandlerBatch, SchemeEntry
+
+# Results are keyed by scheme, pattern and matched text. The pattern is part of
+# the key because the groups a handler reads depend on the regex that matched.
+_Key = tuple[int, re.Pattern[str], str]
+
+
+class HandlerMemo:
+    """Cache of pre- and post-handler results, with hit and miss counters."""
+
+    def __init__(self) -> None:
+        self._pre: dict[_Key, PreHandledMatch | None] = {}
+        self._post: dict[_Key, PostHandledMatch] = {}
+        self.pre_hits: int = 0
+        self.pre_misses: int = 0
+        self.post_hits: int = 0
+        self.post_misses: int = 0
+
+    @staticmethod
+    def _key(scheme: SchemeEntry, match: re.Match[str]) -> _Key:
+        return (id(scheme), match.re, match.group(0))
+
+    def has_pre(self, scheme: SchemeEntry, match: re.Match[str]) -> bool:
+        """Whether the pre-handler result for this match is already known."""
+        return self._key(scheme, match) in self._pre
+
+    def pre_handle(
+        self, scheme: SchemeEntry, match: re.Match[str]
+    ) -> PreHandledMatch | None:
+        """Call the scheme's pre-handler, reusing the result for a known text."""
+        pre_handler = scheme["pre_handler"]
+        if pre_handler is None:
+            # fallback case when no pre_handler is provided for the scheme
+            return {"display_text": match.group(0), "tag": scheme["tags"][0]}
+        if not scheme.get("pure", False):
+            return resolve(pre_handler(match))
+        key = self._key(scheme, match)
+        if key in self._pre:
+            self.pre_hits += 1
+            return self._pre[key]
+        self.pre_misses += 1
+        result = self._pre[key] = resolve(pre_handler(match))
+        return result
+
+    def pre_handle_batch(
+        self,
+        scheme: SchemeEntry,
+        matches: list[re.Match[str]],
+        pre_handler_batch: PreHandlerBatch | None = None,
+    ) -> list[PreHandledMatch | None]:
+        """Call the scheme's batch pre-handler once for all `matches`.
+
+        For a pure scheme, only the first occurrence of each text not handled
+        yet is passed to the handler, and the results are shared. A different
+        batch function, such as one awaiting a coroutine pre-handler
+        concurrently, can be given as `pre_handler_batch`. Without either, the
+        matches are handled one by one.
+        """
+        if pre_handler_batch is None:
+            pre_handler_batch = scheme.get("pre_handler_batch")
+        if pre_handler_batch is None:
+            return [self.pre_handle(scheme, match) for match in matches]
+        if not scheme.get("pure", False):
+            return _checked(scheme, matches, pre_handler_batch(matches))
+        keys = [self._key(scheme, match) for match in matches]
+        pending: dict[_Key, re.Match[str]] = {}
+        for key, match in zip(keys, matches):
+            if key not in self._pre and key not in pending:
+                pending[key] = match
+        if pending:
+            batch = list(pending.values())
+            results = _checked(scheme, batch, pre_handler_batch(batch))
+            self._pre.update(zip(pending.keys(), results))
+        self.pre_misses += len(pending)
+        self.pre_hits += len(matches) - len(pending)
+        return [self._pre[key] for key in keys]
+
+    def post_handle(
+        self, scheme: SchemeEntry, match: re.Match[str]
+    ) -> PostHandledMatch:
+        """Call the scheme's post-handler, reusing the result for a known text."""
+        post_handler = scheme["post_handler"]
+        if post_handler is None:
+            return None
+        if not scheme.get("pure", False):
+            return resolve(post_handler(match))
+        key = self._key(scheme, match)
+        if key in self._post:
+            self.post_hits += 1
+            return self._post[key]
+        self.post_misses += 1
+        result = self._post[key] = resolve(post_handler(match))
+        return result
+
+    def stats(self) -> str:
+        return (
+            f"pre_handler {self.pre_hits} hits / {self.pre_misses} misses, "
+            f"post_handler {self.post_hits} hits / {self.post_misses} misses"
+        )
+
+
+def _checked(
+    scheme: SchemeEntry,
+    matches: list[re.Match[str]],
+    results: Sequence[PreHandledMatch | None],
+) -> list[PreHandledMatch | None]:
+    if len(results) != len(matches):
+        raise ValueError(
+            f"pre_handler_batch of scheme with tags {scheme['tags']} returned {len(results)} results for {len(matches)} matches"
+        )
+    return list(results)
+
+
+__all__ = ["HandlerMemo"]
@@ -0,0 +1,162 @@
+# ===============================================================================
+#   Author: (c) 2024 Andrea Alberti
+# ===============================================================================
+
+"""On-disk cache of path candidates that name no file.
+
+Pressing the key binding twice in the same pane directory probes the same
+thousands of words ("the", "error", "done") again. With
+`@fzf-links-negative-cache-ttl`, the candidates found missing are kept in a
+small file per pane directory, grouped by parent directory. An entry is only
+trusted while its parent directory has the modification time recorded with it,
+which changes as soon as a file is created or renamed there, and for at most
+the TTL.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import time
+from pathlib import Path
+from typing import TypedDict, cast
+
+from .cache import cache_dir, read_json, write_json_atomically
+
+# Missing names kept per parent directory, the most recently found ones
+MAX_NAMES_PER_DIRECTORY = 4096
+# Parent directories kept per pane directory
+MAX_DIRECTORIES = 256
+
+# A directory modified this recently, in seconds, is not recorded. Its
+# modification time might not change when a file is created in the same clock
+# tick, on filesystems with a coarse timestamp resolution.
+RACY_SECONDS = 2
+
+_VERSION = 1
+
+
+class _Entry(TypedDict):
+    # Modification time of the parent directory when the names were found missing
+    mtime_ns: int
+    # Time, in seconds since the epoch, the entry was created
+    time: float
+    # From the least to the most recently found
+    names: list[str]
+
+
+class NegativeCache:
+    """Missing names by parent directory, for one pane directory."""
+
+    def __init__(self, path: Path, ttl: int) -> None:
+        self.path = path
+        self.ttl = ttl
+        self._entries: dict[str, _Entry] = {}
+        # Names of the valid entries, as sets
+        self._names: dict[str, set[str]] = {}
+        # Names found missing during this run, with their parent's mtime. The
+        # names are dict keys, in the order they were last found.
+        self._found: dict[str, tuple[int, dict[str, None]]] = {}
+        # Names of the entries within the TTL, built on the first request
+        self._valid: dict[str, tuple[int, frozenset[str]]] | None = None
+
+    @classmethod
+    def load(cls, pane_dir: str, ttl: int) -> NegativeCache | None:
+        """Load the cache of `pane_dir`, or return None when there is no cache
+        directory."""
+        directory = cache_dir("missing")
+        if directory is None:
+            return None
+        digest = hashlib.sha256(pane_dir.encode("utf-8", "surrogateescape"))
+        cache = cls(directory / f"{digest.hexdigest()[:32]}.json", ttl)
+        data = read_json(cache.path, _VERSION)
+        if data is not None and isinstance(data.get("directories"), dict):
+            cache._entries = cast(dict[str, _Entry], data["directories"])
+        return cache
+
+    def _valid_names(self, parent: str, mtime_ns: int) -> set[str]:
+        names = self._names.get(parent)
+        if names is None:
+            entry = self._entries.get(parent)
+            if (
+                entry is not None
+                and entry["mtime_ns"] == mtime_ns
+                and time.time() - entry["time"] < self.ttl
+            ):
+                names = set(entry["names"])
+            else:
+                names = set()
+            self._names[parent] = names
+        return names
+
+    def is_missing(self, parent: str, mtime_ns: int, name: str) -> bool:
+        """Whether `name` was missing from `parent`, which has not changed
+        since."""
+        return name in self._valid_names(parent, mtime_ns)
+
+    def valid_entries(self) -> dict[str, tuple[int, frozenset[str]]]:
+        """Return the names of the entries within the TTL, by parent, with the
+        modification time of the parent they hold for.
+
+        The result is built once and never changed afterwards, so threads may
+        read it while this cache records new names.
+        """
+        if self._valid is None:
+            now = time.time()
+            self._valid = {
+                parent: (entry["mtime_ns"], frozenset(entry["names"]))
+                for parent, entry in self._entries.items()
+                if now - entry["time"] < self.ttl
+            }
+        return self._valid
+
+    def record(self, parent: str, mtime_ns: int, name: str) -> None:
+        """Remember that `name` is missing from `parent`, as of `mtime_ns`."""
+        found = self._found.get(parent)
+        if found is None or found[0] != mtime_ns:
+            found = self._found[parent] = (mtime_ns, {})
+        # Moved to the end, as the most recently found name
+        found[1].pop(name, None)
+        found[1][name] = None
+
+    def save(self) -> None:
+        """Write the names found missing in this run, merged with the entries
+        that are still valid."""
+        if not self._found:
+            return
+        now = time.time()
+        for parent, (mtime_ns, found) in self._found.items():
+            if now - mtime_ns / 1e9 < RACY_SECONDS:
+                continue
+            names = list(found)
+            entry = self._entries.get(parent)
+            if self._valid_names(parent, mtime_ns) and entry is not None:
+                # Keep the creation time, so the entry still expires
+                names = [name for name in entry["names"] if name not in found] + names
+                created = entry["time"]
+            else:
+                created = now
+            self._entries[parent] = {
+                "mtime_ns": mtime_ns,
+                "time": created,
+                "names": names[-MAX_NAMES_PER_DIRECTORY:],
+            }
+        # Drop the expired entries, then the oldest ones
+        entries = sorted(
+            (
+                (parent, entry)
+                for parent, entry in self._entries.items()
+                if now - entry["time"] < self.ttl
+            ),
+            key=lambda item: item[1]["time"],
+        )[-MAX_DIRECTORIES:]
+        data = {"version": _VERSION, "directories": dict(entries)}
+        write_json_atomically(self.path, data)
+        self._found = {}
+
+
+__all__ = [
+    "MAX_DIRECTORIES",
+    "MAX_NAMES_PER_DIRECTORY",
+    "RACY_SECONDS",
+    "NegativeCache",
+]
@@ -7,6 +7,7 @@ import re
 import shutil
 import subprocess
 import sys
+from collections.abc import Awaitable, Iterable, Sequence
 from enum import Enum
 from typing import Callable, TypedDict, TypeGuard
 
@@ -17,6 +18,7 @@ elif sys.version_info < (3, 11):  # For Python 3.10
 import logging
 import shlex
 
+from .binary_files import binary_files
 from .errors_types import (
     BinaryFileSelected,
     CommandFailed,
@@ -52,6 +54,7 @@ if sys.version_info >= (3, 11):
     class PostHandledMatchFileType(TypedDict):
         file: str
         line: NotRequired[str]
+        col: NotRequired[str]
 
     class PostHandledMatchCustomType(TypedDict):
         cmd: str  # command to be executed
@@ -107,20 +110,27 @@ def isValidPostHandledMatchCustomType(
         return False
 
 
-def isBinaryFile(filePath: str) -> bool:
-    # Check whether it is a binary file. Open the file in binary mode and read a portion of it:
-    with open(filePath, "rb") as file:
-        chunk = file.read(4096)  # Read the first 1024 bytes
-        if b"\0" in chunk:  # Check for null bytes
-            is_binary = True
-        else:
-            is_binary = False
-    return is_binary
-
-
-# Pre and post handler types
-PreHandler = Callable[[re.Match[str]], PreHandledMatch | None] | None
-PostHandler = Callable[[re.Match[str]], PostHandledMatch] | None
+# Pre and post handler types. Either may be a coroutine function, which the
+# engine awaits (see async_handlers).
+PreHandler = (
+    Callable[
+        [re.Match[str]],
+        PreHandledMatch | None | Awaitable[PreHandledMatch | None],
+    ]
+    | None
+)
+PostHandler = (
+    Callable[[re.Match[str]], PostHandledMatch | Awaitable[PostHandledMatch]]
+    | None
+)
+# Batch pre-handler: one result per match, in the same order
+PreHandlerBatch = Callable[
+    [list[re.Match[str]]], Sequence[PreHandledMatch | None]
+]
+# Custom match finder, used instead of iterating over the scheme's regexes
+Finder = Callable[[str], Iterable[re.Match[str]]]
+# Key identifying the target of a match, e.g. an absolute path or a normalized URL
+Canonicalizer = Callable[[re.Match[str]], str]
 
 
 # Define the structure of each scheme entry
@@ -137,6 +147,40 @@ class SchemeEntry(SchemeEntryRequired, total=False):
     # (`capture-pane -e`) rather than the plain text, so it can see OSC 8
     # hyperlinks and SGR codes. Optional. Defaults to false.
     escaped: bool
+    # When set, the engine calls it with the capture and processes the matches
+    # it yields, in order, instead of running `regex`. Optional.
+    finditer: Finder
+    # When true, the handlers depend only on the matched text, so the engine
+    # may skip calls for texts already listed and reuse results across
+    # repeated occurrences. Optional. Defaults to false.
+    pure: bool
+    # When set, the engine collects all the matches of the scheme and resolves
+    # them in a few batches of growing size, e.g. to share one directory
+    # listing or one subprocess across candidates. `pre_handler` is used when
+    # it is unset.
+    # Optional.
+    pre_handler_batch: PreHandlerBatch
+    # When true, the pre-handlers are given up once `@fzf-links-handler-budget`
+    # is spent. Set on every user and plugin scheme. Optional. Defaults to
+    # false.
+    budgeted: bool
+    # When true, the pre-handlers run in a worker process that is killed once
+    # the scheme's time budget is spent. Set on every user scheme when the
+    # `@fzf-links-handler-isolation` option is on. Optional. Defaults to false.
+    isolated: bool
+    # Maximum number of characters of a line the regexes scan in guarded mode
+    # (`@fzf-links-regex-guard`), overriding `@fzf-links-regex-max-line-length`.
+    # Optional.
+    max_line_length: int
+    # When set, matches are deduplicated by the key it returns instead of by
+    # their text, so different spellings of one target are listed once, at
+    # their most recent occurrence. It must not touch the filesystem, as it is
+    # called for every hit. Optional.
+    canonical: Canonicalizer
+    # When false, the accepted matches claim no region, and the schemes that
+    # follow still see their text, e.g. for a generic scheme that must not hide
+    # more specific ones. Optional. Defaults to true.
+    claims: bool
 
 
 xdg_open_util: str | None = None
@@ -211,6 +255,21 @@ def cmd_from_template(
     return shlex.split(cmd_str)
 
 
+def browser_cmd(
+    post_handled_match: PostHandledMatchUrlType, browser_open_cmd: str
+) -> list[str]:
+    """Return the command opening `post_handled_match["url"]` in the browser:
+    `browser_open_cmd`, or else `$BROWSER`."""
+    if browser_open_cmd:
+        template = browser_open_cmd
+    else:
+        default_browser = os.environ.get("BROWSER", None)
+        if not default_browser:
+            raise NoBrowserConfigured("no browser command is configured")
+        template = f"{default_browser} '%url'"
+    return cmd_from_template(template, post_handled_match)
+
+
 def spawn_daemon(cmd_plus_args: list[str]):
     """
     - On Unix, uses double-fork daemonization; see double-fork magic, see Stevens' "Advanced Programming in the UNIX Environment" for details (ISBN 0201563177)
@@ -295,7 +354,7 @@ def open_link(
         match opener:
             case OpenerType.EDITOR:
                 if isValidPostHandledMatchFileType(post_handled_match):
-                    if isBinaryFile(post_handled_match["file"]):
+                    if binary_files.is_binary(post_handled_match["file"]):
                         raise BinaryFileSelected(
                             f"binary files cannot be opened with the editor: {post_handled_match['file']}"
                         )
@@ -308,23 +367,17 @@ def open_link(
                         if not default_editor:
                             raise NoEditorConfigured("no editor command is configured")
                         template = f"{default_editor} '%file'"
-                    cmd_plus_args = cmd_from_template(template, post_handled_match)
+                    # Open at the start of the file, or of the line, by default
+                    cmd_plus_args = cmd_from_template(
+                        template, {"line": "1", "col": "1", **post_handled_match}
+                    )
                 else:
                     raise RuntimeError(
                         "'post_handled_match' is not compatible with type: PostHandledMatchFileType"
                     )
             case OpenerType.BROWSER:
                 if isValidPostHandledMatchUrlType(post_handled_match):
-                    if browser_open_cmd:
-                        template = browser_open_cmd
-                    else:
-                        default_browser = os.environ.get("BROWSER", None)
-                        if not default_browser:
-                            raise NoBrowserConfigured(
-                                "no browser command is configured"
-                            )
-                        template = f"{default_browser} '%url'"
-                    cmd_plus_args = cmd_from_template(template, post_handled_match)
+                    cmd_plus_args = browser_cmd(post_handled_match, browser_open_cmd)
                 else:
                     raise RuntimeError(
                         "'post_handled_match' is not compatible with type: PostHandledMatchFileType"
@@ -0,0 +1,212 @@
+# ===============================================================================
+#   Author: (c) 2024 Andrea Alberti
+# ===============================================================================
+
+"""Concurrent path lookups for slow or network filesystems.
+
+On NFS, sshfs and other FUSE mounts, a single `lstat` can take milliseconds,
+or hang for as long as the server is unreachable. Looking up the path
+candidates one after the other then stalls the key binding. When a candidate
+lies on such a mount (or with `@fzf-links-path-lookup parallel`), the lookups
+are dispatched to a bounded pool of threads instead, and a lookup taking longer
+than `@fzf-links-path-timeout` is given up: its candidate is "unknown".
+
+A thread blocked in a system call cannot be interrupted. It is abandoned, and
+the threads are daemons, so they do not delay the exit of the process.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable
+from functools import lru_cache
+from typing import TypeVar
+
+T = TypeVar("T")
+
+# Filesystem types whose lookups may be slow or hang. FUSE covers sshfs, rclone,
+# s3fs and the like; `fuseblk` is a local disk (e.g., NTFS) served by FUSE.
+NETWORK_FS_TYPES = frozenset(
+    {
+        "nfs",
+        "nfs4",
+        "cifs",
+        "smb3",
+        "smbfs",
+        "9p",
+        "afs",
+        "ceph",
+        "glusterfs",
+        "lustre",
+        "davfs",
+        "fuse",
+        "sshfs",
+    }
+)
+
+# Threads looking up paths at the same time
+PATH_LOOKUP_WORKERS = 16
+
+# Mount table of Linux
+_MOUNTS_FILE = "/proc/self/mounts"
+
+
+def _unescape(field: str) -> str:
+    # Spaces and tabs are escaped as octal sequences in the mount table
+    return (
+        field.replace("\\040", " ")
+        .replace("\\011", "\t")
+        .replace("\\012", "\n")
+        .replace("\\134", "\\")
+    )
+
+
+def _is_network_type(fs_type: str) -> bool:
+    return fs_type in NETWORK_FS_TYPES or fs_type.startswith("fuse.")
+
+
+@lru_cache(maxsize=1)
+def mount_points() -> tuple[tuple[str, bool], ...]:
+    """Return the mount points, each with whether it is a network filesystem,
+    longest first.
+
+    The table is read once per process. It is empty where there is no
+    `/proc/self/mounts`, e.g. on macOS.
+    """
+    try:
+        with open(_MOUNTS_FILE, "r") as file:
+            lines = file.read().splitlines()
+    except OSError:
+        return ()
+    mounts: dict[str, bool] = {}
+    for line in lines:
+        fields = line.split()
+        if len(fields) >= 3:
+            mounts[_unescape(fields[1])] = _is_network_type(fields[2])
+    return tuple(sorted(mounts.items(), key=lambda mount: len(mount[0]), reverse=True))
+
+
+def _on_network_mount(path: str, mounts: tuple[tuple[str, bool], ...]) -> bool:
+    for mount_point, network in mounts:
+        if path == mount_point or path.startswith(mount_point.rstrip("/") + "/"):
+            return network
+    return False
+
+
+def on_network_mount(paths: Iterable[str]) -> bool:
+    """Whether any of the absolute `paths` lies on a network filesystem.
+
+    Paths are mostly relative to a handful of directories, so the mount table
+    is scanned once per distinct parent directory rather than once per path.
+    """
+    mounts = mount_points()
+    if not any(network for _, network in mounts):
+        return False
+    # A path naming a mount point lies on that mount, not on its parent's
+    points = dict(mounts)
+    # Verdicts by parent directory
+    directories: dict[str, bool] = {}
+    for path in paths:
+        network = points.get(path)
+        if network is None:
+            directory = os.path.dirname(path)
+            network = directories.get(directory)
+            if network is None:
+                network = directories[directory] = _on_network_mount(
+                    directory, mounts
+                )
+        if network:
+            return True
+    return False
+
+
+def lookup_concurrently(
+    keys: list[str],
+    lookup: Callable[[str], T],
+    timeout: float,
+    workers: int = PATH_LOOKUP_WORKERS,
+) -> tuple[dict[str, T], set[str]]:
+    """Call `lookup` on every key in a pool of at most `workers` threads.
+
+    Returns the results by key, and the keys whose lookup did not complete
+    within `timeout` seconds of starting. Once every thread of the pool is
+    stuck, the keys left are not started at all, and are unknown too. An
+    exception raised by a lookup propagates.
+    """
+    results: dict[str, T] = {}
+    unknown: set[str] = set()
+    if not keys:
+        return results, unknown
+
+    condition = threading.Condition()
+    queue = list(reversed(keys))
+    # Start time of the lookups in progress
+    running: dict[str, float] = {}
+    errors: list[BaseException] = []
+
+    def work() -> None:
+        while True:
+            with condition:
+                if not queue or errors:
+                    return
+                key = queue.pop()
+                running[key] = time.monotonic()
+            try:
+                result = lookup(key)
+            except BaseException as e:
+                with condition:
+                    errors.append(e)
+                    condition.notify()
+                return
+            with condition:
+                if running.pop(key, None) is not None:
+                    results[key] = result
+                    condition.notify()
+                else:
+                    # Given up while this thread was blocked. Its place in
+                    # the pool was handed over, so it leaves.
+                    return
+
+    def start_worker() -> None:
+        threading.Thread(target=work, daemon=True).start()
+
+    for _ in range(min(workers, len(keys))):
+        start_worker()
+
+    stuck = 0
+    with condition:
+        while (queue or running) and not errors:
+            now = time.monotonic()
+            overdue = [key for key, start in running.items() if now - start >= timeout]
+            for key in overdue:
+                del running[key]
+                unknown.add(key)
+            stuck += len(overdue)
+            if stuck >= workers:
+                # The filesystem does not answer. Give up on the keys not
+                # started yet.
+                unknown.update(queue)
+                queue.clear()
+            else:
+                # Hand the places of the stuck threads over to new ones
+                for _ in range(min(len(overdue), len(queue))):
+                    start_worker()
+            if running:
+                wait = timeout - (now - min(running.values()))
+                _ = condition.wait(max(wait, 0.001))
+            elif queue:
+                _ = condition.wait(timeout)
+    if errors:
+        raise errors[0]
+    return results, unknown
+
+
+__all__ = [
+    "NETWORK_FS_TYPES",
+    "PATH_LOOKUP_WORKERS",
+    "lookup_concurrently",
+    "mount_points",
+    "on_network_mount",
+]
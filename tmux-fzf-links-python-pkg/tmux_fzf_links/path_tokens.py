@@ -0,0 +1,151 @@
+# ===============================================================================
+#   Author: (c) 2024 Andrea Alberti
+# ===============================================================================
+
+"""Path candidate tokenizer for the built-in file scheme.
+
+The file scheme used to run three regexes over the whole capture:
+
+- a line-start candidate, which may contain spaces (``^[^<>:"\\|?*]+``);
+- a quoted candidate, which may contain spaces (``'[^:'"\\|?*]+'``);
+- a bare candidate, which stops at spaces (``[^ :'"\\|?*]+``).
+
+Each took an optional ``:line`` suffix and a ``{1,4096}`` quantifier. This
+module emits the same candidates, in the same order, from one structural pass
+that only visits quotes and stop characters plus one scan of the bare runs. No
+quantifier is bounded by the path length, so the cost is linear in the capture.
+Candidates that can never name a file are dropped before the pre-handler stats
+them.
+"""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Iterator
+
+# Upper bound on the length of a candidate, in characters. Longer runs were split
+# into chunks of this size by the legacy regexes, which is reproduced here.
+MAX_PATH_LENGTH = 4096
+
+# Characters that end a line-start or a quoted candidate. Everything between two
+# of them is either part of the pending candidate or a bare run, so the
+# structural scan below only visits these, not every word of the capture.
+_STRUCTURE = re.compile(r"(?P<quote>')|[:\"\\|?*\x00-\x1F]")
+# Characters allowed in bare and quoted candidates but not at the line start.
+_ANGLE = re.compile(r"[<>]")
+_LINE_SUFFIX = re.compile(r":\d+")
+
+# Bare candidates. The run is unbounded: a run longer than MAX_PATH_LENGTH is
+# chunked afterwards, so the scan cost does not depend on the bound.
+_BARE_CANDIDATE = re.compile(r"(?P<link>[^ :'\"\\|?*\x00-\x1F]+)(\:(?P<line>\d+))?")
+# Patterns used to materialize a candidate span as a match object. They keep the
+# group layout of the legacy regexes, so handlers read `link` and `line` as before.
+_CANDIDATE = re.compile(r"(?P<link>[^:]+)(\:(?P<line>\d+))?")
+_QUOTED_CANDIDATE = re.compile(r"'(?P<link>[^']+)'(\:(?P<line>\d+))?")
+
+
+def is_path_like(link: str, max_bytes: int) -> bool:
+    """Lexical checks a candidate must pass before it is worth a stat call."""
+    if len(link) > max_bytes:
+        return False
+    if not link.isascii() and len(link.encode("utf-8")) > max_bytes:
+        return False
+    # Only `.` characters, such as the current and the parent folder
+    if not link.strip("."):
+        return False
+    # The bare home directory
+    if link == "~":
+        return False
+    return True
+
+
+def _suffix_end(text: str, pos: int) -> int:
+    """End of an optional `:line` suffix starting at `pos`."""
+    m = _LINE_SUFFIX.match(text, pos)
+    return m.end() if m else pos
+
+
+def _chunks(text: str, match: re.Match[str]) -> Iterator[re.Match[str]]:
+    """Split a bare run longer than MAX_PATH_LENGTH the way the legacy regex did.
+
+    Only the last chunk can carry the `:line` suffix.
+    """
+    start, end = match.span("link")
+    while end - start > MAX_PATH_LENGTH:
+        chunk = _CANDIDATE.fullmatch(text, start, start + MAX_PATH_LENGTH)
+        if chunk:
+            yield chunk
+        start += MAX_PATH_LENGTH
+    chunk = _CANDIDATE.fullmatch(text, start, match.end())
+    if chunk:
+        yield chunk
+
+
+def path_candidates(text: str, max_bytes: int) -> Iterator[re.Match[str]]:
+    """Yield the file scheme's path candidates in `text`.
+
+    Line-start candidates come first, then quoted ones, then bare ones, each in
+    order of appearance. This is the order in which the three legacy regexes
+    reported them, which the first-match-wins deduplication in `run` relies on.
+    """
+    line_spans: list[tuple[int, int]] = []
+    quoted_spans: list[tuple[int, int]] = []
+
+    # Start of the pending line-start candidate, or -1 once the line is closed
+    line_open = 0
+    # Position of the pending opening quote, or -1 when there is none
+    quote_open = -1
+
+    def close_line(end: int) -> None:
+        nonlocal line_open
+        start = line_open
+        line_open = -1
+        with_suffix = True
+        angle = _ANGLE.search(text, start, end)
+        if angle:
+            end = angle.start()
+            with_suffix = False
+        if end - start > MAX_PATH_LENGTH:
+            end = start + MAX_PATH_LENGTH
+            with_suffix = False
+        if end > start:
+            line_spans.append((start, _suffix_end(text, end) if with_suffix else end))
+
+    for token in _STRUCTURE.finditer(text):
+        pos = token.start()
+        if token.lastgroup == "quote":
+            if quote_open >= 0:
+                if 0 < pos - quote_open - 1 <= MAX_PATH_LENGTH:
+                    quoted_spans.append((quote_open, _suffix_end(text, pos + 1)))
+                    quote_open = -1
+                    continue
+            # A failed candidate lets the closing quote open the next one
+            quote_open = pos
+        else:
+            if line_open >= 0:
+                close_line(pos)
+            quote_open = -1
+            if text[pos] == "\n":
+                line_open = pos + 1
+    if line_open >= 0:
+        close_line(len(text))
+
+    for start, end in line_spans:
+        match = _CANDIDATE.fullmatch(text, start, end)
+        if match and is_path_like(match.group("link"), max_bytes):
+            yield match
+    for start, end in quoted_spans:
+        match = _QUOTED_CANDIDATE.fullmatch(text, start, end)
+        if match and is_path_like(match.group("link"), max_bytes):
+            yield match
+    for match in _BARE_CANDIDATE.finditer(text):
+        link = match.group("link")
+        if len(link) > MAX_PATH_LENGTH:
+            for chunk in _chunks(text, match):
+                if is_path_like(chunk.group("link"), max_bytes):
+                    yield chunk
+        elif is_path_like(link, max_bytes):
+            yield match
+
+
+__all__ = ["MAX_PATH_LENGTH", "is_path_like", "path_candidates"]
@@ -0,0 +1,152 @@
+# ===============================================================================
+#   Author: (c) 2024 Andrea Alberti
+# ===============================================================================
+
+"""Scheme plugins installed as Python packages.
+
+A package registers a plugin through an entry point in the
+``tmux_fzf_links.schemes`` group. The entry point refers to a small manifest,
+which declares the tags of the plugin's schemes, the literal strings that
+trigger it, and where the schemes live:
+
+.. code-block:: toml
+
+    [project.entry-points."tmux_fzf_links.schemes"]
+    jira = "fzf_links_jira.manifest:plugin"
+
+.. code-block:: python
+
+    # fzf_links_jira/manifest.py
+    plugin = {
+        "tags": ["jira"],
+        "triggers": ["JIRA-", "jira.example.com"],
+        "schemes": "fzf_links_jira.schemes:user_schemes",
+    }
+
+The module holding the schemes, with its regexes and dependencies, is only
+imported when one of the triggers appears in the capture. A plugin without
+triggers is always loaded. Keep the manifest module (and the `__init__` of its
+package) free of heavy imports, since it is imported on every key press.
+"""
+
+from __future__ import annotations
+
+import importlib
+import logging
+from collections.abc import Iterable
+from typing import TypedDict, cast
+
+from .opener import SchemeEntry
+
+logger = logging.getLogger()  # root logger when no argument is provided
+
+ENTRY_POINT_GROUP = "tmux_fzf_links.schemes"
+
+
+class PluginManifest(TypedDict):
+    # Tags of the schemes the plugin provides
+    tags: list[str]
+    # Literal strings, at least one of which must occur in the capture for the
+    # plugin to be loaded. Loaded unconditionally when empty.
+    triggers: list[str]
+    # Location of the list of schemes, as "module:attribute"
+    schemes: str
+
+
+def _validate_manifest(manifest: object) -> PluginManifest:
+    if not isinstance(manifest, dict):
+        raise TypeError(f"manifest must be a dict, got {type(manifest)}")
+    manifest = cast(dict[str, object], manifest)
+    for key in ("tags", "triggers"):
+        value = manifest.get(key, [])
+        if not isinstance(value, (list, tuple)) or not all(
+            isinstance(item, str) for item in cast(Iterable[object], value)
+        ):
+            raise TypeError(f"'{key}' must be a list of strings")
+    if not isinstance(manifest.get("schemes"), str):
+        raise TypeError("'schemes' must be a string 'module:attribute'")
+    return {
+        "tags": list(cast(list[str], manifest.get("tags", []))),
+        "triggers": list(cast(list[str], manifest.get("triggers", []))),
+        "schemes": cast(str, manifest["schemes"]),
+    }
+
+
+def discover_plugins() -> list[tuple[str, PluginManifest]]:
+    """Return the name and manifest of every installed plugin.
+
+    A plugin whose manifest cannot be loaded is reported and left out.
+    """
+    # Importing importlib.metadata alone takes tens of milliseconds, so it is
+    # only paid for when plugins are enabled
+    from importlib.metadata import entry_points
+
+    plugins: list[tuple[str, PluginManifest]] = []
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        try:
+            manifest = _validate_manifest(entry_point.load())
+        except Exception as e:
+            logger.error(
+                f"failed to load manifest of scheme plugin '{entry_point.name}': {e}"
+            )
+            continue
+        plugins.append((entry_point.name, manifest))
+    return plugins
+
+
+def is_triggered(manifest: PluginManifest, sources: Iterable[str]) -> bool:
+    """Whether a trigger of the plugin occurs in any of `sources`."""
+    triggers = manifest["triggers"]
+    if not triggers:
+        return True
+    return any(trigger in source for source in sources for trigger in triggers)
+
+
+def load_plugin_schemes(
+    plugins: list[tuple[str, PluginManifest]],
+    sources: list[str],
+    allowed_tags: set[str] | None = None,
+) -> list[SchemeEntry]:
+    """Import the schemes of the plugins triggered by `sources`.
+
+    When `allowed_tags` is given, plugins declaring none of those tags are not
+    imported either. A plugin failing to load is reported and skipped.
+    """
+    schemes: list[SchemeEntry] = []
+    for name, manifest in plugins:
+        if allowed_tags and not allowed_tags.intersection(manifest["tags"]):
+            continue
+        if not is_triggered(manifest, sources):
+            logger.debug(f"scheme plugin '{name}' not triggered")
+            continue
+        module_name, _, attribute = manifest["schemes"].partition(":")
+        try:
+            module = importlib.import_module(module_name)
+            plugin_schemes = cast(
+                list[SchemeEntry] | None,
+                getattr(module, attribute or "user_schemes", None),
+            )
+            if not isinstance(plugin_schemes, list):
+                raise TypeError(
+                    f"'{manifest['schemes']}' must be a list, got {type(plugin_schemes)}"
+                )
+        except Exception as e:
+            logger.error(f"failed to load scheme plugin '{name}': {e}")
+            continue
+        for scheme in plugin_schemes:
+            undeclared = set(scheme["tags"]) - set(manifest["tags"])
+            if undeclared:
+                logger.warning(
+                    f"scheme plugin '{name}' does not declare the tags {sorted(undeclared)} in its manifest"
+                )
+        schemes += plugin_schemes
+    return schemes
+
+
+__all__ = [
+    "ENTRY_POINT_GROUP",
+    "PluginManifest",
+    "discover_plugins",
+    "is_triggered",
+    "load_plugin_schemes",
+]
@@ -0,0 +1,233 @@
+# ===============================================================================
+#   Author: (c) 2024 Andrea Alberti
+# ===============================================================================
+
+"""Index of the files of the git repository around the pane directory.
+
+Build tools often print paths relative to the repository root, or truncated,
+as in `.../pkg/mod.py`. Such paths name no file relative to the pane
+directory. With `@fzf-links-project-index`, a path that cannot be found
+directly is looked up in the list of files tracked by the repository: first
+relative to its root, then as the suffix of exactly one tracked file.
+
+The list comes from `git ls-files`, and is kept on disk until the git index or
+HEAD changes. It is stored with the components of each path reversed, and
+sorted, so a suffix lookup is a binary search.
+"""
+
+from __future__ import annotations
+
+import bisect
+import hashlib
+import logging
+import os
+import subprocess
+import threading
+from typing import Any, ClassVar, cast
+
+from .cache import cache_dir, read_json, write_json_atomically
+from .fs_metadata import fs_metadata, probe
+
+logger = logging.getLogger()  # root logger when no argument is provided
+
+# Time, in seconds, `git ls-files` may take
+GIT_TIMEOUT = 5
+
+# Prefixes marking a truncated path
+_ELLIPSES = ("...", "…")
+
+_VERSION = 1
+
+
+def _reversed_key(path: str) -> str:
+    return "/".join(reversed(path.split("/")))
+
+
+class ProjectIndex:
+    """The files tracked by one repository, relative to its root."""
+
+    def __init__(self, root: str, keys: list[str]) -> None:
+        self.root = root
+        # Tracked paths with their components reversed, sorted
+        self.keys = keys
+
+    @classmethod
+    def from_files(cls, root: str, files: list[str]) -> ProjectIndex:
+        return cls(root, sorted(_reversed_key(file) for file in files))
+
+    def find(self, suffix: str) -> list[str]:
+        """Return the tracked paths ending with the components of `suffix`, at
+        most two of them, enough to tell whether the suffix is ambiguous."""
+        key = _reversed_key(suffix)
+        found: list[str] = []
+        index = bisect.bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            found.append(key)
+        # Longer paths sort between `key/` and `key0`, as `0` follows `/`
+        index = bisect.bisect_left(self.keys, key + "/")
+        end = bisect.bisect_left(self.keys, key + "0", index)
+        found += self.keys[index : min(end, index + 2 - len(found))]
+        return [_reversed_key(key) for key in found[:2]]
+
+    def paths(self, file_path_str: str) -> list[str]:
+        """Return the absolute paths of the tracked files `file_path_str` may
+        name, relative to the root or as a unique suffix, to be checked for
+        existence in order."""
+        if file_path_str.startswith(("/", "~")):
+            return []
+        suffix = file_path_str
+        truncated = suffix.startswith(_ELLIPSES)
+        if truncated:
+            suffix = suffix.lstrip(".…")
+        parts = [part for part in suffix.split("/") if part not in ("", ".")]
+        if truncated and not suffix.startswith("/"):
+            # The first component was cut, as in `...kg/mod.py`
+            parts = parts[1:]
+        if not parts or ".." in parts:
+            return []
+        suffix = "/".join(parts)
+
+        paths = [] if truncated else [os.path.join(self.root, suffix)]
+        candidates = self.find(suffix)
+        if len(candidates) == 1:
+            # Neither missing nor ambiguous. Tracked files may still have been
+            # deleted from the working tree.
+            paths.append(os.path.join(self.root, candidates[0]))
+        return paths
+
+
+def _git_dir(root: str) -> str | None:
+    git = os.path.join(root, ".git")
+    # Not cached, as the index may be loaded on a thread of its own
+    info = probe(git).info
+    if info is None:
+        return None
+    if info.is_dir:
+        return git
+    # A worktree or a submodule: the file points to the git directory
+    try:
+        with open(git, "r") as file:
+            content = file.read().strip()
+    except OSError:
+        return None
+    if not content.startswith("gitdir:"):
+        return None
+    return os.path.join(root, content[len("gitdir:") :].strip())
+
+
+def _stamp(git_dir: str) -> list[Any] | None:
+    # Changes whenever files are added, removed, committed or checked out
+    try:
+        index_mtime = os.stat(os.path.join(git_dir, "index")).st_mtime_ns
+        with open(os.path.join(git_dir, "HEAD"), "r") as file:
+            head = file.read().strip()
+    except OSError:
+        return None
+    return [index_mtime, head]
+
+
+def _ls_files(root: str) -> list[str] | None:
+    try:
+        output = subprocess.run(
+            ["git", "-C", root, "ls-files", "-z"],
+            capture_output=True,
+            check=True,
+            timeout=GIT_TIMEOUT,
+        ).stdout
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.debug(f"could not list the files of {root}: {e}")
+        return None
+    return [
+        file for file in output.decode("utf-8", "surrogateescape").split("\0") if file
+    ]
+
+
+class ProjectIndexesSingletonCls:
+    _instance: ClassVar[ProjectIndexesSingletonCls | None] = None
+
+    # Index of the repository around each directory of this run
+    _indexes: dict[str, ProjectIndex | None]
+    _lock: threading.Lock
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._lock = threading.Lock()
+            cls._instance.clear()
+        return cls._instance
+
+    def clear(self) -> None:
+        """Forget the indexes, e.g. at the start of a new run."""
+        self._indexes = {}
+
+    def index(self, directory: str) -> ProjectIndex | None:
+        """Return the index of the repository containing `directory`."""
+        with self._lock:
+            if directory not in self._indexes:
+                self._indexes[directory] = self._load(directory)
+            return self._indexes[directory]
+
+    def load(self, directory: str) -> ProjectIndex | None:
+        """Load the index of the repository containing `directory` without
+        recording it, e.g. on a thread of its own."""
+        return self._load(directory)
+
+    def remember(self, directory: str, index: ProjectIndex | None) -> None:
+        """Record the index `load` returned for `directory`."""
+        with self._lock:
+            _ = self._indexes.setdefault(directory, index)
+
+    def _load(self, directory: str) -> ProjectIndex | None:
+        root = directory
+        while True:
+            git_dir = _git_dir(root)
+            if git_dir is not None:
+                break
+            parent = os.path.dirname(root)
+            if parent == root:
+                return None
+            root = parent
+        stamp = _stamp(git_dir)
+        if stamp is None:
+            return None
+
+        cache = cache_dir("index")
+        cache_file = None
+        if cache is not None:
+            digest = hashlib.sha256(root.encode("utf-8", "surrogateescape"))
+            cache_file = cache / f"{digest.hexdigest()[:32]}.json"
+            data = read_json(cache_file, _VERSION)
+            if (
+                data is not None
+                and data.get("stamp") == stamp
+                and isinstance(data.get("keys"), list)
+            ):
+                return ProjectIndex(root, cast(list[str], data["keys"]))
+
+        files = _ls_files(root)
+        if files is None:
+            return None
+        index = ProjectIndex.from_files(root, files)
+        if cache_file is not None:
+            write_json_atomically(
+                cache_file, {"version": _VERSION, "stamp": stamp, "keys": index.keys}
+            )
+        logger.debug(f"indexed {len(files)} files of {root}")
+        return index
+
+    def find(self, file_path_str: str) -> str | None:
+        """Return the absolute path of the tracked file `file_path_str` names,
+        relative to the repository root or as a unique suffix, if it exists."""
+        index = self.index(fs_metadata.cwd())
+        if index is None:
+            return None
+        for path in index.paths(file_path_str):
+            if fs_metadata.info(path) is not None:
+                return path
+        return None
+
+
+# Instantiate the singleton class
+project_indexes = ProjectIndexesSingletonCls()
+
+__all__ = ["GIT_TIMEOUT", "ProjectIndex", "project_indexes"]
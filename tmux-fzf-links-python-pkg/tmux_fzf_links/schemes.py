@@ -2,28 +2,167 @@
 #   Author: (c) 2024 Andrea Alberti
 # ===============================================================================
 
-import errno
+import logging
+import os
+from collections.abc import Iterable, Mapping
 from os.path import expanduser
 from pathlib import Path
 
+from .configs import configs
+from .fs_metadata import Probe, fs_metadata, probe
+from .path_lookup import lookup_concurrently, on_network_mount
+from .project_index import project_indexes
+
+logger = logging.getLogger()  # root logger when no argument is provided
+
 
 def heuristic_find_file(file_path_str: str) -> Path | None:
 
-    try:
-        # Expand tilde (~) to the user's home directory
+    # Expand tilde (~) to the user's home directory
+    file_path = Path(expanduser(file_path_str))
+    # Check if the file exists either as is or relative to the current
+    # directory. The metadata is cached for the run, so the handlers and the
+    # coloring of the same path share a single lookup.
+    info = fs_metadata.info(file_path)
+    if info is not None and info.exists:
+        return fs_metadata.resolve(file_path)  # Return the absolute resolved path
+    if configs.project_index:
+        # Relative to the repository root, or a truncated path
+        found = project_indexes.find(file_path_str)
+        if found is not None:
+            return fs_metadata.resolve(found)
+    # Drop the match if it corresponds to no file (or its name is too long)
+    return None
+
+
+def heuristic_find_files(file_path_strs: Iterable[str]) -> dict[str, Path | None]:
+    """Resolve many paths at once, each distinct path only once.
+
+    Returns a map from every given path string to its fully resolved path, or to
+    None when it corresponds to no file or could not be looked up in time.
+    """
+    resolved_paths, unknown = resolve_paths(file_path_strs)
+    return {
+        file_path_str: None if file_path_str in unknown else resolved_path
+        for file_path_str, resolved_path in resolved_paths.items()
+    }
+
+
+def resolve_paths(
+    file_path_strs: Iterable[str],
+) -> tuple[dict[str, Path | None], set[str]]:
+    """Resolve many paths at once, like `heuristic_find_files`, and return the
+    paths whose lookup timed out separately.
+
+    The lookups run concurrently, each one within `@fzf-links-path-timeout`,
+    with `@fzf-links-path-lookup parallel`, or with `auto` when one of the
+    paths lies on a network filesystem. Paths timed out map to None, and
+    nothing of their lookup is recorded.
+    """
+    distinct = list(dict.fromkeys(file_path_strs))
+    strategy = configs.path_lookup
+    if strategy == "auto" and len(distinct) > 1:
+        cwd = fs_metadata.cwd()
+        if on_network_mount(
+            os.path.join(cwd, expanduser(file_path_str)) for file_path_str in distinct
+        ):
+            strategy = "parallel"
+    if strategy != "parallel":
+        return {
+            file_path_str: heuristic_find_file(file_path_str)
+            for file_path_str in distinct
+        }, set()
+
+    # The threads only probe the paths. A thread given up on may still be
+    # blocked, and must not change the caches of the run once it returns.
+    negatives = fs_metadata.negatives
+    missing = negatives.valid_entries() if negatives is not None else None
+
+    def probe_file(file_path_str: str) -> Probe:
+        return probe(str(Path(expanduser(file_path_str))), missing)
+
+    timeout = configs.path_timeout / 1000
+    probes, unknown = lookup_concurrently(distinct, probe_file, timeout)
+    # The probes that completed in time are merged here, on the main thread,
+    # and the paths are then resolved from the cache
+    found: dict[str, Path | None] = {}
+    pending: list[str] = []
+    for file_path_str, probed in probes.items():
         file_path = Path(expanduser(file_path_str))
-        # Check if the file exists either as is or relative to the current directory
-        if file_path.exists():
-            return file_path.resolve()  # Return the absolute resolved path
-        else:
-            # Drop the match if it corresponds to no file
-            return None
-    except OSError as e:
-        # Filename too long
-        if e.errno == errno.ENAMETOOLONG:
-            return None
+        fs_metadata.merge(file_path, probed)
+        info = fs_metadata.info(file_path)
+        if info is not None and info.exists:
+            found[file_path_str] = fs_metadata.resolve(file_path)
         else:
-            raise e
+            pending.append(file_path_str)
+    if pending and configs.project_index:
+        # Loading the project index stats the ancestors of the pane directory
+        # and runs git, so it is bounded by the same timeout as the probes
+        unknown |= _find_in_project_index(pending, found, missing, timeout)
+    if unknown:
+        logger.info(
+            f"{len(unknown)} paths skipped, looking them up took longer than {configs.path_timeout} ms"
+        )
+    return {
+        file_path_str: found.get(file_path_str) for file_path_str in distinct
+    }, unknown
+
+
+def _find_in_project_index(
+    file_path_strs: list[str],
+    found: dict[str, Path | None],
+    missing: Mapping[str, tuple[int, frozenset[str]]] | None,
+    timeout: float,
+) -> set[str]:
+    # Resolve the paths missing relative to the pane directory in the project
+    # index, into `found`, and return the paths whose lookup timed out
+    cwd = fs_metadata.cwd()
+    loaded, unknown = lookup_concurrently([cwd], project_indexes.load, timeout)
+    if unknown:
+        return set(file_path_strs)
+    index = loaded[cwd]
+    project_indexes.remember(cwd, index)
+    if index is None:
+        return set()
+    paths = {
+        file_path_str: index.paths(file_path_str) for file_path_str in file_path_strs
+    }
+
+    def probe_paths(file_path_str: str) -> list[Probe]:
+        probes: list[Probe] = []
+        for path in paths[file_path_str]:
+            probes.append(probe(path, missing))
+            if probes[-1].info is not None:
+                break
+        return probes
+
+    probes, unknown = lookup_concurrently(
+        [file_path_str for file_path_str in file_path_strs if paths[file_path_str]],
+        probe_paths,
+        timeout,
+    )
+    for file_path_str, probed in probes.items():
+        for path, path_probe in zip(paths[file_path_str], probed):
+            fs_metadata.merge(path, path_probe)
+            if path_probe.info is not None:
+                found[file_path_str] = fs_metadata.resolve(path)
+    return unknown
+
+
+def canonical_path(file_path_str: str) -> str:
+    """Return the absolute form of a path, without touching the filesystem.
+
+    `~` is expanded, and empty and `.` components are dropped, so `./src/a.py`,
+    `src/a.py` and `/abs/src/a.py` (from `/abs`) get the same key. `..` is kept,
+    since collapsing it is only correct when no symlink precedes it.
+    """
+    absolute = os.path.join(fs_metadata.cwd(), expanduser(file_path_str))
+    return "/" + "/".join(part for part in absolute.split("/") if part not in ("", "."))
 
 
-__all__ = ["heuristic_find_file"]
+__all__ = [
+    "canonical_path",
+    "heuristic_find_file",
+    "heuristic_find_files",
+    "resolve_paths",
+]
@@ -0,0 +1,54 @@
+# ===============================================================================
+#   Author: (c) 2024 Andrea Alberti
+# ===============================================================================
+
+"""Interval index of capture regions already claimed by a scheme.
+
+Schemes run in precedence order (user schemes first, then the defaults). Once a
+scheme accepts a match, the region it covers is claimed, and lower-precedence
+schemes skip any hit overlapping it before calling their pre-handler. This keeps
+e.g. the file scheme from probing the fragments of a URL, and the plain schemes
+from rematching the visible text of an OSC 8 hyperlink.
+"""
+
+from __future__ import annotations
+
+import bisect
+from collections.abc import Iterable
+
+
+class SpanIndex:
+    """Sorted, disjoint half-open intervals answering overlap queries in O(log n)."""
+
+    def __init__(self) -> None:
+        self._starts: list[int] = []
+        self._ends: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def overlaps(self, start: int, end: int) -> bool:
+        """Whether `[start, end)` intersects a claimed interval."""
+        k = bisect.bisect_right(self._starts, start)
+        if k and self._ends[k - 1] > start:
+            return True
+        return k < len(self._starts) and self._starts[k] < end
+
+    def claim(self, spans: Iterable[tuple[int, int]]) -> None:
+        """Add intervals, merging those that touch or overlap."""
+        merged = sorted(
+            [*zip(self._starts, self._ends), *(s for s in spans if s[1] > s[0])]
+        )
+        starts: list[int] = []
+        ends: list[int] = []
+        for start, end in merged:
+            if ends and start <= ends[-1]:
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        self._starts = starts
+        self._ends = ends
+
+
+__all__ = ["SpanIndex"]